@@ -0,0 +1,49 @@
+from .utils import levenshtein_distance
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over strings under edit distance. A search for everything within
+    distance k of a query only descends into children whose edge distance d satisfies
+    |d - distance(query, node)| <= k, so most of the tree is never compared against.
+    """
+
+    def __init__(self, keys=()):
+        self._root = None
+        self.size = 0
+        for key in keys:
+            self.add(key)
+
+    def add(self, key: str):
+        if self._root is None:
+            self._root = (key, {})
+            self.size = 1
+            return
+        node_key, children = self._root
+        while True:
+            distance = levenshtein_distance(key, node_key)
+            if distance == 0:
+                return
+            child = children.get(distance)
+            if child is None:
+                children[distance] = (key, {})
+                self.size += 1
+                return
+            node_key, children = child
+
+    def search(self, query: str, max_distance: int):
+        """(key, distance) pairs within max_distance of query."""
+        if self._root is None:
+            return []
+        matches = []
+        stack = [self._root]
+        while stack:
+            node_key, children = stack.pop()
+            distance = levenshtein_distance(query, node_key)
+            if distance <= max_distance:
+                matches.append((node_key, distance))
+            for edge in range(max(1, distance - max_distance), distance + max_distance + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+        return matches
@@ -1,15 +1,67 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
+from typing import Optional
+import hashlib
 import os
+import tempfile
 from pathlib import Path
 
 # Get the project root directory (parent of src)
 ROOT_DIR = Path(__file__).parent.parent
 
+def database_id(database_url: str) -> str:
+    """Short, stable identity of a database, for the files and snapshots that belong to it."""
+    return hashlib.sha256(database_url.encode()).hexdigest()[:16]
+
+
 class Settings(BaseSettings):
     project_name: str
     database_url: str
-    search_radius_miles: float = 2.0
+    search_radius_miles: float = 2.0  # /applications/nearby box, kept on its original scale of miles / 1.6 km
     nearby_vendors_count: int = 5
+    spatial_cell_degrees: float = 0.01
+    knn_initial_radius_miles: float = 0.25
+    knn_max_radius_miles: float = 50.0
+    nearby_batch_max_points: int = 500
+    geometry_max_vertices: int = 1000
+    tile_max_zoom: int = 20
+    tile_cluster_bits: int = 3  # 8x8 clusters per tile
+    tile_max_tiles: int = 64
+    route_max_distance_m: float = 5000.0
+    csv_file: str = "Mobile_Food_Facility_Permit.csv"
+    ingest_chunk_size: int = 5000
+    autocomplete_max_results: int = 10
+    fuzzy_max_distance: int = 2
+    fuzzy_max_results: int = 20
+    food_search_max_results: int = 50
+    nearby_cache_geohash_precision: int = 6
+    nearby_cache_max_entries: int = 10000
+    nearby_cache_ttl_seconds: float = 300.0
+    http_cache_max_age: int = 300
+    schedule_timezone: str = "America/Los_Angeles"  # dayshours are local times
+    startup_lock_file: Optional[str] = None  # default: per database_url, in the temp dir
+    startup_retry_after_seconds: int = 5
+    page_max_limit: int = 1000
+    stream_batch_size: int = 500
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 0  # 0 = one per available CPU
+    server_keepalive_seconds: int = 5
+    server_backlog: int = 2048
+    server_timeout_seconds: int = 60
+    snapshot_file: Optional[str] = None  # default: per database_url, in the temp dir; "" = no snapshot
+    snapshot_watch_seconds: float = 5.0  # how often workers check for a snapshot another worker reloaded; 0 = never
+    admin_token: str = ""  # /admin endpoints require it in X-Admin-Token and are disabled while it is empty
+
+    @model_validator(mode="after")
+    def default_shared_files(self):
+        # Workers share these files only when they serve the same database
+        prefix = os.path.join(tempfile.gettempdir(), f"mobile-food-vendor-{database_id(self.database_url)}")
+        if self.startup_lock_file is None:
+            self.startup_lock_file = f"{prefix}-startup.lock"
+        if self.snapshot_file is None:
+            self.snapshot_file = f"{prefix}-snapshot.bin"
+        return self
 
     class Config:
         env_file = ROOT_DIR / ".env"  # Look for .env in project root
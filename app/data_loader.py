@@ -1,15 +1,402 @@
 import pandas as pd
+import csv
+import io
 import os
+import sys
+import time
+from datetime import datetime
+from sqlalchemy import insert, update, delete, select, func, literal, tuple_
 from sqlalchemy.orm import Session
+from app.config import settings
 from app.db import SessionLocal, engine
-from app.models import VendorApplication
+from app.models import VendorApplication, CurrentVendor, OpenInterval, SyncLog, current_vendor_rtree
+from app.constants import APPROVED
+from app.indexes import refresh_indexes
+from app.dataset import bump_dataset_version
+from app.utils import normalize_name
+from app.schedule import parse_dayshours
 import logging
 
 logger = logging.getLogger(__name__)
 
-def load_csv_data():
-    """Load data from CSV file into the database if the table is empty"""
-    
+CSV_DATE_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+
+# CSV column -> VendorApplication column
+TEXT_COLUMNS = {
+    "FacilityType": "facility_type",
+    "Status": "status",
+    "Address": "address",
+    "FoodItems": "food_items",
+    "dayshours": "dayshours",
+}
+DATE_COLUMNS = {
+    "Approved": "approved",
+    "ExpirationDate": "expiration_date",
+}
+COORDINATE_COLUMNS = {
+    "Latitude": "latitude",
+    "Longitude": "longitude",
+}
+# Older exports call the applicant column "Name", the city's export calls it "Applicant"
+NAME_COLUMNS = ("Name", "Applicant")
+KEY_COLUMNS = {
+    "locationid": "location_id",
+    "permit": "permit",
+}
+CSV_COLUMNS = set(TEXT_COLUMNS) | set(DATE_COLUMNS) | set(COORDINATE_COLUMNS) | set(NAME_COLUMNS) | set(KEY_COLUMNS)
+DATA_COLUMNS = ["applicant_name", *TEXT_COLUMNS.values(), *COORDINATE_COLUMNS.values(), *DATE_COLUMNS.values()]
+INSERT_COLUMNS = [*DATA_COLUMNS, "name_key", *KEY_COLUMNS.values(), "row_hash"]
+SYNC_BATCH = 500  # ids or locations per IN (...) list
+
+
+def parse_dates(column: pd.Series) -> pd.Series:
+    """Parse a date column in one pass, retrying only the cells that are not in the export's usual format."""
+    parsed = pd.to_datetime(column, format=CSV_DATE_FORMAT, errors="coerce")
+    retry = parsed.isna() & column.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(column[retry], errors="coerce", format="mixed")
+    return parsed
+
+
+def prepare_chunk(df: pd.DataFrame):
+    """Convert one CSV chunk column-wise into a frame of VendorApplication columns. Returns (frame, rejected)."""
+    out = pd.DataFrame(index=df.index)
+    name_column = next((c for c in NAME_COLUMNS if c in df.columns), None)
+    out["applicant_name"] = df[name_column].fillna("").astype(str) if name_column else ""
+    for source, target in TEXT_COLUMNS.items():
+        out[target] = df[source].fillna("").astype(str) if source in df.columns else ""
+
+    valid = pd.Series(True, index=df.index)
+    for source, target in COORDINATE_COLUMNS.items():
+        if source not in df.columns:
+            out[target] = None
+            continue
+        out[target] = pd.to_numeric(df[source], errors="coerce")
+        # A coordinate that is present but not a number is a bad row, a missing one is allowed
+        valid &= out[target].notna() | df[source].isna()
+
+    for source, target in DATE_COLUMNS.items():
+        out[target] = parse_dates(df[source]) if source in df.columns else pd.NaT
+
+    out["name_key"] = out["applicant_name"].map(normalize_name)
+    out["location_id"] = pd.to_numeric(df["locationid"], errors="coerce").astype("Int64") if "locationid" in df.columns else None
+    out["permit"] = df["permit"] if "permit" in df.columns else None
+    out["row_hash"] = pd.util.hash_pandas_object(out[DATA_COLUMNS + ["permit"]], index=False).map("{:016x}".format)
+
+    out = out[valid]
+    return out[INSERT_COLUMNS], int((~valid).sum())
+
+
+def to_records(frame: pd.DataFrame):
+    """Rows as dicts with None instead of NaN/NaT, for executemany."""
+    frame = frame.astype(object).where(frame.notna(), None)
+    return frame.to_dict("records")
+
+
+def copy_chunk(db: Session, frame: pd.DataFrame):
+    """Stream one chunk into PostgreSQL with COPY inside the session's transaction."""
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False, quoting=csv.QUOTE_MINIMAL, date_format="%Y-%m-%d %H:%M:%S")
+    buffer.seek(0)
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {VendorApplication.__tablename__} ({', '.join(INSERT_COLUMNS)}) FROM STDIN "
+            # Empty text cells are '' like on the executemany path, not NULL
+            f"WITH (FORMAT csv, FORCE_NOT_NULL ({', '.join(['applicant_name', *TEXT_COLUMNS.values()])}))",
+            buffer,
+        )
+    finally:
+        cursor.close()
+
+
+def insert_chunk(db: Session, frame: pd.DataFrame):
+    if db.get_bind().dialect.name == "postgresql":
+        copy_chunk(db, frame)
+    else:
+        db.execute(insert(VendorApplication), to_records(frame))
+
+
+def ingest_csv(db: Session, csv_file: str, chunk_size: int = None):
+    """
+    Stream a permit CSV into food_vendor_application in chunks, all in the caller's transaction.
+    Returns ingest stats: rows inserted, rows rejected, elapsed seconds and rows per second.
+    """
+    chunk_size = chunk_size or settings.ingest_chunk_size
+    started = time.perf_counter()
+    inserted = rejected = 0
+    for chunk in pd.read_csv(csv_file, chunksize=chunk_size, usecols=lambda c: c in CSV_COLUMNS, dtype=str):
+        frame, chunk_rejected = prepare_chunk(chunk)
+        if len(frame):
+            insert_chunk(db, frame)
+        inserted += len(frame)
+        rejected += chunk_rejected
+    elapsed = time.perf_counter() - started
+    return {
+        "rows_inserted": inserted,
+        "rows_rejected": rejected,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(inserted / elapsed, 1) if elapsed > 0 else None,
+    }
+
+
+# Applications sharing these values are one location in current_vendor
+LOCATION_KEY = tuple_(VendorApplication.latitude, VendorApplication.longitude, VendorApplication.applicant_name)
+
+
+def batches(items, size: int = SYNC_BATCH):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def insert_current_vendors(db: Session, locations=None):
+    """Insert the latest application per location into current_vendor, for every location or only those given."""
+    for all_status in (True, False):
+        latest = select(
+            func.max(VendorApplication.id),
+            literal(all_status),
+            VendorApplication.latitude,
+            VendorApplication.longitude,
+        ).where(VendorApplication.latitude.is_not(None), VendorApplication.longitude.is_not(None))
+        if not all_status:
+            latest = latest.where(VendorApplication.status == APPROVED)
+        if locations is not None:
+            latest = latest.where(LOCATION_KEY.in_(locations))
+        latest = latest.group_by(VendorApplication.latitude, VendorApplication.longitude, VendorApplication.applicant_name)
+        db.execute(insert(CurrentVendor).from_select(
+            ["application_id", "all_status", "latitude", "longitude"], latest))
+
+
+def insert_rtree_entries(db: Session, after_id: int = 0):
+    """Index current_vendor rows with an id above after_id in the SQLite R*Tree."""
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(insert(current_vendor_rtree).from_select(
+            ["id", "min_lat", "max_lat", "min_long", "max_long", "min_scope", "max_scope"],
+            select(CurrentVendor.id, CurrentVendor.latitude, CurrentVendor.latitude,
+                   CurrentVendor.longitude, CurrentVendor.longitude, CurrentVendor.all_status, CurrentVendor.all_status)
+            .where(CurrentVendor.id > after_id)))
+
+
+def refresh_current_vendors(db: Session):
+    """
+    Rebuild current_vendor, the latest application per (latitude, longitude, applicant_name),
+    and on SQLite its R*Tree, plus vendor_open_interval, in the caller's transaction, so they
+    commit together with the rows they are derived from.
+    """
+    db.execute(delete(CurrentVendor))
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(delete(current_vendor_rtree))
+    insert_current_vendors(db)
+    insert_rtree_entries(db)
+    refresh_open_intervals(db)
+
+
+def locations_of(db: Session, application_ids):
+    """(latitude, longitude, applicant_name) of the given applications, as they are now."""
+    return {
+        tuple(location)
+        for batch in batches(application_ids)
+        for location in db.execute(select(VendorApplication.latitude, VendorApplication.longitude,
+                                          VendorApplication.applicant_name).where(VendorApplication.id.in_(batch)))
+    }
+
+
+def clear_current_vendors(db: Session, locations):
+    """Remove the current_vendor rows, and their R*Tree entries, of the given locations."""
+    for batch in batches(locations):
+        stale = db.scalars(select(CurrentVendor.id)
+                           .join(VendorApplication, VendorApplication.id == CurrentVendor.application_id)
+                           .where(LOCATION_KEY.in_(batch))).all()
+        for ids in batches(stale):
+            if db.get_bind().dialect.name == "sqlite":
+                db.execute(delete(current_vendor_rtree).where(current_vendor_rtree.c.id.in_(ids)))
+            db.execute(delete(CurrentVendor).where(CurrentVendor.id.in_(ids)))
+
+
+def fill_current_vendors(db: Session, locations):
+    """Insert current_vendor rows, and their R*Tree entries, for the given locations as the table now has them."""
+    # New rows get ids above every existing one, so only they go into the R*Tree
+    after_id = db.scalar(select(func.max(CurrentVendor.id))) or 0
+    for batch in batches(locations):
+        insert_current_vendors(db, batch)
+    insert_rtree_entries(db, after_id)
+
+
+def refresh_open_intervals(db: Session, application_ids=None):
+    """Rebuild vendor_open_interval from the dayshours of every application, or only of those given."""
+    if application_ids is None:
+        db.execute(delete(OpenInterval))
+        write_open_intervals(db, select(VendorApplication.id, VendorApplication.dayshours))
+        return
+    for batch in batches(application_ids):
+        db.execute(delete(OpenInterval).where(OpenInterval.application_id.in_(batch)))
+        write_open_intervals(db, select(VendorApplication.id, VendorApplication.dayshours)
+                             .where(VendorApplication.id.in_(batch)))
+
+
+def write_open_intervals(db: Session, applications):
+    intervals = [
+        {"application_id": vendor_id, "start_minute": start, "end_minute": end}
+        for vendor_id, dayshours in db.execute(applications.where(VendorApplication.dayshours != ""))
+        for start, end in parse_dayshours(dayshours)
+    ]
+    if intervals:
+        db.execute(insert(OpenInterval), intervals)
+
+
+def source_key(location_id, permit):
+    return (int(location_id) if location_id is not None else None, permit)
+
+
+# Columns of the first schema: rows loaded before the source keys existed are matched to the CSV on these
+LEGACY_MATCH_COLUMNS = ("applicant_name", "address", "latitude", "longitude")
+
+
+def legacy_match_key(values):
+    # The first loader stored missing text as str(nan)
+    return tuple("" if value is None or value == "nan" else value for value in values)
+
+
+def backfill_upgraded_rows(csv_file: str = None):
+    """
+    Fill the columns upgrade_schema added empty to rows from an older schema: name_key from the
+    name, then the source keys, row hash, food items and hours by matching each row to the CSV
+    on LEGACY_MATCH_COLUMNS. Rows the CSV no longer has keep empty keys, and the next sync
+    deletes them. Rebuilds current_vendor if anything changed. Returns the number of rows matched.
+    """
+    csv_file = csv_file or settings.csv_file
+    db = SessionLocal()
+    try:
+        unnamed = [
+            {"id": vendor_id, "name_key": normalize_name(name)}
+            for vendor_id, name in db.execute(select(VendorApplication.id, VendorApplication.applicant_name)
+                                              .where(VendorApplication.name_key.is_(None)))
+        ]
+        if unnamed:
+            db.execute(update(VendorApplication), unnamed)
+
+        unkeyed = {}
+        for vendor_id, *values in db.execute(
+                select(VendorApplication.id, *(getattr(VendorApplication, c) for c in LEGACY_MATCH_COLUMNS))
+                .where(VendorApplication.row_hash.is_(None)).order_by(VendorApplication.id)):
+            unkeyed.setdefault(legacy_match_key(values), []).append(vendor_id)
+        matched = []
+        if unkeyed and os.path.exists(csv_file):
+            for chunk in pd.read_csv(csv_file, chunksize=settings.ingest_chunk_size, usecols=lambda c: c in CSV_COLUMNS, dtype=str):
+                frame, _ = prepare_chunk(chunk)
+                for row in to_records(frame):
+                    ids = unkeyed.get(legacy_match_key(row[c] for c in LEGACY_MATCH_COLUMNS))
+                    if ids:
+                        matched.append({"id": ids.pop(0), **row})
+            if matched:
+                db.execute(update(VendorApplication), matched)
+
+        if unnamed or matched:
+            refresh_current_vendors(db)
+        db.commit()
+        if unnamed or unkeyed:
+            logger.info(f"Backfilled {len(unnamed)} name keys and matched {len(matched)} of "
+                        f"{sum(len(ids) for ids in unkeyed.values()) + len(matched)} unkeyed rows to {csv_file}")
+        return len(matched)
+    except Exception as e:
+        logger.error(f"Error backfilling upgraded rows: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def sync_csv_data(csv_file: str = None, refresh: bool = True):
+    """
+    Incrementally sync the table with a permit CSV, keyed on (locationid, permit).
+    Only rows whose content hash changed are written, in one short transaction,
+    and a SyncLog row records the counts. Returns the SyncLog entry.
+    Pass refresh=False when the caller rebuilds the indexes itself.
+    """
+    csv_file = csv_file or settings.csv_file
+    db = SessionLocal()
+    try:
+        log = SyncLog(csv_file=csv_file, started_at=datetime.now(), rows_seen=0, inserted=0, updated=0,
+                      deleted=0, unchanged=0, rejected=0)
+        existing, unkeyed = {}, []
+        for vendor_id, location_id, permit, row_hash in db.execute(
+                select(VendorApplication.id, VendorApplication.location_id, VendorApplication.permit, VendorApplication.row_hash)):
+            key = source_key(location_id, permit)
+            # Rows without a location id can never match the CSV; keyed on it they would collapse into one
+            if key[0] is None:
+                unkeyed.append(vendor_id)
+            else:
+                existing[key] = (vendor_id, row_hash)
+
+        # Work out the diff first so the write transaction only holds the changed rows
+        inserts, updates, seen = [], [], set()
+        for chunk in pd.read_csv(csv_file, chunksize=settings.ingest_chunk_size, usecols=lambda c: c in CSV_COLUMNS, dtype=str):
+            frame, rejected = prepare_chunk(chunk)
+            log.rejected += rejected
+            log.rows_seen += len(frame) + rejected
+            for row in to_records(frame):
+                key = source_key(row["location_id"], row["permit"])
+                if key[0] is None or key in seen:
+                    log.rejected += 1
+                    continue
+                seen.add(key)
+                if key not in existing:
+                    inserts.append(row)
+                elif existing[key][1] != row["row_hash"]:
+                    updates.append({"id": existing[key][0], **row})
+                else:
+                    log.unchanged += 1
+        deletes = unkeyed + [vendor_id for key, (vendor_id, _) in existing.items() if key not in seen]
+
+        # Only the locations a changed row leaves or joins can get a different latest application
+        updated_ids = [row["id"] for row in updates]
+        locations = locations_of(db, updated_ids + deletes)
+        locations.update((row["latitude"], row["longitude"], row["applicant_name"]) for row in inserts + updates)
+        locations = {location for location in locations if location[0] is not None and location[1] is not None}
+        clear_current_vendors(db, locations)
+
+        inserted_ids = []
+        if inserts:
+            inserted_ids = db.scalars(insert(VendorApplication).returning(VendorApplication.id), inserts).all()
+        if updates:
+            db.execute(update(VendorApplication), updates)
+        for batch in batches(deletes):
+            db.execute(delete(OpenInterval).where(OpenInterval.application_id.in_(batch)))
+            db.execute(delete(VendorApplication).where(VendorApplication.id.in_(batch)))
+        log.inserted, log.updated, log.deleted = len(inserts), len(updates), len(deletes)
+        fill_current_vendors(db, locations)
+        refresh_open_intervals(db, list(inserted_ids) + updated_ids)
+        log.finished_at = datetime.now()
+        db.add(log)
+        db.commit()
+        logger.info(f"Synced {csv_file}: {log.inserted} inserted, {log.updated} updated, {log.deleted} deleted, "
+                    f"{log.unchanged} unchanged, {log.rejected} rejected")
+        changed = log.inserted or log.updated or log.deleted
+        db.refresh(log)
+        db.expunge(log)
+    except Exception as e:
+        logger.error(f"Error syncing CSV data: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    if changed and refresh:
+        # The nearby cache is keyed on the indexes' content hash, so requests still on the old indexes
+        # cannot cache for the new ones; the bump drops the old entries and bumps the SQL-path version
+        refresh_indexes()
+        bump_dataset_version()
+    return log
+
+
+def load_csv_data(csv_file: str = None, refresh: bool = True):
+    """
+    Load data from CSV file into the database if the table is empty, then rebuild the in-memory indexes.
+    Pass refresh=False when the caller builds the indexes itself.
+    """
+
+    csv_file = csv_file or settings.csv_file
     db = SessionLocal()
     try:
         # Check if data already exists and is valid
@@ -19,48 +406,45 @@ def load_csv_data():
             valid_count = db.query(VendorApplication).filter(VendorApplication.applicant_name != '').count()
             if valid_count > 0:
                 logger.info(f"Database already has {valid_count} valid records. Skipping data load.")
+                if db.query(CurrentVendor).count() == 0:
+                    # A database loaded before current_vendor existed
+                    refresh_current_vendors(db)
+                    db.commit()
                 return
             else:
                 logger.info(f"Found {count} empty records. Clearing and reloading data.")
+                db.query(CurrentVendor).delete()
+                db.query(OpenInterval).delete()
                 db.query(VendorApplication).delete()
                 db.commit()
-        
+
         logger.info("Loading data from CSV file...")
-        
-        # Read CSV file
-        csv_file = "Mobile_Food_Facility_Permit.csv"
+
         if not os.path.exists(csv_file):
             logger.warning(f"CSV file {csv_file} not found. Skipping data load.")
             return
-            
-        df = pd.read_csv(csv_file)
-        logger.info(f"Found {len(df)} records in CSV file")
-        
-        # Insert data into database
-        records_inserted = 0
-        for _, row in df.iterrows():
-            try:
-                vendor = VendorApplication(
-                    applicant_name=str(row.get('Name', '')),
-                    facility_type=str(row.get('FacilityType', '')),
-                    status=str(row.get('Status', '')),
-                    address=str(row.get('Address', '')),
-                    latitude=float(row.get('Latitude', 0)) if pd.notna(row.get('Latitude')) else None,
-                    longitude=float(row.get('Longitude', 0)) if pd.notna(row.get('Longitude')) else None,
-                    approved=pd.to_datetime(row.get('Approved'), errors='coerce') if pd.notna(row.get('Approved')) else None,
-                    expiration_date=pd.to_datetime(row.get('ExpirationDate'), errors='coerce') if pd.notna(row.get('ExpirationDate')) else None
-                )
-                db.add(vendor)
-                records_inserted += 1
-            except Exception as e:
-                logger.warning(f"Error inserting record: {e}")
-                continue
-        
+
+        stats = ingest_csv(db, csv_file)
+        refresh_current_vendors(db)
         db.commit()
-        logger.info(f"Successfully loaded {records_inserted} records into the database")
-        
+        logger.info(f"Successfully loaded {stats['rows_inserted']} records into the database "
+                    f"({stats['rows_rejected']} rejected, {stats['rows_per_second']} rows/s)")
+        return stats
+
     except Exception as e:
         logger.error(f"Error loading CSV data: {e}")
         db.rollback()
     finally:
         db.close()
+        if refresh:
+            refresh_indexes()
+        bump_dataset_version()
+
+
+if __name__ == "__main__":
+    # python -m app.data_loader sync [csv_file]
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) > 1 and sys.argv[1] == "sync":
+        sync_csv_data(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        load_csv_data(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,27 @@
+import hashlib
+import threading
+
+# Incremented every time the vendor data is (re)loaded. Anything derived from
+# the data, such as cached query results, is only valid for the version it was built from.
+_version = 0
+_lock = threading.Lock()
+
+
+def get_dataset_version() -> int:
+    return _version
+
+
+def bump_dataset_version() -> int:
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def content_hash(records) -> str:
+    """Digest of the vendor rows themselves, identical in every process that loaded the same data."""
+    digest = hashlib.sha256()
+    for record in records:
+        digest.update(repr(tuple(vars(record).values())).encode())
+        digest.update(b"\n")
+    return digest.hexdigest()
@@ -1,6 +1,12 @@
-from .db import SessionLocal
+import hashlib
+import hmac
+from .config import settings
+from .db import SessionLocal, AsyncSessionLocal
+from .indexes import get_indexes
+from .cache import nearby_cache
+from .startup import startup_state
 from sqlalchemy.orm import Session
-from fastapi import Depends
+from fastapi import Depends, Header, HTTPException, Request, Response
 
 def get_db():
     db = SessionLocal()
@@ -8,3 +14,51 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def require_ready():
+    """Turn requests away with 503 until the startup warm-up has loaded the data and built the indexes."""
+    if not startup_state.ready:
+        raise HTTPException(503, detail="Service is starting up",
+                            headers={"Retry-After": str(settings.startup_retry_after_seconds)})
+
+async def require_admin(x_admin_token: str = Header("")):
+    """Guard for /admin endpoints: the request must carry settings.admin_token in X-Admin-Token. Closed while it is unset."""
+    if not settings.admin_token:
+        raise HTTPException(403, detail="Admin endpoints are disabled, set ADMIN_TOKEN to enable them")
+    if not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(403, detail="Admin token required")
+
+async def get_vendor_indexes():
+    """In-memory indexes for the current dataset, or None to fall back to SQL."""
+    return get_indexes()
+
+async def get_nearby_cache():
+    return nearby_cache
+
+async def check_etag(request: Request, response: Response, indexes = Depends(get_vendor_indexes)):
+    """
+    Tag GET responses with a strong ETag derived from the dataset content and the query,
+    and answer a matching If-None-Match with 304 before the route runs its query.
+    """
+    if indexes is None:
+        return
+    if "open_now" in request.query_params:
+        # The answer changes with the clock, not just with the dataset
+        response.headers["Cache-Control"] = "no-store"
+        return
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    # The same query answers as a JSON array or as NDJSON, depending on Accept
+    seed = f"{indexes.content_hash}:{request.url.path}?{query}:{request.headers.get('accept', '')}"
+    etag = f'"{hashlib.sha256(seed.encode()).hexdigest()[:32]}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={settings.http_cache_max_age}", "Vary": "Accept"}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            raise HTTPException(304, headers=headers)
+    response.headers.update(headers)
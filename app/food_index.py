@@ -0,0 +1,136 @@
+import math
+import re
+from functools import lru_cache
+import numpy as np
+from .constants import APPROVED
+from .rows import as_rows
+from .stemmer import stem
+
+# Okapi BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+WORD = re.compile(r"[a-z0-9]+")
+# Connectives and the filler words permits use in place of a menu ("various", "etc.")
+STOPWORDS = frozenset({
+    "a", "all", "an", "and", "any", "as", "assorted", "at", "by", "eg", "etc", "for", "from", "in",
+    "including", "item", "items", "kind", "kinds", "of", "on", "or", "other", "others", "the", "to",
+    "type", "types", "variety", "various", "with",
+})
+
+
+# Menus repeat a small vocabulary, so most words are stemmed once per index build
+cached_stem = lru_cache(maxsize=65536)(stem)
+
+
+def analyze(text: str):
+    """Index terms of a text: lowercase words, stopwords dropped, Porter stemmed."""
+    if not text:
+        return []
+    return [cached_stem(word) for word in WORD.findall(text.lower()) if word not in STOPWORDS]
+
+
+def intersect(positions, posting):
+    """Members of the sorted array positions that are also in the sorted array posting."""
+    if not len(positions) or not len(posting):
+        return positions[:0]
+    found = np.searchsorted(posting, positions)
+    found[found == len(posting)] = 0
+    return positions[posting[found] == positions]
+
+
+class FoodIndex:
+    """
+    Inverted index over the food items of vendor records, ranked with BM25. Postings are
+    kept compact: one sorted int32 array of record positions and one array of term
+    frequencies for the whole index, with each term owning a slice of both.
+
+    A query matches records that contain every query term. The posting lists are
+    intersected smallest first, by binary search into the longer lists, so the cost
+    follows the rarest term rather than the number of vendors.
+    """
+
+    def __init__(self, records):
+        self.rows = as_rows(records)
+        food_items = self.rows.column("food_items")
+        self._rows_of = np.array([row for row, items in enumerate(food_items) if items], dtype=np.int64)
+        self._positions = {vendor_id: position for position, vendor_id in enumerate(self.rows.ids[self._rows_of].tolist())}
+        self._approved = self.rows.status_is(APPROVED)[self._rows_of]
+
+        postings = {}
+        lengths = []
+        for position, row in enumerate(self._rows_of.tolist()):
+            terms = analyze(food_items[row])
+            lengths.append(len(terms))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((position, count))
+
+        self._lengths = np.array(lengths, dtype=np.float64)
+        self._average_length = float(self._lengths.mean()) if lengths and self._lengths.sum() else 1.0
+        self._slices = {}
+        self._idf = {}
+        docs, frequencies = [], []
+        count = len(self._rows_of)
+        for term, entries in postings.items():
+            start = len(docs)
+            docs.extend(position for position, _ in entries)
+            frequencies.extend(frequency for _, frequency in entries)
+            self._slices[term] = (start, len(docs))
+            self._idf[term] = math.log(1 + (count - len(entries) + 0.5) / (len(entries) + 0.5))
+        self._docs = np.array(docs, dtype=np.int32)
+        self._frequencies = np.array(frequencies, dtype=np.float64)
+
+    def __len__(self):
+        return len(self._rows_of)
+
+    @property
+    def term_count(self) -> int:
+        return len(self._slices)
+
+    def _posting(self, term):
+        start, end = self._slices[term]
+        return self._docs[start:end], self._frequencies[start:end]
+
+    def positions_of(self, records):
+        """Sorted positions of those records that are in the index, to restrict a search to them."""
+        positions = [self._positions[r.id] for r in records if r.id in self._positions]
+        return np.array(sorted(positions), dtype=np.int32)
+
+    def search(self, query: str, all_status: bool = False, within=None, limit: int = None):
+        """
+        (record, score) for records matching every term of query, best first and then by id.
+        within, from positions_of(), restricts the search to those records.
+        """
+        terms = list(dict.fromkeys(analyze(query)))
+        if not terms or any(term not in self._slices for term in terms):
+            return []
+        postings = sorted((self._posting(term) + (self._idf[term],) for term in terms), key=lambda p: len(p[0]))
+
+        matches = postings[0][0]
+        if within is not None:
+            matches = intersect(within, matches)
+        for docs, _, _ in postings[1:]:
+            if not len(matches):
+                return []
+            matches = intersect(matches, docs)
+        if not all_status:
+            matches = matches[self._approved[matches]]
+        if not len(matches):
+            return []
+
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[matches] / self._average_length)
+        scores = np.zeros(len(matches))
+        for docs, frequencies, idf in postings:
+            tf = frequencies[np.searchsorted(docs, matches)]
+            scores += idf * tf * (BM25_K1 + 1) / (tf + norms)
+
+        if limit is not None and limit < len(matches):
+            # Everything scoring at least the limit-th best, so ties at the cut are settled by id
+            cut = -np.partition(-scores, limit - 1)[limit - 1]
+            keep = scores >= cut
+            matches, scores = matches[keep], scores[keep]
+        order = np.lexsort((matches, -scores))[:limit]
+        return [(self.rows[int(self._rows_of[position])], float(scores[i])) for i, position in zip(order, matches[order].tolist())]
@@ -0,0 +1,78 @@
+from math import cos, degrees, radians
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+PAIRS_PER_CHUNK = 1 << 20
+
+# Polygons and routes are city-sized, so distances are measured in a local equirectangular
+# projection around the shape: x and y in km, exact to well under a meter over a few km.
+
+
+def polygon_bounds(vertices):
+    """(min_lat, max_lat, min_long, max_long) of a list of (lat, long), in the order of get_bounding_box."""
+    lats = [lat for lat, _ in vertices]
+    longs = [long for _, long in vertices]
+    return min(lats), max(lats), min(longs), max(longs)
+
+
+def expand_bounds(bounds: tuple, km: float):
+    """Grow a (min_lat, max_lat, min_long, max_long) box by km on every side."""
+    min_lat, max_lat, min_long, max_long = bounds
+    delta_lat = degrees(km / EARTH_RADIUS_KM)
+    # Longitude degrees are shortest at the latitude furthest from the equator
+    widest = min(max(abs(min_lat), abs(max_lat)) + delta_lat, 89.9)
+    delta_long = degrees(km / (EARTH_RADIUS_KM * cos(radians(widest))))
+    return min_lat - delta_lat, max_lat + delta_lat, min_long - delta_long, max_long + delta_long
+
+
+def points_in_polygon(lats, longs, vertices):
+    """
+    Boolean mask of the points inside the polygon, by even-odd ray casting, one pass per edge
+    vectorized over all points. vertices is a list of (lat, long); the ring closes itself.
+    Points exactly on an edge may fall either way.
+    """
+    y = np.asarray(lats, dtype=np.float64)
+    x = np.asarray(longs, dtype=np.float64)
+    inside = np.zeros(len(y), dtype=bool)
+    ring = np.asarray(vertices, dtype=np.float64)
+    for (y1, x1), (y2, x2) in zip(ring, np.roll(ring, -1, axis=0)):
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        edge_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < edge_x)
+    return inside
+
+
+def distances_to_path(lats, longs, path):
+    """
+    (distance_km, along_km) per point: the distance to the nearest point of the polyline path,
+    a list of (lat, long), and how far along the path that nearest point lies.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    longs = np.asarray(longs, dtype=np.float64)
+    vertices = np.asarray(path, dtype=np.float64)
+    origin_lat, origin_long = vertices[:, 0].mean(), vertices[:, 1].mean()
+    scale_x = radians(1) * EARTH_RADIUS_KM * cos(radians(origin_lat))
+    scale_y = radians(1) * EARTH_RADIUS_KM
+
+    px, py = (longs - origin_long) * scale_x, (lats - origin_lat) * scale_y
+    vx, vy = (vertices[:, 1] - origin_long) * scale_x, (vertices[:, 0] - origin_lat) * scale_y
+    ax, ay, dx, dy = vx[:-1], vy[:-1], np.diff(vx), np.diff(vy)
+    lengths = np.hypot(dx, dy)
+    starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+    squared = np.where(lengths > 0, dx * dx + dy * dy, 1.0)
+
+    best = np.empty(len(lats))
+    along = np.empty(len(lats))
+    # Points by segments at once, in chunks that keep each matrix around a million cells
+    chunk = max(1, PAIRS_PER_CHUNK // len(ax))
+    for start in range(0, len(lats), chunk):
+        x, y = px[start:start + chunk, None], py[start:start + chunk, None]
+        t = np.clip(((x - ax) * dx + (y - ay) * dy) / squared, 0.0, 1.0)
+        distance = np.hypot(x - (ax + t * dx), y - (ay + t * dy))
+        nearest = distance.argmin(axis=1)
+        rows = np.arange(len(nearest))
+        best[start:start + chunk] = distance[rows, nearest]
+        along[start:start + chunk] = starts[nearest] + t[rows, nearest] * lengths[nearest]
+    return best, along
@@ -0,0 +1,120 @@
+import logging
+import os
+from typing import Optional
+from .config import settings, database_id
+from .db import SessionLocal
+from .models import VendorApplication, VendorRecord
+from .spatial_index import SpatialIndex
+from .name_index import NameIndex
+from .ngram_index import NgramIndex
+from .food_index import FoodIndex
+from .tiles import TilePyramid
+from .trie import PrefixIndex
+from .dataset import content_hash
+from .serialization import FragmentCache
+from .rows import SnapshotRows, as_rows
+from .snapshot import VendorSnapshot, SnapshotError, read_header, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class VendorIndexes:
+    """
+    Read-only in-memory indexes built from one snapshot of the vendor table. records is a list
+    of VendorRecord or the SnapshotRows of a mapped snapshot; every index refers to its rows by
+    position, so over a snapshot the coordinates and statuses stay in the shared file.
+    """
+
+    def __init__(self, records, digest: str = None):
+        self.records = as_rows(records)
+        # A snapshot carries the digest of its records, so it need not be recomputed
+        self.content_hash = digest or content_hash(self.records)
+        self.spatial = SpatialIndex(self.records, settings.spatial_cell_degrees)
+        self.names = NameIndex(self.records)
+        self.addresses = NgramIndex(self.records)
+        statuses = self.records.column("status")
+        self.name_completions = PrefixIndex(zip(self.records.column("applicant_name"), statuses),
+                                            settings.autocomplete_max_results)
+        self.address_completions = PrefixIndex(zip(self.records.column("address"), statuses),
+                                               settings.autocomplete_max_results)
+        self.food = FoodIndex(self.records)
+        self.tiles = TilePyramid(self.spatial, settings.tile_max_zoom, settings.tile_cluster_bits)
+        self.fragments = FragmentCache()
+
+
+_current: Optional[VendorIndexes] = None
+
+
+def build_indexes(db) -> VendorIndexes:
+    records = [VendorRecord.from_orm(vendor) for vendor in db.query(VendorApplication).order_by(VendorApplication.id)]
+    return VendorIndexes(records)
+
+
+def refresh_indexes(db=None) -> VendorIndexes:
+    """Rebuild the indexes from the database and publish them for new requests."""
+    own_session = db is None
+    if own_session:
+        db = SessionLocal()
+    try:
+        indexes = build_indexes(db)
+    finally:
+        if own_session:
+            db.close()
+    publish_indexes(indexes)
+    logger.info(f"Built in-memory indexes over {len(indexes.records)} vendor records")
+    save_snapshot(indexes)
+    return indexes
+
+
+def publish_indexes(indexes: VendorIndexes):
+    """
+    Make indexes the ones new requests get. A single reference swap: requests already running
+    keep the indexes they started with, and the old ones are freed once the last of them ends.
+    """
+    global _current
+    _current = indexes
+
+
+def save_snapshot(indexes: VendorIndexes, path: str = None):
+    """Publish the records as the shared snapshot file, unless it already holds this exact data."""
+    path = path or settings.snapshot_file
+    if not path:
+        return
+    database = database_id(settings.database_url)
+    header = read_header(path)
+    if header and header.get("content_hash") == indexes.content_hash and header.get("database") == database:
+        return
+    try:
+        write_snapshot(indexes.records, path, indexes.content_hash, database)
+    except OSError as e:
+        # Workers can still build from the database, so a read-only disk is not fatal
+        logger.warning(f"Could not write vendor snapshot {path}: {e}")
+
+
+def load_snapshot_indexes(path: str = None) -> Optional[VendorIndexes]:
+    """
+    Build and publish the indexes from the snapshot file, without touching the database. None if unusable.
+    The spatial grid and tile pyramid read ids, coordinates and statuses from the mapped columns, and a
+    row's VendorRecord is only decoded once a query returns it. The text indexes still hold their own
+    terms, decoded from the string columns while they are built.
+    """
+    path = path or settings.snapshot_file
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        snapshot = VendorSnapshot(path)
+    except SnapshotError as e:
+        logger.warning(f"Ignoring vendor snapshot: {e}")
+        return None
+    if snapshot.database != database_id(settings.database_url):
+        logger.warning(f"Ignoring vendor snapshot {path}: it was written from another database")
+        return None
+    indexes = VendorIndexes(SnapshotRows(snapshot), snapshot.content_hash)
+    publish_indexes(indexes)
+    logger.info(f"Built in-memory indexes over {len(snapshot)} vendor records from snapshot generation {snapshot.generation}")
+    return indexes
+
+
+def get_indexes() -> Optional[VendorIndexes]:
+    """Current indexes, or None until the first refresh_indexes()."""
+    return _current
@@ -1,34 +1,55 @@
-from fastapi import FastAPI
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from .startup import startup_state, warm_up
 from .routes import router as api_router
-from .db import engine, Base
-from .data_loader import load_csv_data
+from .dependencies import require_ready, require_admin
+from .reload import reload_state, reload_dataset, SnapshotWatcher
 import logging
-from .db import SessionLocal
+from .db import AsyncSessionLocal
+from sqlalchemy import select, func
 from .models import VendorApplication
 import os
 from .config import settings
+from .cache import nearby_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="My FastAPI App")
+PROBE_PATHS = {"/live", "/ready"}
 
-# Create database tables on startup
-try:
-    logger.info("Creating database tables...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-    
-    # Load initial data from CSV
-    logger.info("Loading initial data...")
-    load_csv_data()
-    logger.info("Data loading completed")
-    
-except Exception as e:
-    logger.error(f"Error during startup: {e}")
-    raise
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Picks up reloads that another worker published through the snapshot file
+    watcher = SnapshotWatcher()
+    watcher.start()
+    try:
+        if startup_state.ready:
+            # Preloaded by the gunicorn master before it forked this worker (see app/server.py)
+            logger.info("Serving indexes inherited from the parent process")
+            yield
+            return
+        # Schema creation, CSV loading and index building run in the background so the
+        # worker answers /live straight away; /ready and the API wait for warm_up to finish
+        logger.info("Starting background warm-up...")
+        task = asyncio.create_task(asyncio.to_thread(warm_up, startup_state))
+        yield
+        await task
+    finally:
+        watcher.stop()
+
+app = FastAPI(title="My FastAPI App", lifespan=lifespan)
+
+@app.middleware("http")
+async def track_first_request(request: Request, call_next):
+    response = await call_next(request)
+    if request.url.path not in PROBE_PATHS and response.status_code < 500:
+        startup_state.record_request()
+    return response
 
 # Add CORS middleware
 app.add_middleware(
@@ -37,18 +58,46 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
-app.include_router(api_router)
+app.include_router(api_router, dependencies=[Depends(require_ready)])
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe: the process is up. Fails only if the startup warm-up crashed, so the worker gets restarted."""
+    if startup_state.error:
+        return JSONResponse(status_code=503, content=startup_state.summary())
+    return {"status": "alive"}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 once the data is loaded and the in-memory indexes are warm, 503 before that."""
+    return JSONResponse(status_code=200 if startup_state.ready else 503, content=startup_state.summary())
+
+@app.post("/admin/reload", status_code=202, dependencies=[Depends(require_ready), Depends(require_admin)])
+async def start_reload():
+    """
+    Sync the database with the CSV and rebuild the indexes in the background, then swap them in.
+    Requests keep being served from the current data until the swap. Poll GET /admin/reload for the report.
+    """
+    if not reload_state.try_start():
+        return JSONResponse(status_code=409, content={"detail": "A reload is already running", **reload_state.summary()})
+    threading.Thread(target=reload_dataset, name="dataset-reload", daemon=True).start()
+    return {"status": "started"}
+
+@app.get("/admin/reload", dependencies=[Depends(require_admin)])
+async def get_reload_status():
+    """Whether a reload is running, and the report of the last one: counts, build duration and memory delta."""
+    return reload_state.summary()
 
 # Add a simple health check directly to the app
 @app.get("/health")
 async def health_check():
     """Simple health check"""
     try:
-        db = SessionLocal()
-        count = db.query(VendorApplication).count()
-        db.close()
+        async with AsyncSessionLocal() as db:
+            count = await db.scalar(select(func.count()).select_from(VendorApplication))
         
         return {
             "status": "healthy", 
@@ -67,15 +116,12 @@ async def health_check():
 async def get_sample_data():
     """Get sample data to debug what's in the database"""
     try:
-        db = SessionLocal()
-        
-        # Get first 5 records
-        samples = db.query(VendorApplication).limit(5).all()
-        
-        # Get facility types
-        facility_types = db.query(VendorApplication.facility_type).distinct().all()
-        
-        db.close()
+        async with AsyncSessionLocal() as db:
+            # Get first 5 records
+            samples = (await db.execute(select(VendorApplication).limit(5))).scalars().all()
+
+            # Get facility types
+            facility_types = (await db.execute(select(VendorApplication.facility_type).distinct())).all()
         
         return {
             "sample_records": [
@@ -92,6 +138,11 @@ async def get_sample_data():
         logger.error(f"Debug endpoint failed: {e}")
         return {"error": str(e)}
 
+@app.get("/debug/nearby-cache")
+async def get_nearby_cache_stats():
+    """Hit/miss/eviction counters of the /applications/nearby result cache"""
+    return nearby_cache.stats()
+
 @app.get("/debug/db-info")
 async def get_db_info():
     """Get database connection info"""
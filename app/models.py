@@ -1,15 +1,145 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, ForeignKey, Index, DDL, event, table, column
 from .db import Base
+from .utils import normalize_name
+
+def name_key_default(context):
+    return normalize_name(context.get_current_parameters().get("applicant_name"))
 
 class VendorApplication(Base):
     __tablename__ = "food_vendor_application"
 
     id = Column(Integer, primary_key=True, index=True)
     applicant_name = Column(String, index=True)
+    # normalize_name(applicant_name), so exact name lookups can use a plain index
+    name_key = Column(String, index=True, default=name_key_default)
     facility_type = Column(String)
     status = Column(String)
     address = Column(String)
+    # Colon-separated menu from the permit's FoodItems column
+    food_items = Column(String)
+    # Weekly opening hours from the dayshours column, e.g. "Mo-Fr:11AM-3PM"; parsed by app.schedule
+    dayshours = Column(String)
     latitude = Column(Float)
     longitude = Column(Float)
     approved = Column(DateTime, nullable=True)
     expiration_date = Column(DateTime, nullable=True)
+    # Source keys and content hash from the permit CSV, used by incremental sync
+    location_id = Column(Integer, nullable=True)
+    permit = Column(String, nullable=True)
+    row_hash = Column(String, nullable=True)
+
+    __table_args__ = (
+        Index("ix_food_vendor_application_source_key", "location_id", "permit"),
+    )
+
+# On PostgreSQL, back the address ILIKE '%...%' search with a pg_trgm GIN index. Run by
+# startup.prepare_database on every start rather than on create_all, so databases restored
+# from a dump, whose table already exists, get the index too
+ADDRESS_TRIGRAM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_food_vendor_application_address_trgm "
+    "ON food_vendor_application USING gin (address gin_trgm_ops)",
+)
+
+class CurrentVendor(Base):
+    """
+    Latest application per (latitude, longitude, applicant_name), materialized at ingest by
+    data_loader.refresh_current_vendors. Each location appears once for all_status=True, over
+    every application, and once for all_status=False, over approved applications only.
+    """
+    __tablename__ = "current_vendor"
+
+    id = Column(Integer, primary_key=True)
+    application_id = Column(Integer, ForeignKey("food_vendor_application.id", ondelete="CASCADE"), nullable=False)
+    all_status = Column(Boolean, nullable=False)
+    latitude = Column(Float, nullable=False)
+    longitude = Column(Float, nullable=False)
+
+    __table_args__ = (
+        # Bounding-box scans within one status scope
+        Index("ix_current_vendor_scope_location", "all_status", "latitude", "longitude"),
+        Index("ix_current_vendor_application_id", "application_id"),
+    )
+
+# Spatial index over current_vendor coordinates, picked by database backend:
+# SQLite keeps an R*Tree virtual table that data_loader.refresh_current_vendors fills,
+# PostgreSQL a GiST index on point(longitude, latitude) that maintains itself.
+# The R*Tree's third dimension is the status scope (0 approved-only, 1 all statuses),
+# so one box search answers both kinds of nearby query.
+current_vendor_rtree = table("current_vendor_rtree", column("id"), column("min_lat"), column("max_lat"),
+                             column("min_long"), column("max_long"), column("min_scope"), column("max_scope"))
+
+event.listen(CurrentVendor.__table__, "after_create",
+             DDL("CREATE VIRTUAL TABLE IF NOT EXISTS current_vendor_rtree "
+                 "USING rtree(id, min_lat, max_lat, min_long, max_long, min_scope, max_scope)").execute_if(dialect="sqlite"))
+event.listen(CurrentVendor.__table__, "before_drop",
+             DDL("DROP TABLE IF EXISTS current_vendor_rtree").execute_if(dialect="sqlite"))
+event.listen(CurrentVendor.__table__, "after_create",
+             DDL("CREATE INDEX IF NOT EXISTS ix_current_vendor_location_gist "
+                 "ON current_vendor USING gist (point(longitude, latitude))").execute_if(dialect="postgresql"))
+
+class OpenInterval(Base):
+    """
+    One opening window of an application, in minutes of the week (Monday 00:00 = 0, end
+    exclusive), parsed from dayshours at ingest by data_loader.refresh_open_intervals, so
+    SQL queries can filter on "open at" with an indexed range check.
+    """
+    __tablename__ = "vendor_open_interval"
+
+    id = Column(Integer, primary_key=True)
+    application_id = Column(Integer, ForeignKey("food_vendor_application.id", ondelete="CASCADE"), nullable=False)
+    start_minute = Column(Integer, nullable=False)
+    end_minute = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("ix_vendor_open_interval_application_start", "application_id", "start_minute", "end_minute"),
+    )
+
+class SyncLog(Base):
+    __tablename__ = "sync_log"
+
+    id = Column(Integer, primary_key=True, index=True)
+    csv_file = Column(String)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    rows_seen = Column(Integer, default=0)
+    inserted = Column(Integer, default=0)
+    updated = Column(Integer, default=0)
+    deleted = Column(Integer, default=0)
+    unchanged = Column(Integer, default=0)
+    rejected = Column(Integer, default=0)
+
+
+@dataclass(frozen=True)
+class VendorRecord:
+    """Detached, read-only copy of a VendorApplication row used by the in-memory indexes."""
+    id: int
+    applicant_name: str
+    facility_type: str
+    status: str
+    address: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    approved: Optional[datetime] = None
+    expiration_date: Optional[datetime] = None
+    food_items: Optional[str] = None
+    dayshours: Optional[str] = None
+
+    @classmethod
+    def from_orm(cls, vendor: VendorApplication) -> "VendorRecord":
+        return cls(
+            id=vendor.id,
+            applicant_name=vendor.applicant_name,
+            facility_type=vendor.facility_type,
+            status=vendor.status,
+            address=vendor.address,
+            latitude=vendor.latitude,
+            longitude=vendor.longitude,
+            approved=vendor.approved,
+            expiration_date=vendor.expiration_date,
+            food_items=vendor.food_items,
+            dayshours=vendor.dayshours,
+        )
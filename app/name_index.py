@@ -0,0 +1,56 @@
+from collections import defaultdict
+from .bktree import BKTree
+from .constants import APPROVED
+from .rows import as_rows
+from .utils import normalize_name
+from .schedule import is_open
+
+
+class NameIndex:
+    """Hash map from normalize_name(applicant_name) to vendor rows, for O(1) exact name lookups."""
+
+    def __init__(self, records):
+        self.rows = as_rows(records)
+        self._by_key = defaultdict(list)
+        for position, name in enumerate(self.rows.column("applicant_name")):
+            key = normalize_name(name)
+            if key:
+                self._by_key[key].append(position)
+        self._by_key = dict(self._by_key)
+
+        # Fuzzy matching compares against every word-start suffix, so "geez freez" finds "the geez freeze"
+        self._suffix_owners = defaultdict(set)
+        for key in self._by_key:
+            words = key.split()
+            for start in range(len(words)):
+                self._suffix_owners[" ".join(words[start:])].add(key)
+        self._fuzzy = BKTree(self._suffix_owners)
+
+    def lookup(self, name: str, all_status: bool = False, open_at: int = None):
+        """
+        Same rows as the SQL lookup: lower(applicant_name) == name, approved only unless all_status,
+        and open at minute of the week open_at if given.
+        """
+        return [
+            record
+            for record in (self.rows[position] for position in self._by_key.get(normalize_name(name), ()))
+            if record.applicant_name.lower() == name and (all_status or record.status == APPROVED)
+            and (open_at is None or is_open(record.dayshours, open_at))
+        ]
+
+    def fuzzy_lookup(self, name: str, max_distance: int, all_status: bool = False, open_at: int = None):
+        """(record, distance) for names within max_distance edits of name, closest first, optionally open at a minute of the week."""
+        best = {}
+        for suffix, distance in self._fuzzy.search(normalize_name(name), max_distance):
+            for key in self._suffix_owners[suffix]:
+                if distance < best.get(key, max_distance + 1):
+                    best[key] = distance
+        matches = [
+            (record, distance)
+            for key, distance in best.items()
+            for record in (self.rows[position] for position in self._by_key[key])
+            if (all_status or record.status == APPROVED)
+            and (open_at is None or is_open(record.dayshours, open_at))
+        ]
+        matches.sort(key=lambda match: (match[1], match[0].id))
+        return matches
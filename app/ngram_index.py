@@ -0,0 +1,45 @@
+from .constants import FOOD_TRUCK
+from .rows import as_rows
+
+MAX_GRAM = 3
+
+
+def ngrams(text: str, n: int):
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NgramIndex:
+    """
+    Inverted index from 1- to 3-character grams of the lowercased address to food truck rows.
+    A query of up to 3 characters is answered by one posting list. A longer query intersects the
+    posting lists of its trigrams and then verifies the substring on the survivors.
+    """
+
+    def __init__(self, records):
+        self.rows = as_rows(records)
+        self._rows_of = []
+        self._addresses = []
+        for row, (facility_type, address) in enumerate(zip(self.rows.column("facility_type"), self.rows.column("address"))):
+            if facility_type == FOOD_TRUCK and address:
+                self._rows_of.append(row)
+                self._addresses.append(address.lower())
+        self._postings = {}
+        for position, address in enumerate(self._addresses):
+            for n in range(1, MAX_GRAM + 1):
+                for gram in ngrams(address, n):
+                    self._postings.setdefault(gram, []).append(position)
+
+    def search(self, contains: str):
+        """Food trucks whose address contains `contains`, case-insensitively, in id order."""
+        contains = contains.lower()
+        if len(contains) <= MAX_GRAM:
+            positions = self._postings.get(contains, [])
+        else:
+            postings = sorted((self._postings.get(gram, []) for gram in ngrams(contains, MAX_GRAM)), key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                if not candidates:
+                    break
+                candidates.intersection_update(posting)
+            positions = sorted(p for p in candidates if contains in self._addresses[p])
+        return [self.rows[self._rows_of[p]] for p in positions]
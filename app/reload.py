@@ -0,0 +1,152 @@
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+from datetime import datetime
+from .config import settings, database_id
+from .db import SessionLocal
+from .data_loader import sync_csv_data
+from .dataset import bump_dataset_version
+from .indexes import build_indexes, get_indexes, publish_indexes, save_snapshot, load_snapshot_indexes
+from .snapshot import SNAPSHOT_FORMAT, read_header
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process, or its peak where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in KB on Linux and bytes on macOS; either way it is only an upper bound
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ReloadState:
+    """The reload in progress, if any, and the report of the last one, for /admin/reload."""
+
+    def __init__(self):
+        self.last = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def try_start(self) -> bool:
+        return self._lock.acquire(blocking=False)
+
+    def finish(self, report: dict):
+        self.last = report
+        self._lock.release()
+
+    def summary(self):
+        return {"running": self.running, "last": self.last}
+
+
+reload_state = ReloadState()
+
+
+def reload_dataset(csv_file: str = None, state: ReloadState = reload_state) -> dict:
+    """
+    Sync the database with the CSV and, if anything changed, build a second set of indexes
+    beside the live ones and swap it in with publish_indexes. Requests never see an empty or
+    half-built dataset: until the swap they are answered from the old indexes, after it from
+    the new. Call after state.try_start(); returns the report also kept in state.last.
+    """
+    csv_file = csv_file or settings.csv_file
+    report = {"started_at": datetime.now().isoformat(), "csv_file": csv_file, "swapped": False, "error": None}
+    started = time.perf_counter()
+    rss_before = rss_bytes()
+    try:
+        log = sync_csv_data(csv_file, refresh=False)
+        report.update(inserted=log.inserted, updated=log.updated, deleted=log.deleted,
+                      unchanged=log.unchanged, rejected=log.rejected,
+                      sync_seconds=round(time.perf_counter() - started, 3))
+        previous = get_indexes()
+        if log.inserted or log.updated or log.deleted or previous is None:
+            build_started = time.perf_counter()
+            with SessionLocal() as db:
+                indexes = build_indexes(db)
+            report["build_seconds"] = round(time.perf_counter() - build_started, 3)
+            # Old and new indexes are both alive here: the double-buffering peak
+            rss_built = rss_bytes()
+
+            # Cached nearby candidates carry the content hash of their indexes, so requests that
+            # resolved the old ones before this swap cannot leave stale entries for the new ones
+            publish_indexes(indexes)
+            version = bump_dataset_version()
+            report.update(swapped=True, dataset_version=version, records=len(indexes.records),
+                          previous_records=len(previous.records) if previous else None,
+                          rss_built_mb=round(rss_built / MB, 1))
+            save_snapshot(indexes)
+            del previous, indexes
+            gc.collect()
+    except Exception as e:
+        logger.exception(f"Reload of {csv_file} failed, still serving the previous data")
+        report["error"] = str(e)
+
+    rss_after = rss_bytes()
+    report.update(total_seconds=round(time.perf_counter() - started, 3), rss_before_mb=round(rss_before / MB, 1),
+                  rss_after_mb=round(rss_after / MB, 1), rss_delta_mb=round((rss_after - rss_before) / MB, 1))
+    logger.info(f"Reload finished: {report}")
+    state.finish(report)
+    return report
+
+
+class SnapshotWatcher:
+    """
+    Background thread that keeps a worker on the latest snapshot file. A reload runs in the
+    one worker that received it, which publishes a new snapshot; the others see its content
+    hash change within settings.snapshot_watch_seconds and swap in indexes built from it.
+    """
+
+    def __init__(self, interval: float = None, path: str = None):
+        self.interval = settings.snapshot_watch_seconds if interval is None else interval
+        self.path = path or settings.snapshot_file
+        self._stop = threading.Event()
+        self._thread = None
+        self._generation = None
+
+    def start(self):
+        if self.interval <= 0 or not self.path:
+            return
+        self._thread = threading.Thread(target=self._run, name="snapshot-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def check(self) -> bool:
+        """Swap in the snapshot's indexes if a new generation holds other data than this worker's. True if it did."""
+        current = get_indexes()
+        # Mid-reload this worker is about to write the snapshot itself
+        if current is None or reload_state.running:
+            return False
+        header = read_header(self.path)
+        if not header or header.get("format") != SNAPSHOT_FORMAT or header.get("generation") == self._generation:
+            return False
+        if header.get("database") != database_id(settings.database_url):
+            return False
+        self._generation = header.get("generation")
+        if header.get("content_hash") == current.content_hash:
+            return False
+        if load_snapshot_indexes(self.path) is None:
+            return False
+        # Only clears the old entries: the nearby cache is keyed on the indexes' content hash
+        bump_dataset_version()
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.warning(f"Snapshot check failed: {e}")
@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from .dependencies import get_db
-from .services import get_vendors_by_name, get_vendors_by_address, get_vendors_nearby
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .dependencies import get_async_db, get_vendor_indexes, get_nearby_cache, check_etag
+from .services import get_vendors_nearby, get_vendors_nearest, get_vendors_nearby_batch, get_completions, get_vendors_by_name_fuzzy
+from .services import search_food_items, resolve_open_at, get_vendors_in_polygon, get_vendors_along_route
+from .services import get_tile_clusters
+from .services import clean_name, clean_address_search, page_by_id, vendors_by_name_query, vendors_by_address_query, stream_vendor_rows
+from .serialization import response_columns, encode_row, encode_vendor, json_array
+from .config import settings
 from sqlalchemy import func
 import logging
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, ValidationError
+from typing import Any, List, Literal, Optional, Union
 from datetime import datetime
 
 
@@ -14,6 +21,19 @@ logger.setLevel(logging.DEBUG)
 
 router = APIRouter()
 
+# Handlers are async and reach the database through an AsyncSession. The service functions are
+# shared with the sync code paths and run inside the session with run_sync, so their queries go
+# through the async driver instead of blocking the event loop or a threadpool worker.
+
+# Responses only change when the dataset does, so GET routes get ETag / 304 handling
+cacheable = [Depends(check_etag)]
+
+NDJSON = "application/x-ndjson"
+
+# Keyset pagination over vendor id: the cursor is the id of the last row of the previous page
+page_limit = Query(None, ge=1, le=settings.page_max_limit)
+page_cursor = Query(None, ge=0)
+
 # Pydantic Response Models
 class VendorApplicationResponse(BaseModel):
     id: int
@@ -29,22 +49,254 @@ class VendorApplicationResponse(BaseModel):
     class Config:
         from_attributes = True 
 
+class NearbyVendorResponse(VendorApplicationResponse):
+    distance_km: float
+
+class FuzzyVendorResponse(VendorApplicationResponse):
+    distance: int
+
+class FoodVendorResponse(VendorApplicationResponse):
+    food_items: Optional[str] = None
+    score: float
+    distance_km: Optional[float] = None
+
+class CompletionResponse(BaseModel):
+    text: str
+    count: int
+    approved: bool
+
+    class Config:
+        from_attributes = True
+
+class NearbyPoint(BaseModel):
+    lat: float
+    long: float
+    all_status: bool = False
+
+class NearbyBatchResult(BaseModel):
+    results: List[VendorApplicationResponse] = []
+    error: Optional[str] = None
+
+class TileCluster(BaseModel):
+    x: int
+    y: int
+    count: int
+    latitude: float
+    longitude: float
+    # Set when the cluster is a single vendor
+    vendor_id: Optional[int] = None
+
+class TileClustersResponse(BaseModel):
+    zoom: int
+    cluster_zoom: int
+    min_x: int
+    max_x: int
+    min_y: int
+    max_y: int
+    clusters: List[TileCluster]
+
+class Coordinate(BaseModel):
+    lat: float
+    long: float
+
+class PolygonQuery(BaseModel):
+    polygon: List[Coordinate]
+    all_status: bool = False
+
+class RouteQuery(BaseModel):
+    path: List[Coordinate]
+    distance_m: float = Field(200.0, gt=0, le=settings.route_max_distance_m)
+    all_status: bool = False
+
+
+# List endpoints skip per-row response model validation: rows are encoded straight to JSON
+# (see app/serialization.py), from the indexes' per-vendor fragment cache when the indexes
+# are up, else from tuples of just the response columns. The response_model still documents the schema.
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "")
+
+def encode_vendors(vendors, indexes):
+    return indexes.fragments.encode(vendors) if indexes is not None else [encode_vendor(v) for v in vendors]
+
+def json_response(fragments, response: Response) -> Response:
+    """Send pre-encoded vendors as a JSON array, keeping the headers dependencies set (ETag, Cache-Control)."""
+    return Response(json_array(fragments), media_type="application/json", headers=dict(response.headers))
+
+def ndjson_response(rows, response: Response, indexes) -> StreamingResponse:
+    """Stream vendors as one JSON object per line, from in-memory records or a select() run through a cursor."""
+    async def lines():
+        if isinstance(rows, Select):
+            async for row in stream_vendor_rows(rows):
+                yield encode_row(row) + b"\n"
+        else:
+            for fragment in indexes.fragments.iter_encode(rows):
+                yield fragment + b"\n"
+    return StreamingResponse(lines(), media_type=NDJSON, headers=dict(response.headers))
+
+async def vendor_list_response(rows, limit: Optional[int], response: Response, db: AsyncSession, indexes) -> Response:
+    """One page of in-memory records or a select() as a JSON array. A full page sets X-Next-Cursor."""
+    if isinstance(rows, Select):
+        rows = (await db.execute(response_columns(rows))).all()
+        fragments = [encode_row(row) for row in rows]
+    else:
+        fragments = indexes.fragments.encode(rows)
+    if limit is not None and len(rows) == limit:
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    return json_response(fragments, response)
+
+@router.get("/applications", response_model=List[Union[FuzzyVendorResponse, VendorApplicationResponse]], dependencies=cacheable)
+async def read_vendors(request: Request, response: Response, name: str, all_status: bool = False, fuzzy: bool = False,
+                       open_now: bool = False, open_at: Optional[datetime] = None,
+                       limit: Optional[int] = page_limit, cursor: Optional[int] = page_cursor,
+                       db: AsyncSession = Depends(get_async_db), indexes = Depends(get_vendor_indexes)):
+    """
+    Get vendors by name in id order, a page at a time with limit and cursor (see X-Next-Cursor),
+    or streamed as NDJSON with Accept: application/x-ndjson. open_now or open_at keeps only vendors
+    whose dayshours cover that time. With fuzzy=true, also match misspelled names and report the
+    edit distance, closest first and unpaginated, so limit and cursor are rejected.
+    """
+    logger.debug("read_vendors %s %s %s %s %s %s %s", name, all_status, fuzzy, open_now, open_at, limit, cursor)
+    minute = resolve_open_at(open_now, open_at)
+    if fuzzy:
+        if limit is not None or cursor is not None:
+            raise HTTPException(400, "Fuzzy name search is not paginated, drop limit and cursor")
+        return [
+            FuzzyVendorResponse(**VendorApplicationResponse.model_validate(vendor).model_dump(), distance=distance)
+            for vendor, distance in get_vendors_by_name_fuzzy(name, all_status, indexes, minute)
+        ]
+    name = clean_name(name)
+    rows = (page_by_id(indexes.names.lookup(name, all_status, minute), cursor, limit) if indexes is not None
+            else vendors_by_name_query(name, all_status, cursor, limit, minute))
+    if wants_ndjson(request):
+        return ndjson_response(rows, response, indexes)
+    return await vendor_list_response(rows, limit, response, db, indexes)
+
+@router.get("/applications/autocomplete", response_model=List[CompletionResponse], dependencies=cacheable)
+async def read_completions(prefix: str, field: Literal["name", "address"] = "name",
+                           limit: Optional[int] = Query(None, ge=1, le=settings.autocomplete_max_results),
+                           indexes = Depends(get_vendor_indexes)):
+    """Complete applicant names or addresses from a prefix of any of their words."""
+    logger.debug("read_completions %s %s %s", prefix, field, limit)
+    return get_completions(prefix, field, limit, indexes)
+
+@router.get("/applications/address", response_model=List[VendorApplicationResponse], dependencies=cacheable)
+async def read_vendors_from_address(request: Request, response: Response, contains: str,
+                                    limit: Optional[int] = page_limit, cursor: Optional[int] = page_cursor,
+                                    db: AsyncSession = Depends(get_async_db), indexes = Depends(get_vendor_indexes)):
+    """
+    Get vendors by address containing the specified text, in id order, a page at a time with
+    limit and cursor (see X-Next-Cursor), or streamed as NDJSON with Accept: application/x-ndjson.
+    """
+    logger.debug("read_facilities_from_address %s %s %s", contains, limit, cursor)
+    contains = clean_address_search(contains)
+    rows = (page_by_id(indexes.addresses.search(contains), cursor, limit) if indexes is not None
+            else vendors_by_address_query(contains, cursor, limit))
+    if wants_ndjson(request):
+        return ndjson_response(rows, response, indexes)
+    return await vendor_list_response(rows, limit, response, db, indexes)
+
+@router.get("/applications/food", response_model=List[FoodVendorResponse], dependencies=cacheable)
+async def read_vendors_by_food(q: str, all_status: bool = False, lat: Optional[float] = None, long: Optional[float] = None,
+                               radius_miles: Optional[float] = Query(None, gt=0, le=settings.knn_max_radius_miles),
+                               limit: Optional[int] = Query(None, ge=1, le=settings.food_search_max_results),
+                               indexes = Depends(get_vendor_indexes)):
+    """
+    Search vendors' food items, e.g. q=tacos, best match first. Every word must match, in any
+    form ("taco" finds "Tacos"). With lat and long, only vendors within radius_miles (statute
+    miles) are searched.
+    """
+    logger.debug("read_vendors_by_food %s %s %s %s %s %s", q, all_status, lat, long, radius_miles, limit)
+    return [
+        FoodVendorResponse(**VendorApplicationResponse.model_validate(vendor).model_dump(), food_items=vendor.food_items,
+                           score=round(score, 4), distance_km=distance)
+        for vendor, score, distance in search_food_items(q, indexes, all_status, lat, long, radius_miles, limit)
+    ]
+
+@router.get("/applications/tiles", response_model=TileClustersResponse, dependencies=cacheable)
+async def read_tile_clusters(zoom: int = Query(..., ge=0, le=settings.tile_max_zoom),
+                             min_lat: float = Query(...), max_lat: float = Query(...),
+                             min_long: float = Query(...), max_long: float = Query(...),
+                             all_status: bool = False, indexes = Depends(get_vendor_indexes)):
+    """
+    Vendor counts for a map view: the slippy-map tiles at zoom covering the box, each split into
+    an 8x8 grid of clusters (tiles at cluster_zoom) with their vendor count and mean position.
+    """
+    logger.debug("read_tile_clusters %s (%s, %s, %s, %s) %s", zoom, min_lat, max_lat, min_long, max_long, all_status)
+    (min_x, max_x, min_y, max_y), clusters = get_tile_clusters(zoom, (min_lat, max_lat, min_long, max_long), all_status, indexes)
+    return TileClustersResponse(
+        zoom=zoom, cluster_zoom=zoom + settings.tile_cluster_bits, min_x=min_x, max_x=max_x, min_y=min_y, max_y=max_y,
+        clusters=[TileCluster(x=x, y=y, count=count, latitude=lat, longitude=long, vendor_id=first_id if count == 1 else None)
+                  for x, y, count, lat, long, first_id in clusters],
+    )
+
+@router.get("/applications/nearby", response_model=List[VendorApplicationResponse], dependencies=cacheable)
+async def read_vendors_nearby(response: Response, lat: float, long: float, all_status: bool = False,
+                              open_now: bool = False, open_at: Optional[datetime] = None,
+                              db: AsyncSession = Depends(get_async_db), indexes = Depends(get_vendor_indexes),
+                              cache = Depends(get_nearby_cache)):
+    """Get vendors near the specified coordinates, only those open then with open_now or open_at."""
+    logger.debug("read_vendors_nearby lat: %s long: %s, all_status: %s, open_now: %s, open_at: %s",
+                 lat, long, all_status, open_now, open_at)
+    minute = resolve_open_at(open_now, open_at)
+    vendors = await db.run_sync(lambda session: get_vendors_nearby(lat, long, session, all_status, indexes, cache, minute))
+    return json_response(encode_vendors(vendors, indexes), response)
+
+@router.get("/applications/nearest", response_model=List[NearbyVendorResponse], dependencies=cacheable)
+async def read_vendors_nearest(lat: float, long: float, all_status: bool = False, k: Optional[int] = Query(None, ge=1, le=100),
+                               db: AsyncSession = Depends(get_async_db), indexes = Depends(get_vendor_indexes)):
+    """Get the k nearest vendors to the specified coordinates, with their distance."""
+    logger.debug("read_vendors_nearest lat: %s long: %s, all_status: %s, k: %s", lat, long, all_status, k)
+    nearest = await db.run_sync(lambda session: get_vendors_nearest(lat, long, session, all_status, k, indexes))
+    return [
+        NearbyVendorResponse(**VendorApplicationResponse.model_validate(vendor).model_dump(), distance_km=distance)
+        for vendor, distance in nearest
+    ]
+
+@router.post("/applications/within", response_model=List[VendorApplicationResponse])
+async def read_vendors_in_polygon(query: PolygonQuery, response: Response, db: AsyncSession = Depends(get_async_db),
+                                  indexes = Depends(get_vendor_indexes)):
+    """Get vendors inside a polygon, given as its vertices in order, in id order."""
+    logger.debug("read_vendors_in_polygon %s vertices, all_status: %s", len(query.polygon), query.all_status)
+    polygon = [(point.lat, point.long) for point in query.polygon]
+    vendors = await db.run_sync(lambda session: get_vendors_in_polygon(polygon, session, query.all_status, indexes))
+    return json_response(encode_vendors(vendors, indexes), response)
+
+@router.post("/applications/along", response_model=List[NearbyVendorResponse])
+async def read_vendors_along_route(query: RouteQuery, db: AsyncSession = Depends(get_async_db),
+                                   indexes = Depends(get_vendor_indexes)):
+    """Get vendors within distance_m meters of a path, in the order the path passes them, with their distance."""
+    logger.debug("read_vendors_along_route %s vertices, distance_m: %s, all_status: %s",
+                 len(query.path), query.distance_m, query.all_status)
+    path = [(point.lat, point.long) for point in query.path]
+    along = await db.run_sync(lambda session: get_vendors_along_route(path, query.distance_m, session, query.all_status, indexes))
+    return [
+        NearbyVendorResponse(**VendorApplicationResponse.model_validate(vendor).model_dump(), distance_km=distance)
+        for vendor, distance in along
+    ]
 
-@router.get("/applications", response_model=List[VendorApplicationResponse])
-def read_vendors(name: str, all_status: bool = False, db: Session = Depends(get_db)):
-    """Get vendors by name."""
-    logger.debug("read_vendors %s %s", name, all_status)
-    return get_vendors_by_name(name, db, all_status)
+@router.post("/applications/nearby/batch", response_model=List[NearbyBatchResult])
+async def read_vendors_nearby_batch(points: List[Any] = Body(...), db: AsyncSession = Depends(get_async_db),
+                                    indexes = Depends(get_vendor_indexes)):
+    """Get vendors near each of many coordinates, in input order, with an error per invalid point."""
+    logger.debug("read_vendors_nearby_batch %s points", len(points))
+    if len(points) > settings.nearby_batch_max_points:
+        raise HTTPException(400, f"Batch cannot contain more than {settings.nearby_batch_max_points} points")
 
-@router.get("/applications/address", response_model=List[VendorApplicationResponse])
-def read_vendors_from_address(contains: str, db: Session = Depends(get_db)):
-    """Get vendors by address containing the specified text."""
-    logger.debug("read_facilities_from_address %s", contains)
-    return get_vendors_by_address(contains, db)
+    parsed, errors = [], {}
+    for position, point in enumerate(points):
+        try:
+            parsed.append(NearbyPoint.model_validate(point))
+        except ValidationError as e:
+            errors[position] = "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors())
+            parsed.append(None)
 
-@router.get("/applications/nearby", response_model=List[VendorApplicationResponse])
-def read_vendors_nearby(lat: float, long: float, all_status: bool = False, db: Session = Depends(get_db)):
-    """Get vendors near the specified coordinates."""
-    logger.debug("read_vendors_nearby lat: %s long: %s, all_status: %s", lat, long, all_status)
-    return get_vendors_nearby(lat, long, db, all_status)
+    valid = [position for position, point in enumerate(parsed) if point is not None]
+    queries = [(parsed[p].lat, parsed[p].long, parsed[p].all_status) for p in valid]
+    answers = await db.run_sync(lambda session: get_vendors_nearby_batch(queries, session, indexes))
 
+    response = [NearbyBatchResult(error=errors.get(position)) for position in range(len(points))]
+    for position, (vendors, error) in zip(valid, answers):
+        response[position] = NearbyBatchResult(results=[VendorApplicationResponse.model_validate(v) for v in vendors],
+                                               error=error.detail if error else None)
+    return response
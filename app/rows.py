@@ -0,0 +1,89 @@
+from collections.abc import Sequence
+from functools import cached_property
+import numpy as np
+
+
+class RecordRows(list):
+    """
+    Vendor records in id order, with the columns the spatial index and tile pyramid scan
+    as NumPy arrays. For records built from the database or passed in by a caller.
+    """
+
+    def __init__(self, records=()):
+        super().__init__(sorted(records, key=lambda record: record.id))
+
+    @cached_property
+    def ids(self):
+        return np.array([record.id for record in self], dtype=np.int64)
+
+    @cached_property
+    def latitudes(self):
+        return np.array([np.nan if r.latitude is None else r.latitude for r in self], dtype=np.float64)
+
+    @cached_property
+    def longitudes(self):
+        return np.array([np.nan if r.longitude is None else r.longitude for r in self], dtype=np.float64)
+
+    def column(self, name):
+        return [getattr(record, name) for record in self]
+
+    def status_is(self, status):
+        return np.array([record.status == status for record in self], dtype=bool)
+
+
+class SnapshotRows(Sequence):
+    """
+    The rows of a mapped VendorSnapshot, in id order. ids, latitudes and longitudes are the
+    snapshot's own column arrays and status_is compares its mapped codes, so scans read the
+    pages every worker shares. A row's VendorRecord is decoded the first time it is returned
+    and then kept, so each row has one record for the lifetime of the indexes.
+    """
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self._records = {}
+
+    def __len__(self):
+        return len(self.snapshot)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [self[i] for i in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        record = self._records.get(row)
+        if record is None:
+            record = self._records.setdefault(row, self.snapshot.record(row))
+        return record
+
+    @property
+    def decoded(self) -> int:
+        """Number of rows whose record has been built so far."""
+        return len(self._records)
+
+    @property
+    def ids(self):
+        return self.snapshot.columns["id"]
+
+    @property
+    def latitudes(self):
+        return self.snapshot.columns["latitude"]
+
+    @property
+    def longitudes(self):
+        return self.snapshot.columns["longitude"]
+
+    def column(self, name):
+        return self.snapshot.column(name)
+
+    def status_is(self, status):
+        return self.snapshot.code_is("status", status)
+
+
+def as_rows(records):
+    """records as rows: RecordRows and SnapshotRows as they are, anything else wrapped in RecordRows."""
+    if isinstance(records, (RecordRows, SnapshotRows)):
+        return records
+    return RecordRows(records)
@@ -0,0 +1,87 @@
+import re
+from datetime import datetime
+from functools import lru_cache
+
+# Weekly operating hours, from the permit CSV's dayshours column, e.g.
+# "Mo-Fr:7AM-8AM/10AM-11AM;Sa-Su:9AM-4PM". Times are minutes of the week, Monday 00:00 = 0.
+DAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+TIME = re.compile(r"^(\d{1,2})(?::(\d{2}))?(AM|PM)$")
+
+
+def _parse_time(text: str) -> int:
+    match = TIME.match(text.strip().upper())
+    if not match:
+        raise ValueError(f"Bad time {text!r}")
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if not 1 <= hour <= 12 or minute > 59:
+        raise ValueError(f"Bad time {text!r}")
+    return (hour % 12 + (12 if match.group(3) == "PM" else 0)) * 60 + minute
+
+
+def _parse_days(text: str):
+    days = []
+    for part in text.split("/"):
+        first, _, last = part.strip().partition("-")
+        start = DAYS.index(first.strip().title())
+        end = DAYS.index(last.strip().title()) if last else start
+        # Sa-Su wraps past the end of the list, Mo-Fr does not
+        days.extend(DAYS[(start + i) % 7] for i in range((end - start) % 7 + 1))
+    return [DAYS.index(day) for day in days]
+
+
+def parse_dayshours(text: str):
+    """
+    Opening hours as sorted, merged (start, end) minute-of-week intervals, end exclusive.
+    A window that ends at or before it starts ("8PM-2AM") runs past midnight into the next
+    day. Returns [] for an empty or unparseable schedule.
+    """
+    if not text or not text.strip():
+        return []
+    intervals = []
+    try:
+        for group in text.split(";"):
+            days, _, hours = group.partition(":")
+            for day in _parse_days(days):
+                for window in hours.split("/"):
+                    opens, _, closes = window.partition("-")
+                    start, end = _parse_time(opens), _parse_time(closes)
+                    if end <= start:
+                        end += MINUTES_PER_DAY
+                    start += day * MINUTES_PER_DAY
+                    end += day * MINUTES_PER_DAY
+                    # Sunday night runs on into Monday morning
+                    if end > MINUTES_PER_WEEK:
+                        intervals.append((0, end - MINUTES_PER_WEEK))
+                        end = MINUTES_PER_WEEK
+                    intervals.append((start, end))
+    except ValueError:
+        return []
+
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+@lru_cache(maxsize=4096)
+def open_minutes(dayshours: str) -> int:
+    """Bitset of the minutes of the week the schedule is open, bit m for minute m. Cached per distinct schedule."""
+    bits = 0
+    for start, end in parse_dayshours(dayshours):
+        bits |= ((1 << (end - start)) - 1) << start
+    return bits
+
+
+def is_open(dayshours: str, minute: int) -> bool:
+    """Whether a vendor with this schedule is open at minute of the week. Unknown schedules count as closed."""
+    return bool(dayshours) and bool(open_minutes(dayshours) >> minute & 1)
+
+
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
@@ -0,0 +1,61 @@
+from operator import attrgetter
+import orjson
+from .models import VendorApplication
+
+# Field order of VendorApplicationResponse, and so of the JSON objects FastAPI writes for it.
+# VendorRecord also carries food_items, which list responses leave out.
+VENDOR_FIELDS = ("id", "applicant_name", "facility_type", "status", "address",
+                 "latitude", "longitude", "approved", "expiration_date")
+vendor_values = attrgetter(*VENDOR_FIELDS)
+
+
+def response_columns(stmt):
+    """Narrow a select(VendorApplication) to the response columns, so rows come back as plain tuples."""
+    return stmt.with_only_columns(*(getattr(VendorApplication, name) for name in VENDOR_FIELDS))
+
+
+def encode_row(row) -> bytes:
+    """
+    One vendor as a JSON object, byte for byte what the response model's dump_json writes:
+    compact, raw UTF-8, ISO datetimes. The only difference, exponents on floats of 1e16 and
+    up, cannot occur for latitudes and longitudes.
+    """
+    return orjson.dumps(dict(zip(VENDOR_FIELDS, row)))
+
+
+def encode_vendor(vendor) -> bytes:
+    return encode_row(vendor_values(vendor))
+
+
+class FragmentCache:
+    """
+    Encoded JSON per vendor, for the records of one VendorIndexes. It lives and dies with
+    those indexes, so a data reload starts from an empty cache.
+    """
+
+    def __init__(self):
+        self._fragments = {}
+
+    def __len__(self):
+        return len(self._fragments)
+
+    def encode(self, vendors):
+        return list(self.iter_encode(vendors))
+
+    def iter_encode(self, vendors):
+        """Fragments of vendors one at a time, so a stream can send the first before encoding the rest."""
+        fragments = self._fragments
+        for vendor in vendors:
+            entry = fragments.get(vendor.id)
+            # A record held over from older indexes (e.g. in the nearby cache) is encoded but not cached
+            if entry is None or entry[0] is not vendor:
+                fragment = encode_vendor(vendor)
+                if entry is None:
+                    fragments[vendor.id] = (vendor, fragment)
+            else:
+                fragment = entry[1]
+            yield fragment
+
+
+def json_array(fragments) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
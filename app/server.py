@@ -0,0 +1,43 @@
+import gc
+import logging
+import os
+from .config import settings
+from .db import engine
+
+logger = logging.getLogger(__name__)
+
+CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+
+
+def available_cpus(cpu_max_file: str = CGROUP_CPU_MAX) -> int:
+    """CPUs this process may use: the cgroup v2 quota when a container sets one, else the CPU affinity mask."""
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    try:
+        with open(cpu_max_file) as f:
+            quota, period = f.read().split()
+    except (OSError, ValueError):
+        return cpus
+    if quota == "max":
+        return cpus
+    return max(1, min(cpus, -(-int(quota) // int(period))))
+
+
+def worker_count() -> int:
+    return settings.server_workers or available_cpus()
+
+
+def preload_indexes():
+    """
+    Warm up once in the gunicorn master, before any worker is forked. Workers then
+    inherit the loaded indexes copy-on-write and their lifespan skips the warm-up.
+    """
+    from .startup import startup_state, warm_up
+    warm_up(startup_state)
+    if startup_state.error:
+        raise RuntimeError(f"Preload failed: {startup_state.error}")
+    # Workers must open their own database connections, not share the master's sockets
+    engine.dispose()
+    # Move everything allocated so far out of the collector's reach, so GC passes in the
+    # workers do not write to (and so copy) the pages holding the shared indexes
+    gc.freeze()
+    logger.info(f"Preloaded indexes in the master, forking {worker_count()} workers")
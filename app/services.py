@@ -1,7 +1,17 @@
+from bisect import bisect_right
+from datetime import datetime
+from zoneinfo import ZoneInfo
 from fastapi import HTTPException
-from .utils import get_bounding_box, haversine_distance
-from .models import VendorApplication
-from sqlalchemy import select
+from .utils import get_bounding_box, haversine_distances, nearest_k, miles_to_km, normalize_name, geohash_encode, geohash_bounds
+from .dataset import get_dataset_version
+from .models import VendorApplication, CurrentVendor, OpenInterval, current_vendor_rtree
+from .spatial_index import GridLayer
+from .schedule import minute_of_week
+from .geometry import polygon_bounds, expand_bounds, points_in_polygon, distances_to_path
+from sqlalchemy import select, exists
+import numpy as np
+from .db import AsyncSessionLocal
+from .serialization import response_columns
 from sqlalchemy import func
 import logging
 from .config import settings
@@ -10,78 +20,362 @@ from .constants import APPROVED, FOOD_TRUCK
 logger = logging.getLogger('uvicorn.error')
 logger.setLevel(logging.DEBUG)
 
-def get_vendors_by_name(name: str, db, all_status: bool = False):
+def clean_name(name: str) -> str:
     name = name.strip().lower()
     if (len(name) == 0 or len(name) > 200):
         raise HTTPException(400, "Name cannot be empty or longer than 200 characters")
-    stmt = select(VendorApplication).where(func.lower(VendorApplication.applicant_name) == name)
+    return name
+
+def clean_address_search(contains: str) -> str:
+    contains = contains.strip().lower()
+    if (len(contains) == 0 or len(contains) > 200):
+        raise HTTPException(400, "address search string cannot be empty or longer than 200 characters")
+    return contains
+
+def page_by_id(records, after: int = None, limit: int = None):
+    """Keyset page of id-ordered records: those with id > after, at most limit of them."""
+    start = bisect_right(records, after, key=lambda record: record.id) if after is not None else 0
+    return records[start:start + limit] if limit is not None else records[start:]
+
+def keyset(stmt, after: int = None, limit: int = None):
+    """Order a VendorApplication select by id and cut it to one keyset page."""
+    stmt = stmt.order_by(VendorApplication.id)
+    if after is not None:
+        stmt = stmt.where(VendorApplication.id > after)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def resolve_open_at(open_now: bool = False, open_at: datetime = None):
+    """
+    Minute of the week to filter on, in the vendors' local time, or None for no filter.
+    A naive open_at is taken as local time already.
+    """
+    if open_now and open_at is not None:
+        raise HTTPException(400, "Pass either open_now or open_at, not both")
+    if open_now:
+        open_at = datetime.now(ZoneInfo(settings.schedule_timezone))
+    elif open_at is None:
+        return None
+    elif open_at.tzinfo is not None:
+        open_at = open_at.astimezone(ZoneInfo(settings.schedule_timezone))
+    return minute_of_week(open_at)
+
+def open_at_clause(minute: int):
+    """SQL condition: the VendorApplication has an opening window covering minute of the week."""
+    return exists().where(OpenInterval.application_id == VendorApplication.id,
+                          OpenInterval.start_minute <= minute, OpenInterval.end_minute > minute)
+
+def vendors_by_name_query(name: str, all_status: bool = False, after: int = None, limit: int = None, open_at: int = None):
+    """Vendors named name (already cleaned), as an in-memory list from the index or a select() to run."""
+    # name_key narrows the search through its index, lower() keeps the exact-match semantics
+    stmt = select(VendorApplication).where(VendorApplication.name_key == normalize_name(name),
+                                           func.lower(VendorApplication.applicant_name) == name)
     
     if not all_status:
         stmt = stmt.where(VendorApplication.status == APPROVED) 
-    result = db.execute(stmt)
+    if open_at is not None:
+        stmt = stmt.where(open_at_clause(open_at))
+    return keyset(stmt, after, limit)
+
+def get_vendors_by_name(name: str, db, all_status: bool = False, indexes=None, after: int = None, limit: int = None,
+                        open_at: int = None):
+    name = clean_name(name)
+    if indexes is not None:
+        return page_by_id(indexes.names.lookup(name, all_status, open_at), after, limit)
+    result = db.execute(vendors_by_name_query(name, all_status, after, limit, open_at))
     return result.scalars().all()
 
-def get_vendors_by_address(contains: str, db):
-    contains = contains.strip().lower()
-    if (len(contains) == 0 or len(contains) > 200):
-        raise HTTPException(400, "address search string cannot be empty or longer than 200 characters")
+def get_vendors_by_name_fuzzy(name: str, all_status: bool = False, indexes=None, open_at: int = None):
+    """(vendor, distance) for names within a few edits of name, closest first."""
+    key = normalize_name(name.strip())
+    if (len(key) == 0 or len(name.strip()) > 200):
+        raise HTTPException(400, "Name cannot be empty or longer than 200 characters")
+    if indexes is None:
+        raise HTTPException(503, "Fuzzy name index is not ready")
+    # Allow one edit per four characters, so short names do not match everything
+    max_distance = min(settings.fuzzy_max_distance, len(key) // 4)
+    return indexes.names.fuzzy_lookup(key, max_distance, all_status, open_at)[:settings.fuzzy_max_results]
+
+def vendors_by_address_query(contains: str, after: int = None, limit: int = None):
     stmt = select(VendorApplication).where(VendorApplication.facility_type == FOOD_TRUCK, 
                                            VendorApplication.address.ilike(f"%{contains}%"))
-    result = db.execute(stmt)
+    return keyset(stmt, after, limit)
+
+def get_vendors_by_address(contains: str, db, indexes=None, after: int = None, limit: int = None):
+    contains = clean_address_search(contains)
+    if indexes is not None:
+        return page_by_id(indexes.addresses.search(contains), after, limit)
+    result = db.execute(vendors_by_address_query(contains, after, limit))
     return result.scalars().all()
 
-def get_vendors_nearby(lat: float, long: float, db, all_status: bool = False):
+async def stream_vendor_rows(stmt):
+    """
+    Yield the response columns of a VendorApplication select() as plain row tuples, through a
+    server-side cursor on its own AsyncSession, fetching settings.stream_batch_size rows per round trip.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(response_columns(stmt).execution_options(yield_per=settings.stream_batch_size))
+        async for row in result:
+            yield row
+
+def get_completions(prefix: str, field: str, limit: int, indexes):
+    prefix = prefix.strip()
+    if (len(prefix) == 0 or len(prefix) > 200):
+        raise HTTPException(400, "Prefix cannot be empty or longer than 200 characters")
+    if indexes is None:
+        raise HTTPException(503, "Autocomplete index is not ready")
+    completions = indexes.name_completions if field == "name" else indexes.address_completions
+    return completions.complete(prefix, limit)
+
+def validate_coordinates(lat: float, long: float):
     if (lat > 90 or lat < -90) or (long > 180 or long < -180):
         raise HTTPException(400, 'Latitude Longitide out of bounds')
+
+def get_vendors_nearby(lat: float, long: float, db, all_status: bool = False, indexes=None, cache=None, open_at: int = None):
+    """
+    The nearby_vendors_count closest vendors within the search box. With open_at, a minute of the
+    week, closed vendors are dropped while collecting candidates, before the closest are picked.
+    """
+    validate_coordinates(lat, long)
     
     nearby_vendors_count = settings.nearby_vendors_count
     bounding_lat_long = get_bounding_box(lat, long)
     logger.debug(f"Lat: {lat} Long: {long} bounding_lat_long: {bounding_lat_long}")
-    # TODO log
-    applications = get_applicants_within_radius(bounding_lat_long, db, all_status)
-    
-    logger.debug(f"Found {len(applications)} applications within bounding box by executing sql query")
-    # TODO log
-    vendor_distances = {}
-    for applicant in applications:
-        distance_from_given_point = haversine_distance(lat, long, applicant.latitude, applicant.longitude)
-        vendor_distances[applicant.id] = (distance_from_given_point, applicant)
-
-    # TODO log
-    vendors = [v[1] for k, v in sorted(vendor_distances.items(), key = lambda item:item[1][0])[:nearby_vendors_count]]
+    if cache is not None:
+        # The cached candidates cover the search box of every point in the geohash cell,
+        # so cutting them down to this point's box gives exactly the uncached rows
+        candidates = get_cached_candidates(lat, long, db, all_status, indexes, cache)
+        applications = candidates.within_bounding_box(bounding_lat_long, open_at)
+        logger.debug(f"Found {len(applications)} applications within bounding box using cached cell candidates")
+    elif indexes is not None:
+        applications = indexes.spatial.within_bounding_box(bounding_lat_long, all_status, open_at)
+        logger.debug(f"Found {len(applications)} applications within bounding box using the spatial index")
+    else:
+        applications = get_applicants_within_radius(bounding_lat_long, db, all_status, open_at)
+        logger.debug(f"Found {len(applications)} applications within bounding box by executing sql query")
+    vendors = rank_nearby(lat, long, applications, nearby_vendors_count)
     logger.debug(f"For {nearby_vendors_count} applications, chose {len(vendors)} nearby given ({lat},{long}) using haversine distance")
     return vendors
 
-def get_applicants_within_radius(bounding_lat_long: tuple, db, all_status: bool = False):
-    
-    subquery_base = select(
-        VendorApplication.latitude,
-        VendorApplication.longitude,
-        VendorApplication.applicant_name,
-        func.max(VendorApplication.id).label("latest_id")
-    ).where(
-        VendorApplication.latitude.between(bounding_lat_long[0], bounding_lat_long[1]),
-        VendorApplication.longitude.between(bounding_lat_long[2], bounding_lat_long[3])
-    )
+def get_cached_candidates(lat: float, long: float, db, all_status: bool, indexes, cache):
+    """
+    Vendors near a geohash cell as a GridLayer, from the cache or freshly queried. Entries built
+    from indexes are keyed on their content hash, so a request still holding the indexes a reload
+    just replaced can neither read nor store candidates for the new ones. Without indexes the
+    dataset version read before the query keeps a stale result out.
+    """
+    cell = geohash_encode(lat, long, settings.nearby_cache_geohash_precision)
+    key = (cell, all_status, indexes.content_hash if indexes is not None else None)
+    candidates = cache.get(key)
+    if candidates is None:
+        version = get_dataset_version()
+        min_lat, max_lat, min_long, max_long = geohash_bounds(cell)
+        # Longitude degrees are widest where |lat| is largest, so size the margin there
+        widest_lat = max_lat if abs(max_lat) > abs(min_lat) else min_lat
+        _, margin_top, _, long_margin = get_bounding_box(widest_lat, 0.0)
+        lat_margin = margin_top - widest_lat
+        cell_box = (min_lat - lat_margin, max_lat + lat_margin, min_long - long_margin, max_long + long_margin)
+        if indexes is not None:
+            rows = indexes.spatial.within_bounding_box(cell_box, all_status)
+        else:
+            rows = get_applicants_within_radius(cell_box, db, all_status)
+        candidates = GridLayer(rows, settings.spatial_cell_degrees)
+        cache.put(key, candidates, version)
+    return candidates
 
-    if not all_status:
-        # TODO log
-        subquery_base = subquery_base.where(VendorApplication.status == APPROVED)
-
-    subquery = subquery_base.group_by(
-        VendorApplication.latitude,
-        VendorApplication.longitude,
-        VendorApplication.applicant_name
-    ).subquery()
-
-    stmt = (
-        select(VendorApplication)
-        .join(
-            subquery,
-            VendorApplication.id == subquery.c.latest_id
-        )
+def rank_nearby(lat: float, long: float, applications, count: int):
+    distances = haversine_distances(lat, long,
+                                    [applicant.latitude for applicant in applications],
+                                    [applicant.longitude for applicant in applications])
+    return [applications[i] for i in nearest_k(distances, count)]
+
+def get_vendors_nearby_batch(points, db, indexes=None):
+    """
+    Answer many nearby queries in one pass. points is a list of (lat, long, all_status).
+    Returns one (vendors, error) pair per point, in input order, where error is an HTTPException or None.
+    """
+    results = [None] * len(points)
+    boxes = {}
+    for position, (lat, long, all_status) in enumerate(points):
+        try:
+            validate_coordinates(lat, long)
+        except HTTPException as e:
+            results[position] = ([], e)
+            continue
+        boxes[position] = get_bounding_box(lat, long)
+
+    if indexes is not None:
+        layers = {True: indexes.spatial.layer(True), False: indexes.spatial.layer(False)}
+    else:
+        # One SQL query per status filter over the union of all boxes, then split it up in memory.
+        # Every (lat, long, applicant_name) group falls entirely inside or outside a box, so the
+        # dedup over the union is the same as the per-box dedup.
+        layers = {}
+        for all_status in (True, False):
+            status_boxes = [box for position, box in boxes.items() if bool(points[position][2]) == all_status]
+            if not status_boxes:
+                continue
+            union_box = (min(b[0] for b in status_boxes), max(b[1] for b in status_boxes),
+                         min(b[2] for b in status_boxes), max(b[3] for b in status_boxes))
+            candidates = get_applicants_within_radius(union_box, db, all_status)
+            layers[all_status] = GridLayer(candidates, settings.spatial_cell_degrees)
+        logger.debug(f"Batch of {len(points)} points answered with {len(layers)} sql queries")
+
+    for position, box in boxes.items():
+        lat, long, all_status = points[position]
+        applications = layers[bool(all_status)].within_bounding_box(box)
+        results[position] = (rank_nearby(lat, long, applications, settings.nearby_vendors_count), None)
+    return results
+
+def get_vendors_nearest(lat: float, long: float, db, all_status: bool = False, k: int = None, indexes=None):
+    """k nearest vendors as (vendor, distance_km) pairs, regardless of search_radius_miles."""
+    validate_coordinates(lat, long)
+    k = k or settings.nearby_vendors_count
+
+    if indexes is not None:
+        return indexes.spatial.nearest(lat, long, k, all_status)
+
+    # Without an index, grow the search box until the k-th hit lies inside the searched circle
+    radius_miles = settings.knn_initial_radius_miles
+    while True:
+        applications = get_applicants_within_radius(get_bounding_box(lat, long, radius_miles), db, all_status)
+        distances = haversine_distances(lat, long,
+                                        [applicant.latitude for applicant in applications],
+                                        [applicant.longitude for applicant in applications])
+        nearest = nearest_k(distances, k)
+        complete = len(nearest) == k and distances[nearest[-1]] <= miles_to_km(radius_miles)
+        if complete or radius_miles >= settings.knn_max_radius_miles:
+            logger.debug(f"Nearest {len(nearest)} of {k} for ({lat},{long}) found within {radius_miles} miles")
+            return [(applications[i], float(distances[i])) for i in nearest]
+        radius_miles = min(radius_miles * 2, settings.knn_max_radius_miles)
+
+def validate_shape(vertices, minimum: int, kind: str):
+    """Check a polygon or route, a list of (lat, long), before it is searched."""
+    if len(vertices) < minimum:
+        raise HTTPException(400, f"A {kind} needs at least {minimum} points")
+    if len(vertices) > settings.geometry_max_vertices:
+        raise HTTPException(400, f"A {kind} cannot have more than {settings.geometry_max_vertices} points")
+    for lat, long in vertices:
+        validate_coordinates(lat, long)
+
+def get_vendors_in_polygon(polygon, db, all_status: bool = False, indexes=None):
+    """
+    Latest application per vendor location inside polygon, a list of (lat, long), in id order.
+    The polygon's bounding box picks the candidates, a vectorized point-in-polygon test the result.
+    """
+    validate_shape(polygon, 3, "polygon")
+    bounds = polygon_bounds(polygon)
+    if indexes is not None:
+        candidates = indexes.spatial.within_bounding_box(bounds, all_status)
+    else:
+        candidates = get_applicants_within_radius(bounds, db, all_status)
+    inside = points_in_polygon([c.latitude for c in candidates], [c.longitude for c in candidates], polygon)
+    return [candidate for candidate, keep in zip(candidates, inside) if keep]
+
+def get_vendors_along_route(path, distance_m: float, db, all_status: bool = False, indexes=None):
+    """
+    (vendor, distance_km) for vendors within distance_m of the polyline path, a list of
+    (lat, long), in the order the path passes them. Candidates come from the grid cells
+    around each segment in one pass over the spatial index (or one box query in SQL),
+    then every segment is measured against all candidates at once.
+    """
+    validate_shape(path, 2, "route")
+    km = distance_m / 1000
+    if indexes is not None:
+        boxes = [expand_bounds(polygon_bounds(segment), km) for segment in zip(path, path[1:])]
+        candidates = indexes.spatial.in_cells_covering(boxes, all_status)
+    else:
+        candidates = get_applicants_within_radius(expand_bounds(polygon_bounds(path), km), db, all_status)
+    if not candidates:
+        return []
+    distances, along = distances_to_path([c.latitude for c in candidates], [c.longitude for c in candidates], path)
+    near = np.flatnonzero(distances <= km)
+    # Candidates are in id order, so ties along the path keep it
+    order = near[np.argsort(along[near], kind="stable")]
+    return [(candidates[i], float(distances[i])) for i in order]
+
+def get_tile_clusters(zoom: int, bounding_lat_long: tuple, all_status: bool = False, indexes=None):
+    """Vendor clusters for the map tiles at zoom that cover the box, from the precomputed tile pyramid."""
+    min_lat, max_lat, min_long, max_long = bounding_lat_long
+    validate_coordinates(min_lat, min_long)
+    validate_coordinates(max_lat, max_long)
+    if min_lat > max_lat or min_long > max_long:
+        raise HTTPException(400, "Bounding box minimums must not exceed its maximums")
+    if indexes is None:
+        raise HTTPException(503, "Tile pyramid is not ready")
+    tiles = indexes.tiles.tile_range(zoom, bounding_lat_long)
+    min_x, max_x, min_y, max_y = tiles
+    if (max_x - min_x + 1) * (max_y - min_y + 1) > settings.tile_max_tiles:
+        raise HTTPException(400, f"Bounding box covers more than {settings.tile_max_tiles} tiles at zoom {zoom}")
+    return tiles, indexes.tiles.clusters(zoom, tiles, all_status)
+
+def clean_food_search(query: str) -> str:
+    query = query.strip()
+    if (len(query) == 0 or len(query) > 200):
+        raise HTTPException(400, "Food search string cannot be empty or longer than 200 characters")
+    return query
+
+def search_food_items(query: str, indexes, all_status: bool = False, lat: float = None, long: float = None,
+                      radius_miles: float = None, limit: int = None):
+    """
+    (vendor, score, distance_km) for vendors whose food items match every word of query, best
+    BM25 score first. With lat and long, only vendors within radius_miles are searched, and
+    distance_km is set.
+    """
+    query = clean_food_search(query)
+    if (lat is None) != (long is None):
+        raise HTTPException(400, "lat and long must be given together")
+    if indexes is None:
+        raise HTTPException(503, "Food item index is not ready")
+    limit = limit or settings.food_search_max_results
+    if lat is None:
+        return [(vendor, score, None) for vendor, score in indexes.food.search(query, all_status, limit=limit)]
+
+    validate_coordinates(lat, long)
+    radius_miles = radius_miles or settings.search_radius_miles
+    nearby = indexes.spatial.within_bounding_box(get_bounding_box(lat, long, radius_miles), all_status)
+    distances = haversine_distances(lat, long, [vendor.latitude for vendor in nearby], [vendor.longitude for vendor in nearby])
+    distance_by_id = {vendor.id: float(distance) for vendor, distance in zip(nearby, distances)
+                      if distance <= miles_to_km(radius_miles)}
+    within = indexes.food.positions_of(vendor for vendor in nearby if vendor.id in distance_by_id)
+    matches = indexes.food.search(query, all_status, within=within, limit=limit)
+    return [(vendor, score, distance_by_id[vendor.id]) for vendor, score in matches]
+
+def get_applicants_within_radius(bounding_lat_long: tuple, db, all_status: bool = False, open_at: int = None):
+    """
+    Latest application per vendor location inside the box, read from the current_vendor table,
+    in id order like the in-memory index. With open_at, a minute of the week, only those with an
+    opening window covering it.
+    """
+    min_lat, max_lat, min_long, max_long = bounding_lat_long
+    stmt = (select(VendorApplication).join(CurrentVendor, VendorApplication.id == CurrentVendor.application_id)
+            .order_by(VendorApplication.id))
+    if open_at is not None:
+        stmt = stmt.where(open_at_clause(open_at))
+    backend = db.get_bind().dialect.name
+    if backend == "sqlite":
+        # The R*Tree box search picks the rows. Its float32 boxes are rounded outwards, so the exact
+        # edges are checked on food_vendor_application, whose unindexed columns cannot lure the
+        # planner away from the R*Tree the way current_vendor's location index would
+        rtree = current_vendor_rtree
+        scope = int(all_status)
+        return db.execute(stmt.join(rtree, rtree.c.id == CurrentVendor.id).where(
+            rtree.c.max_lat >= min_lat, rtree.c.min_lat <= max_lat,
+            rtree.c.max_long >= min_long, rtree.c.min_long <= max_long,
+            rtree.c.max_scope >= scope, rtree.c.min_scope <= scope,
+            VendorApplication.latitude.between(min_lat, max_lat),
+            VendorApplication.longitude.between(min_long, max_long),
+        )).scalars().all()
+
+    stmt = stmt.where(
+        CurrentVendor.all_status == all_status,
+        CurrentVendor.latitude.between(min_lat, max_lat),
+        CurrentVendor.longitude.between(min_long, max_long),
     )
-    
-    # limit(NEARBY_VENDORS_COUNT*3)
+    if backend == "postgresql":
+        # Matches the GiST index on point(longitude, latitude)
+        stmt = stmt.where(func.point(CurrentVendor.longitude, CurrentVendor.latitude).op("<@")(
+            func.box(func.point(min_long, min_lat), func.point(max_long, max_lat))))
     result = db.execute(stmt)
     return result.scalars().all()
\ No newline at end of file
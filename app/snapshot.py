@@ -0,0 +1,241 @@
+import hashlib
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+from datetime import datetime, timedelta
+import numpy as np
+from .models import VendorRecord
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"MFVSNAP\0"
+SNAPSHOT_FORMAT = 4
+ALIGNMENT = 64
+HEADER_LENGTH = struct.Struct("<I")
+
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+NO_DATE = np.iinfo(np.int64).min
+NO_CODE = -1
+
+# Low-cardinality text columns stored as int16 codes into a table kept in the header
+CODED_COLUMNS = ("status", "facility_type")
+# Free text stored as one UTF-8 blob plus int64 offsets, with a null mask
+STRING_COLUMNS = ("applicant_name", "address", "food_items", "dayshours")
+DATE_COLUMNS = ("approved", "expiration_date")
+
+
+class SnapshotError(ValueError):
+    """The snapshot file is missing, from another format version, or fails its checksum."""
+
+
+def _encode_date(value):
+    return NO_DATE if value is None else (value - EPOCH) // MICROSECOND
+
+
+def _decode_date(value):
+    return None if value == NO_DATE else EPOCH + timedelta(microseconds=int(value))
+
+
+def encode_columns(records):
+    """Column arrays and code tables for a list of VendorRecord."""
+    columns = {
+        "id": np.array([r.id for r in records], dtype="<i8"),
+        "latitude": np.array([np.nan if r.latitude is None else r.latitude for r in records], dtype="<f8"),
+        "longitude": np.array([np.nan if r.longitude is None else r.longitude for r in records], dtype="<f8"),
+    }
+    tables = {}
+    for name in CODED_COLUMNS:
+        values = [getattr(r, name) for r in records]
+        table = sorted({v for v in values if v is not None})
+        codes = {value: code for code, value in enumerate(table)}
+        tables[name] = table
+        columns[name] = np.array([NO_CODE if v is None else codes[v] for v in values], dtype="<i2")
+    for name in STRING_COLUMNS:
+        values = [getattr(r, name) for r in records]
+        encoded = [b"" if v is None else v.encode() for v in values]
+        columns[f"{name}_offsets"] = np.cumsum([0] + [len(v) for v in encoded], dtype="<i8")
+        columns[f"{name}_data"] = np.frombuffer(b"".join(encoded), dtype="u1")
+        columns[f"{name}_null"] = np.array([v is None for v in values], dtype="u1")
+    for name in DATE_COLUMNS:
+        columns[name] = np.array([_encode_date(getattr(r, name)) for r in records], dtype="<i8")
+    return columns, tables
+
+
+def read_header(path: str):
+    """Header of the snapshot at path, or None if there is no readable snapshot."""
+    try:
+        with open(path, "rb") as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (length,) = HEADER_LENGTH.unpack(f.read(HEADER_LENGTH.size))
+            return json.loads(f.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def write_snapshot(records, path: str, content_hash: str, database: str = None):
+    """
+    Write records as a columnar snapshot: header, then each column 64-byte aligned.
+    database, from config.database_id, names the database the records were read from.
+    The file is written next to path and renamed over it, so readers see the old or
+    the new snapshot, never a partial one. Rows are stored in id order. Returns the header.
+    """
+    records = sorted(records, key=lambda record: record.id)
+    columns, tables = encode_columns(records)
+    previous = read_header(path)
+    layout, offset = {}, 0
+    checksum = hashlib.sha256()
+    for name, array in columns.items():
+        layout[name] = [array.dtype.str, offset, len(array)]
+        checksum.update(array.tobytes())
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+    header = {
+        "format": SNAPSHOT_FORMAT,
+        "generation": (previous or {}).get("generation", 0) + 1,
+        "created_at": datetime.now().isoformat(),
+        "rows": len(records),
+        "content_hash": content_hash,
+        "database": database,
+        "checksum": checksum.hexdigest(),
+        "tables": tables,
+        "columns": layout,
+    }
+    encoded_header = json.dumps(header).encode()
+    prefix = SNAPSHOT_MAGIC + HEADER_LENGTH.pack(len(encoded_header)) + encoded_header
+    data_start = -(-len(prefix) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(prefix.ljust(data_start, b"\0"))
+            for name, array in columns.items():
+                f.seek(data_start + layout[name][1])
+                f.write(array.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Wrote vendor snapshot generation {header['generation']} ({len(records)} rows) to {path}")
+    return header
+
+
+class VendorSnapshot:
+    """
+    Read-only view of a snapshot file. Columns are NumPy arrays over one mmap of the file,
+    so reading them costs no copy and processes mapping the same file share its page-cache
+    pages. The indexes scan id, latitude, longitude and the status codes in place and decode
+    single rows with record(); records() and column() copy into this process's memory.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open snapshot {path}: {e}") from e
+
+        if self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a vendor snapshot")
+        start = len(SNAPSHOT_MAGIC)
+        (length,) = HEADER_LENGTH.unpack_from(self._mmap, start)
+        start += HEADER_LENGTH.size
+        self.header = json.loads(self._mmap[start:start + length])
+        if self.header["format"] != SNAPSHOT_FORMAT:
+            raise SnapshotError(f"Snapshot format {self.header['format']}, expected {SNAPSHOT_FORMAT}")
+        data_start = -(-(start + length) // ALIGNMENT) * ALIGNMENT
+
+        # Empty columns sit at the very end of the file, where frombuffer rejects the offset
+        self.columns = {
+            name: np.frombuffer(self._mmap, dtype=np.dtype(dtype), count=count, offset=data_start + offset)
+            if count else np.empty(0, dtype=np.dtype(dtype))
+            for name, (dtype, offset, count) in self.header["columns"].items()
+        }
+        if verify:
+            checksum = hashlib.sha256()
+            for array in self.columns.values():
+                checksum.update(array)
+            if checksum.hexdigest() != self.header["checksum"]:
+                raise SnapshotError(f"Snapshot {path} fails its checksum")
+
+    @property
+    def content_hash(self) -> str:
+        return self.header["content_hash"]
+
+    @property
+    def database(self):
+        return self.header.get("database")
+
+    @property
+    def generation(self) -> int:
+        return self.header["generation"]
+
+    def __len__(self):
+        return self.header["rows"]
+
+    def _strings(self, name):
+        offsets = self.columns[f"{name}_offsets"].tolist()
+        data = self.columns[f"{name}_data"]
+        nulls = self.columns[f"{name}_null"].tolist()
+        return [None if nulls[i] else data[offsets[i]:offsets[i + 1]].tobytes().decode() for i in range(len(self))]
+
+    def _string(self, name, row: int):
+        if self.columns[f"{name}_null"][row]:
+            return None
+        offsets = self.columns[f"{name}_offsets"]
+        return self.columns[f"{name}_data"][offsets[row]:offsets[row + 1]].tobytes().decode()
+
+    def column(self, name):
+        """One column decoded for every row, as a list of Python values."""
+        if name in STRING_COLUMNS:
+            return self._strings(name)
+        if name in CODED_COLUMNS:
+            table = self.header["tables"][name]
+            return [None if code == NO_CODE else table[code] for code in self.columns[name].tolist()]
+        if name in DATE_COLUMNS:
+            return [_decode_date(value) for value in self.columns[name].tolist()]
+        values = self.columns[name].tolist()
+        if name in ("latitude", "longitude"):
+            return [None if math.isnan(value) else value for value in values]
+        return values
+
+    def code_is(self, name, value):
+        """Boolean mask of the rows whose coded column name holds value, straight from the mapped codes."""
+        table = self.header["tables"][name]
+        if value not in table:
+            return np.zeros(len(self), dtype=bool)
+        return self.columns[name] == table.index(value)
+
+    def record(self, row: int) -> VendorRecord:
+        """The VendorRecord of one row, decoded on its own."""
+        columns = self.columns
+        tables = self.header["tables"]
+        coded = {name: int(columns[name][row]) for name in CODED_COLUMNS}
+        latitude, longitude = float(columns["latitude"][row]), float(columns["longitude"][row])
+        return VendorRecord(
+            id=int(columns["id"][row]),
+            applicant_name=self._string("applicant_name", row),
+            facility_type=None if coded["facility_type"] == NO_CODE else tables["facility_type"][coded["facility_type"]],
+            status=None if coded["status"] == NO_CODE else tables["status"][coded["status"]],
+            address=self._string("address", row),
+            latitude=None if math.isnan(latitude) else latitude,
+            longitude=None if math.isnan(longitude) else longitude,
+            approved=_decode_date(int(columns["approved"][row])),
+            expiration_date=_decode_date(int(columns["expiration_date"][row])),
+            food_items=self._string("food_items", row),
+            dayshours=self._string("dayshours", row),
+        )
+
+    def records(self):
+        """VendorRecord per row, equal to the records the snapshot was written from."""
+        fields = ("id", "applicant_name", "facility_type", "status", "address", "latitude", "longitude",
+                  "approved", "expiration_date", "food_items", "dayshours")
+        columns = [self.column(name) for name in fields]
+        return [VendorRecord(**dict(zip(fields, values))) for values in zip(*columns)]
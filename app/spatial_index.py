@@ -0,0 +1,174 @@
+from math import floor, radians, cos, sin, asin
+import numpy as np
+from .constants import APPROVED
+from .rows import as_rows
+from .utils import haversine_distances, nearest_k
+from .schedule import is_open
+
+EARTH_RADIUS_KM = 6371
+
+
+def latest_per_location(rows, mask=None):
+    """
+    Positions in rows of the highest id per (latitude, longitude, applicant_name), like the GROUP BY
+    in get_applicants_within_radius, in id order. mask, a boolean array over rows, limits the candidates.
+    """
+    located = ~(np.isnan(rows.latitudes) | np.isnan(rows.longitudes))
+    if mask is not None:
+        located &= mask
+    positions = np.flatnonzero(located)
+    names = rows.column("applicant_name")
+    latest = {}
+    # Rows are in id order, so the last position seen per key holds its highest id
+    for position, lat, long in zip(positions.tolist(), rows.latitudes[positions].tolist(),
+                                   rows.longitudes[positions].tolist()):
+        latest[(lat, long, names[position])] = position
+    return np.array(sorted(latest.values()), dtype=np.int64)
+
+
+class GridLayer:
+    """
+    Fixed-size lat/long grid buckets over one deduplicated set of vendors. Buckets hold
+    positions into rows, coordinates are read from the rows' arrays, and a record is only
+    looked up for a vendor a query returns.
+    """
+
+    def __init__(self, records, cell_degrees: float, positions=None):
+        self.cell_degrees = cell_degrees
+        self.rows = as_rows(records)
+        self.positions = (np.arange(len(self.rows), dtype=np.int64) if positions is None
+                          else np.asarray(positions, dtype=np.int64))
+        cell_rows = np.floor(self.rows.latitudes[self.positions] / cell_degrees).astype(np.int64)
+        cell_cols = np.floor(self.rows.longitudes[self.positions] / cell_degrees).astype(np.int64)
+        # A stable sort by cell keeps each bucket in id order
+        order = np.lexsort((cell_cols, cell_rows))
+        cell_rows, cell_cols, sorted_positions = cell_rows[order], cell_cols[order], self.positions[order]
+        first_of_cell = np.ones(len(order), dtype=bool)
+        first_of_cell[1:] = (cell_rows[1:] != cell_rows[:-1]) | (cell_cols[1:] != cell_cols[:-1])
+        starts = np.flatnonzero(first_of_cell)
+        self._cells = {
+            (row, col): bucket
+            for row, col, bucket in zip(cell_rows[starts].tolist(), cell_cols[starts].tolist(),
+                                        np.split(sorted_positions, starts[1:]))
+        }
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _records(self, positions):
+        return [self.rows[position] for position in positions.tolist()]
+
+    def _cell(self, lat: float, long: float):
+        return floor(lat / self.cell_degrees), floor(long / self.cell_degrees)
+
+    def _cell_keys_in(self, min_lat, max_lat, min_long, max_long):
+        min_row, min_col = self._cell(min_lat, min_long)
+        max_row, max_col = self._cell(max_lat, max_long)
+        rows = range(min_row, max_row + 1)
+        cols = range(min_col, max_col + 1)
+        # A huge box would walk mostly empty cells, so scan the occupied ones instead
+        if len(rows) * len(cols) > len(self._cells):
+            return [(row, col) for row, col in self._cells if row in rows and col in cols]
+        return [(row, col) for row in rows for col in cols if (row, col) in self._cells]
+
+    def _cells_in(self, min_lat, max_lat, min_long, max_long):
+        return [self._cells[key] for key in self._cell_keys_in(min_lat, max_lat, min_long, max_long)]
+
+    def in_cells_covering(self, boxes):
+        """
+        Vendors in every occupied cell that overlaps any of the boxes, each once, in id order.
+        A superset of those inside the boxes, for callers that run an exact test next.
+        """
+        keys = set()
+        for min_lat, max_lat, min_long, max_long in boxes:
+            keys.update(self._cell_keys_in(min_lat, max_lat, min_long, max_long))
+        if not keys:
+            return []
+        return self._records(np.sort(np.concatenate([self._cells[key] for key in keys])))
+
+    def _ring(self, row: int, col: int, ring: int):
+        """Cells at Chebyshev distance `ring` from (row, col)."""
+        if ring == 0:
+            return [(row, col)]
+        cells = []
+        for c in range(col - ring, col + ring + 1):
+            cells.append((row - ring, c))
+            cells.append((row + ring, c))
+        for r in range(row - ring + 1, row + ring):
+            cells.append((r, col - ring))
+            cells.append((r, col + ring))
+        return cells
+
+    def _unvisited_distance(self, lat: float, long: float, row: int, col: int, ring: int):
+        """Lower bound in km on the distance from (lat, long) to any point outside the rings walked so far."""
+        min_lat = max((row - ring) * self.cell_degrees, -90.0)
+        max_lat = min((row + ring + 1) * self.cell_degrees, 90.0)
+        lat_gap = min(lat - min_lat, max_lat - lat)
+        long_gap = min(long - (col - ring) * self.cell_degrees, (col + ring + 1) * self.cell_degrees - long, 180.0)
+        # Points beyond the longitude edges are still inside the latitude band, where cos(lat) is smallest at an edge
+        min_cos = min(cos(radians(min_lat)), cos(radians(max_lat)))
+        return min(EARTH_RADIUS_KM * radians(lat_gap),
+                   2 * EARTH_RADIUS_KM * asin(min(1.0, min_cos * sin(radians(long_gap) / 2))))
+
+    def _rank(self, positions, lat: float, long: float, k: int):
+        positions = np.sort(positions)
+        distances = haversine_distances(lat, long, self.rows.latitudes[positions], self.rows.longitudes[positions])
+        return [(self.rows[int(positions[i])], float(distances[i])) for i in nearest_k(distances, k)]
+
+    def nearest(self, lat: float, long: float, k: int):
+        """Exact k nearest vendors as (record, distance_km), walking grid rings outward from the query cell."""
+        if k <= 0 or not len(self.positions):
+            return []
+        row, col = self._cell(lat, long)
+        candidates, count = [], 0
+        ring = 0
+        while True:
+            # Once the walk would cover more cells than are occupied, ranking everything is cheaper
+            if (2 * ring + 1) ** 2 >= len(self._cells):
+                return self._rank(self.positions, lat, long, k)
+            for cell in self._ring(row, col, ring):
+                bucket = self._cells.get(cell)
+                if bucket is not None:
+                    candidates.append(bucket)
+                    count += len(bucket)
+            if count >= k:
+                ranked = self._rank(np.concatenate(candidates), lat, long, k)
+                if ranked[-1][1] <= self._unvisited_distance(lat, long, row, col, ring):
+                    return ranked
+            ring += 1
+
+    def within_bounding_box(self, bounding_lat_long: tuple, open_at: int = None):
+        """Vendors inside the box in id order; with open_at, a minute of the week, only those open then."""
+        min_lat, max_lat, min_long, max_long = bounding_lat_long
+        buckets = self._cells_in(min_lat, max_lat, min_long, max_long)
+        if not buckets:
+            return []
+        positions = np.concatenate(buckets)
+        lats, longs = self.rows.latitudes[positions], self.rows.longitudes[positions]
+        positions = np.sort(positions[(lats >= min_lat) & (lats <= max_lat) & (longs >= min_long) & (longs <= max_long)])
+        matches = self._records(positions)
+        if open_at is not None:
+            matches = [record for record in matches if is_open(record.dayshours, open_at)]
+        return matches
+
+
+class SpatialIndex:
+    """Grid index over the latest application per vendor location, for approved-only and all-status queries."""
+
+    def __init__(self, records, cell_degrees: float = 0.01):
+        rows = as_rows(records)
+        self.approved = GridLayer(rows, cell_degrees, latest_per_location(rows, rows.status_is(APPROVED)))
+        self.all_status = GridLayer(rows, cell_degrees, latest_per_location(rows))
+
+    def layer(self, all_status: bool = False) -> GridLayer:
+        return self.all_status if all_status else self.approved
+
+    def within_bounding_box(self, bounding_lat_long: tuple, all_status: bool = False, open_at: int = None):
+        """Same rows as get_applicants_within_radius, without a database round trip."""
+        return self.layer(all_status).within_bounding_box(bounding_lat_long, open_at)
+
+    def nearest(self, lat: float, long: float, k: int, all_status: bool = False):
+        return self.layer(all_status).nearest(lat, long, k)
+
+    def in_cells_covering(self, boxes, all_status: bool = False):
+        return self.layer(all_status).in_cells_covering(boxes)
@@ -0,0 +1,141 @@
+import fcntl
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from .config import settings
+from .db import engine, Base, upgrade_schema
+from .data_loader import load_csv_data, backfill_upgraded_rows
+from .indexes import refresh_indexes, load_snapshot_indexes
+from .models import ADDRESS_TRIGRAM_DDL
+
+logger = logging.getLogger(__name__)
+
+# Close enough to process start: app.main imports this module before anything heavy runs
+PROCESS_STARTED = time.monotonic()
+
+
+class StartupState:
+    """Progress of the background warm-up, read by /live, /ready and the readiness gate."""
+
+    def __init__(self):
+        self.started_at = PROCESS_STARTED
+        self.ready_at = None
+        self.first_request_at = None
+        self.error = None
+        self.leader = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def mark_ready(self):
+        self.ready_at = time.monotonic()
+        self._ready.set()
+        logger.info(f"Ready to serve {self.ready_at - self.started_at:.2f}s after process start")
+
+    def mark_failed(self, error: Exception):
+        self.error = str(error)
+        logger.error(f"Startup failed after {time.monotonic() - self.started_at:.2f}s: {error}")
+
+    def record_request(self):
+        """Log time-to-first-request once, for the first request served after the app became ready."""
+        if self.first_request_at is not None or not self.ready:
+            return
+        with self._lock:
+            if self.first_request_at is not None:
+                return
+            self.first_request_at = time.monotonic()
+        logger.info(f"First request served {self.first_request_at - self.started_at:.2f}s after process start")
+
+    def summary(self):
+        def since_start(moment):
+            return round(moment - self.started_at, 3) if moment is not None else None
+        return {
+            "ready": self.ready,
+            "leader": self.leader,
+            "error": self.error,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 3),
+            "time_to_ready_seconds": since_start(self.ready_at),
+            "time_to_first_request_seconds": since_start(self.first_request_at),
+        }
+
+
+startup_state = StartupState()
+
+
+@contextmanager
+def leader_lock(path: str = None):
+    """
+    Exclusive file lock shared by the workers on one host. The first worker to take it
+    is the leader and seeds the database; the others block until it is done. Yields
+    True in the leader.
+    """
+    path = path or settings.startup_lock_file
+    with open(path, "a") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            leader = True
+        except BlockingIOError:
+            logger.info(f"Another worker holds {path}, waiting for it to finish loading")
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            leader = False
+        try:
+            yield leader
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def create_address_trigram_index(bind=engine) -> bool:
+    """
+    Create the PostgreSQL trigram index for address search if it is missing. Best effort: a role
+    that may not create the pg_trgm extension only loses the speedup. True if the index exists.
+    """
+    if bind.dialect.name != "postgresql":
+        return False
+    try:
+        with bind.begin() as connection:
+            for statement in ADDRESS_TRIGRAM_DDL:
+                connection.execute(text(statement))
+    except SQLAlchemyError as e:
+        logger.warning(f"Could not create the address trigram index, address search will scan the table: {e}")
+        return False
+    return True
+
+
+def prepare_database():
+    """Create or upgrade the schema, fill the columns an upgrade added, and load the CSV if the table is empty."""
+    Base.metadata.create_all(bind=engine)
+    added = upgrade_schema(engine)
+    if added:
+        logger.info(f"Added columns to the existing schema: {', '.join(added)}")
+    create_address_trigram_index(engine)
+    backfill_upgraded_rows()
+    load_csv_data(refresh=False)
+
+
+def warm_up(state: StartupState = startup_state):
+    """
+    Get this worker's in-memory indexes built, then flip readiness. The leader seeds the
+    database and publishes the snapshot file; followers, which wait for the leader to
+    finish, build straight from that snapshot and only go to the database without one.
+    """
+    try:
+        with leader_lock() as leader:
+            state.leader = leader
+            logger.info(f"Warming up (pid {os.getpid()}, {'leader' if leader else 'follower'})")
+            if leader or load_snapshot_indexes() is None:
+                prepare_database()
+                refresh_indexes()
+    except Exception as e:
+        state.mark_failed(e)
+        return
+    state.mark_ready()
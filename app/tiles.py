@@ -0,0 +1,90 @@
+from math import pi
+import numpy as np
+from .rows import as_rows
+
+# Web Mercator's latitude limit, where the square world map ends
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def tile_x(long, zoom: int):
+    """Slippy-map tile column of a longitude (scalar or array) at zoom."""
+    scale = 1 << zoom
+    x = np.floor((np.asarray(long, dtype=np.float64) + 180.0) / 360.0 * scale).astype(np.int64)
+    return np.clip(x, 0, scale - 1)
+
+
+def tile_y(lat, zoom: int):
+    """Slippy-map tile row of a latitude (scalar or array) at zoom; row 0 is the north edge."""
+    scale = 1 << zoom
+    lat = np.radians(np.clip(np.asarray(lat, dtype=np.float64), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT))
+    y = np.floor((1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / pi) / 2.0 * scale).astype(np.int64)
+    return np.clip(y, 0, scale - 1)
+
+
+class PyramidLayer:
+    """
+    Vendor clusters of one vendor set at every level from 0 to max_level. Each level holds
+    its occupied cells sorted by key = x << level | y, with the count, the mean position and
+    the lowest vendor id per cell, so a range of columns is one binary search.
+    """
+
+    def __init__(self, records, max_level: int, positions=None):
+        """positions, into the rows of records, picks the vendors; all of them if None."""
+        self.max_level = max_level
+        rows = as_rows(records)
+        if positions is None:
+            positions = np.arange(len(rows))
+        ids, lats, longs = rows.ids[positions], rows.latitudes[positions], rows.longitudes[positions]
+        xs, ys = tile_x(longs, max_level), tile_y(lats, max_level)
+
+        self._levels = []
+        for level in range(max_level + 1):
+            shift = max_level - level
+            keys = (xs >> shift) << level | (ys >> shift)
+            cells, first, inverse, counts = np.unique(keys, return_index=True, return_inverse=True, return_counts=True)
+            self._levels.append((
+                cells,
+                counts,
+                np.bincount(inverse, weights=lats, minlength=len(cells)) / np.maximum(counts, 1),
+                np.bincount(inverse, weights=longs, minlength=len(cells)) / np.maximum(counts, 1),
+                # rows are in id order, so the first of each cell has its lowest id
+                ids[first],
+            ))
+
+    def cells(self, level: int, min_x: int, max_x: int, min_y: int, max_y: int):
+        """(x, y, count, latitude, longitude, first_id) for the occupied cells in the range, by column then row."""
+        keys, counts, lats, longs, first_ids = self._levels[level]
+        start, end = np.searchsorted(keys, [min_x << level, (max_x + 1) << level])
+        keys = keys[start:end]
+        xs, ys = keys >> level, keys & ((1 << level) - 1)
+        keep = np.flatnonzero((ys >= min_y) & (ys <= max_y)) + start
+        return list(zip((xs[keep - start]).tolist(), (ys[keep - start]).tolist(), counts[keep].tolist(),
+                        lats[keep].tolist(), longs[keep].tolist(), first_ids[keep].tolist()))
+
+
+class TilePyramid:
+    """
+    Clustered vendor counts for map tiles, approved-only and all-status, precomputed from the
+    spatial index's vendor sets (the latest application per location). Tiles at zoom z are
+    answered with clusters cluster_bits levels deeper, so one tile never holds more than
+    4 ** cluster_bits clusters.
+    """
+
+    def __init__(self, spatial, max_zoom: int, cluster_bits: int):
+        self.max_zoom = max_zoom
+        self.cluster_bits = cluster_bits
+        self.approved = PyramidLayer(spatial.approved.rows, max_zoom + cluster_bits, spatial.approved.positions)
+        self.all_status = PyramidLayer(spatial.all_status.rows, max_zoom + cluster_bits, spatial.all_status.positions)
+
+    def tile_range(self, zoom: int, bounding_lat_long: tuple):
+        """(min_x, max_x, min_y, max_y) of the tiles at zoom covering the box."""
+        min_lat, max_lat, min_long, max_long = bounding_lat_long
+        return (int(tile_x(min_long, zoom)), int(tile_x(max_long, zoom)),
+                int(tile_y(max_lat, zoom)), int(tile_y(min_lat, zoom)))
+
+    def clusters(self, zoom: int, tiles: tuple, all_status: bool = False):
+        """Clusters inside a range of tiles at zoom, as (x, y, count, latitude, longitude, first_id) at zoom + cluster_bits."""
+        layer = self.all_status if all_status else self.approved
+        bits = self.cluster_bits
+        min_x, max_x, min_y, max_y = tiles
+        return layer.cells(zoom + bits, min_x << bits, ((max_x + 1) << bits) - 1, min_y << bits, ((max_y + 1) << bits) - 1)
@@ -0,0 +1,79 @@
+from .constants import APPROVED
+
+
+class TrieNode:
+    __slots__ = ("children", "entries", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.entries = []
+        self.top = ()
+
+
+class Completion:
+    """One distinct completion text with its ranking signals."""
+    __slots__ = ("text", "count", "approved")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.count = 0
+        self.approved = False
+
+    def rank(self):
+        return (not self.approved, -self.count, self.text)
+
+
+class PrefixIndex:
+    """
+    Trie over every word-start suffix of a set of strings, so "anz" completes
+    "Datam SF LLC dba Anzu To You". Each node keeps its best `max_results`
+    completions (approved first, then by number of applications), so a lookup
+    is one walk down the trie and never touches the rest of the data.
+    """
+
+    def __init__(self, values, max_results: int = 10):
+        """values: (text, status) pairs, one per application."""
+        self.max_results = max_results
+        completions = {}
+        for text, status in values:
+            if not text or not text.strip():
+                continue
+            completion = completions.setdefault(text, Completion(text))
+            completion.count += 1
+            completion.approved = completion.approved or status == APPROVED
+
+        self._root = TrieNode()
+        for completion in completions.values():
+            words = completion.text.lower().split()
+            for start in range(len(words)):
+                self._insert(" ".join(words[start:]), completion)
+        self._rank(self._root)
+
+    def _insert(self, key: str, completion: Completion):
+        node = self._root
+        for char in key:
+            node = node.children.setdefault(char, TrieNode())
+        node.entries.append(completion)
+
+    def _rank(self, root: TrieNode):
+        # Post-order without recursion, names can be longer than the recursion limit is comfortable with
+        stack, order = [root], []
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(node.children.values())
+        for node in reversed(order):
+            best = {id(c): c for c in node.entries}
+            for child in node.children.values():
+                best.update((id(c), c) for c in child.top)
+            node.top = tuple(sorted(best.values(), key=Completion.rank)[:self.max_results])
+            node.entries = None
+
+    def complete(self, prefix: str, limit: int = None):
+        """Best completions for a prefix of any word in the text, case-insensitive."""
+        node = self._root
+        for char in " ".join(prefix.lower().split()):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return list(node.top[:limit or self.max_results])
@@ -1,15 +1,91 @@
 from math import radians, degrees, cos, sin, atan2, sqrt
+import re
+import numpy as np
 from .config import settings
 
-def get_bounding_box(lat, lon):
+NON_WORD = re.compile(r"[^\w\s]+")
+
+def normalize_name(name):
+    """Lookup key for an applicant name: casefolded, punctuation stripped, whitespace collapsed."""
+    if name is None:
+        return None
+    return " ".join(NON_WORD.sub("", name.casefold()).split())
+
+def levenshtein_distance(a: str, b: str) -> int:
+    """Edit distance between two strings (insertions, deletions and substitutions)."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(lat: float, lon: float, precision: int) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        interval, coordinate = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+def geohash_bounds(geohash: str):
+    """(min_lat, max_lat, min_lon, max_lon) of a geohash cell, in the same order as get_bounding_box."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            middle = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = middle
+            else:
+                interval[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+KM_PER_MILE = 1.609344
+
+def miles_to_km(miles):
+    """Convert a radius in statute miles, as in search_radius_miles, to kilometers."""
+    return miles * KM_PER_MILE
+
+# /applications/nearby has always searched a box of search_radius_miles / 1.6 km; its results depend on it
+NEARBY_BOX_MILES_PER_KM = 1.6
+
+def get_bounding_box(lat, lon, radius_miles=None):
+    """
+    Box around a point, radius_miles statute miles to each side. Without radius_miles,
+    the /applications/nearby box of search_radius_miles on its original scale.
+    """
     earth_radius = 6371  # km
-    radius_miles = settings.search_radius_miles
+    if radius_miles is None:
+        radius_km = settings.search_radius_miles / NEARBY_BOX_MILES_PER_KM
+    else:
+        radius_km = miles_to_km(radius_miles)
 
     lat = float(lat)
     lon = float(lon)
 
-    delta_lat = degrees((radius_miles / 1.6) / earth_radius)
-    delta_lon = degrees((radius_miles / 1.6) / (earth_radius * cos(radians(lat))))
+    delta_lat = degrees(radius_km / earth_radius)
+    delta_lon = degrees(radius_km / (earth_radius * cos(radians(lat))))
 
     min_lat = lat - delta_lat
     max_lat = lat + delta_lat
@@ -49,3 +125,49 @@ def haversine_distance(lat1, lon1, lat2, lon2):
 
     distance = R * c
     return distance
+
+def haversine_distances(lat, lon, lats, lons):
+    """
+    Vectorized haversine_distance from one point to many points.
+
+    Parameters:
+    lat (float): Latitude of the origin in decimal degrees.
+    lon (float): Longitude of the origin in decimal degrees.
+    lats (array-like): Latitudes of the other points in decimal degrees.
+    lons (array-like): Longitudes of the other points in decimal degrees.
+
+    Returns:
+    numpy.ndarray: Distances from the origin to each point in kilometers.
+    """
+    R = 6371  # Earth's radius in kilometers
+
+    lat1_rad = np.radians(float(lat))
+    lon1_rad = np.radians(float(lon))
+    lat2_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lon2_rad = np.radians(np.asarray(lons, dtype=np.float64))
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+def nearest_k(distances, k):
+    """
+    Positions of the k smallest distances, nearest first.
+
+    Uses a partial selection instead of a full sort. Ties keep their input order,
+    so the result is the same as a stable sort truncated to k.
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    if k <= 0 or len(distances) == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(distances):
+        kth = np.partition(distances, k - 1)[k - 1]
+        candidates = np.flatnonzero(distances <= kth)
+    else:
+        candidates = np.arange(len(distances))
+    order = np.argsort(distances[candidates], kind="stable")
+    return candidates[order][:k]
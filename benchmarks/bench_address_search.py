@@ -0,0 +1,55 @@
+"""
+Compare /applications/address lookups: SQL ILIKE scan vs the in-memory n-gram index.
+
+    PROJECT_NAME=bench DATABASE_URL=sqlite:///:memory: python -m benchmarks.bench_address_search
+"""
+import random
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import VendorApplication
+from app.indexes import build_indexes
+from app.services import get_vendors_by_address
+
+STREETS = ["MARKET ST", "MISSION ST", "SANSOME ST", "CALIFORNIA ST", "FOLSOM ST", "HOWARD ST", "TAYLOR ST",
+           "18TH ST", "VAN NESS AVE", "GEARY BLVD", "BAY ST", "NORTH POINT ST", "MONTGOMERY ST", "KEARNY ST"]
+QUERIES = ["market", "van ness", "18th st", "sansome", "st", "1200 folsom", "no such street"]
+REPEAT = 20
+
+
+def populate(db, rows: int):
+    rng = random.Random(1)
+    db.bulk_insert_mappings(VendorApplication, [
+        {"applicant_name": f"Vendor {i}", "facility_type": rng.choice(["Truck", "Truck", "Push Cart"]),
+         "status": "APPROVED", "address": f"{rng.randint(1, 3000)} {rng.choice(STREETS)}"}
+        for i in range(rows)
+    ])
+    db.commit()
+
+
+def time_per_query(search):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        for query in QUERIES:
+            search(query)
+    return (time.perf_counter() - started) / (REPEAT * len(QUERIES)) * 1000
+
+
+def main():
+    print(f"{'rows':>8} {'ilike ms':>10} {'index ms':>10} {'speedup':>8}")
+    for rows in (500, 5_000, 50_000, 200_000):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        populate(db, rows)
+        indexes = build_indexes(db)
+
+        ilike = time_per_query(lambda q: get_vendors_by_address(q, db))
+        index = time_per_query(lambda q: get_vendors_by_address(q, None, indexes))
+        print(f"{rows:>8} {ilike:>10.3f} {index:>10.3f} {ilike / index:>7.1f}x")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Compare bounding-box queries on SQLite: the composite (all_status, latitude, longitude)
+B-tree index on current_vendor vs the R*Tree that get_applicants_within_radius uses.
+
+    PROJECT_NAME=bench DATABASE_URL=sqlite:///:memory: python -m benchmarks.bench_bounding_box
+"""
+import random
+import time
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import VendorApplication, CurrentVendor
+from app.data_loader import refresh_current_vendors
+from app.services import get_applicants_within_radius
+from app.utils import get_bounding_box
+
+ROWS = 200_000
+REPEAT = 20
+RADII = [0.25, 1.0, 2.0]
+# (min lat, lat span, min long, long span): San Francisco only, a 5 degree square, and a strip
+# 0.12 degrees tall but 5 degrees wide, where the B-tree's latitude range holds most of the table
+LAYOUTS = {"city": (37.70, 0.12, -122.52, 0.14), "state": (35.26, 5.0, -122.52, 5.0), "strip": (37.70, 0.12, -122.52, 5.0)}
+
+
+def btree_query(box, db, all_status):
+    stmt = select(VendorApplication).join(CurrentVendor, VendorApplication.id == CurrentVendor.application_id).where(
+        CurrentVendor.all_status == all_status,
+        CurrentVendor.latitude.between(box[0], box[1]),
+        CurrentVendor.longitude.between(box[2], box[3]),
+    )
+    return db.execute(stmt).scalars().all()
+
+
+def populate(db, layout):
+    min_lat, lat_span, min_long, long_span = layout
+    rng = random.Random(1)
+    db.execute(VendorApplication.__table__.insert(), [
+        {"applicant_name": f"V{rng.randint(0, 50_000)}", "name_key": "", "status": rng.choice(["APPROVED", "REQUESTED", "EXPIRED"]),
+         "latitude": round(min_lat + rng.random() * lat_span, 5), "longitude": round(min_long + rng.random() * long_span, 5)}
+        for _ in range(ROWS)
+    ])
+    refresh_current_vendors(db)
+    db.commit()
+
+
+def time_per_query(search):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = search()
+    return (time.perf_counter() - started) / REPEAT * 1000, len(rows)
+
+
+def main():
+    print(f"{'layout':>6} {'radius':>7} {'rows':>6} {'btree ms':>9} {'rtree ms':>9}")
+    for name, layout in LAYOUTS.items():
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        populate(db, layout)
+        lat, long = layout[0] + layout[1] / 2, layout[2] + layout[3] / 2
+        for radius in RADII:
+            box = get_bounding_box(lat, long, radius)
+            btree, rows = time_per_query(lambda: btree_query(box, db, False))
+            db.expunge_all()
+            rtree, _ = time_per_query(lambda: get_applicants_within_radius(box, db, False))
+            db.expunge_all()
+            print(f"{name:>6} {radius:>7} {rows:>6} {btree:>9.2f} {rtree:>9.2f}")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Throughput of the SQL nearby path under concurrent load: the old sync handler
+(threadpool + blocking Session) against the async handler (AsyncSession + run_sync).
+
+    PROJECT_NAME=bench DATABASE_URL=sqlite:////tmp/bench_concurrency.db python -m benchmarks.bench_concurrency
+
+Requests go through httpx's ASGI transport, so this measures the app and the
+database driver without network noise. Both handlers skip the in-memory indexes.
+"""
+import asyncio
+import os
+import random
+import time
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.db import Base, engine
+from app.data_loader import refresh_current_vendors
+from app.dependencies import get_db, get_async_db
+from app.models import VendorApplication
+from app.services import get_vendors_nearby
+
+ROWS = 5_000
+REQUESTS = 1_000
+CONCURRENCY = (1, 16, 64, 256)
+
+bench = FastAPI()
+
+
+@bench.get("/sync")
+def nearby_sync(lat: float, long: float, db: Session = Depends(get_db)):
+    return [v.id for v in get_vendors_nearby(lat, long, db)]
+
+
+@bench.get("/async")
+async def nearby_async(lat: float, long: float, db: AsyncSession = Depends(get_async_db)):
+    return [v.id for v in await db.run_sync(lambda session: get_vendors_nearby(lat, long, session))]
+
+
+def populate():
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    rng = random.Random(2)
+    with Session(engine) as db:
+        db.bulk_insert_mappings(VendorApplication, [
+            {"applicant_name": f"Vendor {i}", "facility_type": "Truck", "status": "APPROVED", "address": "",
+             "latitude": 37.70 + rng.random() * 0.12, "longitude": -122.52 + rng.random() * 0.14}
+            for i in range(ROWS)
+        ])
+        # get_vendors_nearby reads the latest application per location from current_vendor
+        refresh_current_vendors(db)
+        db.commit()
+
+
+async def run(path: str, concurrency: int):
+    rng = random.Random(3)
+    points = [(37.70 + rng.random() * 0.12, -122.52 + rng.random() * 0.14) for _ in range(REQUESTS)]
+    queue = asyncio.Queue()
+    for point in points:
+        queue.put_nowait(point)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=bench), base_url="http://bench") as client:
+        found = 0
+
+        async def worker():
+            nonlocal found
+            while not queue.empty():
+                lat, long = queue.get_nowait()
+                response = await client.get(path, params={"lat": lat, "long": long})
+                response.raise_for_status()
+                found += len(response.json())
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        # Guard against timing empty answers
+        assert found, f"{path} returned no vendors"
+        return REQUESTS / elapsed
+
+
+async def compare():
+    # One event loop for every run, the async engine's connection pool is bound to it
+    print(f"{'concurrency':>12} {'sync req/s':>12} {'async req/s':>12}")
+    for concurrency in CONCURRENCY:
+        sync_rate = await run("/sync", concurrency)
+        async_rate = await run("/async", concurrency)
+        print(f"{concurrency:>12} {sync_rate:>12.0f} {async_rate:>12.0f}")
+
+
+def main():
+    if not settings.database_url.startswith("sqlite:///") or settings.database_url.endswith(":memory:"):
+        raise SystemExit("Point DATABASE_URL at a file database, both engines must see the same data")
+    populate()
+    print(f"{ROWS} rows, {REQUESTS} requests per run, cpu count {os.cpu_count()}")
+    asyncio.run(compare())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Throughput of the production server (gunicorn.conf.py) as the worker count grows.
+
+Starts gunicorn once per worker count, waits for /ready, then drives a fixed mix of
+read endpoints over keep-alive connections and reports requests per second.
+
+    PROJECT_NAME=bench DATABASE_URL=sqlite:////tmp/bench_workers.db python -m benchmarks.bench_workers [1 2 4 8]
+"""
+import asyncio
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+import httpx
+
+PORT = 8765
+REQUESTS = 4000
+CONCURRENCY = 64
+WORKER_COUNTS = [1, 2, 4]
+
+
+def request_paths(count: int):
+    rng = random.Random(3)
+    paths = []
+    for _ in range(count):
+        lat, long = 37.74 + rng.random() * 0.08, -122.45 + rng.random() * 0.06
+        paths.append(rng.choice([
+            f"/applications/nearby?lat={lat:.5f}&long={long:.5f}",
+            f"/applications/nearest?lat={lat:.5f}&long={long:.5f}&k=10",
+            "/applications/address?contains=market",
+            "/applications/autocomplete?prefix=the",
+        ]))
+    return paths
+
+
+def start_server(workers: int):
+    env = dict(os.environ, SERVER_WORKERS=str(workers), SERVER_PORT=str(PORT), SERVER_HOST="127.0.0.1")
+    server = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "--access-logfile", os.devnull,
+                               "app.main:app"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{PORT}/ready").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise SystemExit(f"Server with {workers} workers did not become ready")
+
+
+async def drive(paths):
+    queue = asyncio.Queue()
+    for path in paths:
+        queue.put_nowait(path)
+    latencies = []
+    limits = httpx.Limits(max_connections=CONCURRENCY, max_keepalive_connections=CONCURRENCY)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits) as client:
+        async def client_loop():
+            while not queue.empty():
+                path = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(CONCURRENCY)))
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    return len(paths) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main():
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or WORKER_COUNTS
+    paths = request_paths(REQUESTS)
+    print(f"{REQUESTS} requests at concurrency {CONCURRENCY}, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for workers in worker_counts:
+        server = start_server(workers)
+        try:
+            asyncio.run(drive(paths[:200]))  # warm the connections and caches
+            rate, p50, p99 = asyncio.run(drive(paths))
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait()
+        print(f"{workers:>8} {rate:>8.0f} {p50:>8.1f} {p99:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
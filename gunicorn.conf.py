@@ -0,0 +1,18 @@
+# Production server: gunicorn -c gunicorn.conf.py app.main:app
+# Workers, keep-alive and backlog come from the SERVER_* settings in app/config.py.
+from app.config import settings
+from app.server import worker_count, preload_indexes
+
+bind = f"{settings.server_host}:{settings.server_port}"
+workers = worker_count()
+worker_class = "uvicorn_worker.UvicornWorker"
+keepalive = settings.server_keepalive_seconds
+backlog = settings.server_backlog
+timeout = settings.server_timeout_seconds
+# Import the app in the master so the data and indexes are shared copy-on-write after fork
+preload_app = True
+accesslog = "-"
+
+
+def on_starting(server):
+    preload_indexes()
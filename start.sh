@@ -16,6 +16,7 @@ else
     echo "Using external database: $DATABASE_URL"
 fi
 
-# Start the FastAPI application
-echo "Starting FastAPI server on port 8000..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+# Start the FastAPI application: gunicorn master preloads the data, then forks
+# SERVER_WORKERS uvicorn workers (one per available CPU by default)
+echo "Starting FastAPI server on port ${SERVER_PORT:-8000}..."
+exec gunicorn -c gunicorn.conf.py app.main:app
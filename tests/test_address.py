@@ -5,6 +5,7 @@ from app.db import Base  # import your Base and models
 import datetime
 from app.models import VendorApplication
 from app.services import get_vendors_by_address
+from app.indexes import build_indexes
 
 # Setup test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -87,3 +88,51 @@ def test_get_applicants_by_address_only_truck(db):
     result = get_vendors_by_address('market',  db)
     assert len(result) == 0
 
+@pytest.mark.parametrize("contains", ["california", "San", "Ma", " Mai ", "market", "s", "st", "4 ", "123 sansome st",
+                                      "ansome s", "Main st", "SANSOME ST x"])
+def test_get_applicants_by_address_index_matches_sql(db, contains):
+    db.add_all([
+        VendorApplication(applicant_name = 'A1', address = '123 Sansome st', facility_type="Truck", status="APPROVED"),
+        VendorApplication(applicant_name = 'A1', address = '123 Sansome st', facility_type="Truck", status="PENDING"),
+        VendorApplication(applicant_name = 'A2', address = '4 Market st', facility_type="Cart", status="APPROVED"),
+        VendorApplication(applicant_name = 'A3', address = '4 Main st', facility_type="Truck", status="APPROVED"),
+        VendorApplication(applicant_name = 'A4', address = None, facility_type="Truck", status="APPROVED"),
+    ])
+    db.commit()
+    indexes = build_indexes(db)
+
+    expected = [v.id for v in get_vendors_by_address(contains, db)]
+    result = [v.id for v in get_vendors_by_address(contains, None, indexes)]
+
+    assert result == expected
+
+def add_trucks(db, count=7):
+    db.add_all([
+        VendorApplication(id = i, applicant_name = f'A{i}', address = f'{i} Market st', facility_type="Truck", status="APPROVED")
+        for i in range(1, count + 1)
+    ])
+    db.add(VendorApplication(id = count + 1, applicant_name = 'C', address = '9 Market st', facility_type="Cart", status="APPROVED"))
+    db.commit()
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_get_applicants_by_address_keyset_pages(db, use_index):
+    add_trucks(db)
+    indexes = build_indexes(db) if use_index else None
+
+    pages, cursor = [], None
+    while True:
+        page = get_vendors_by_address('market', db, indexes, after=cursor, limit=3)
+        pages.append([v.id for v in page])
+        if len(page) < 3:
+            break
+        cursor = page[-1].id
+
+    assert pages == [[1, 2, 3], [4, 5, 6], [7]]
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_get_applicants_by_address_after_last_id(db, use_index):
+    add_trucks(db)
+    indexes = build_indexes(db) if use_index else None
+
+    assert get_vendors_by_address('market', db, indexes, after=7) == []
+    assert [v.id for v in get_vendors_by_address('market', db, indexes, after=5)] == [6, 7]
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import HTTPException
+from app.models import VendorRecord
+from app.indexes import VendorIndexes
+from app.services import get_completions
+from app.trie import PrefixIndex
+
+VALUES = [
+    ("The Geez Freeze", "APPROVED"),
+    ("Datam SF LLC dba Anzu To You", "APPROVED"),
+    ("Anzu Ramen", "REQUESTED"),
+    ("Anzu Ramen", "EXPIRED"),
+    ("Anzu Ramen", "REQUESTED"),
+    ("Geez Louise", "EXPIRED"),
+    ("", "APPROVED"),
+    (None, "APPROVED"),
+]
+
+def texts(completions):
+    return [c.text for c in completions]
+
+def test_complete_word_prefixes():
+    index = PrefixIndex(VALUES)
+    assert texts(index.complete("anz")) == ["Datam SF LLC dba Anzu To You", "Anzu Ramen"]
+    assert texts(index.complete("GEEZ")) == ["The Geez Freeze", "Geez Louise"]
+    assert texts(index.complete("the geez f")) == ["The Geez Freeze"]
+    assert texts(index.complete("anzu  to")) == ["Datam SF LLC dba Anzu To You"]
+    assert index.complete("xyz") == []
+
+def test_complete_ranks_approved_then_popularity():
+    index = PrefixIndex(VALUES + [("Anzu Express", "EXPIRED")])
+    completions = index.complete("anzu")
+    assert texts(completions) == ["Datam SF LLC dba Anzu To You", "Anzu Ramen", "Anzu Express"]
+    assert [(c.count, c.approved) for c in completions] == [(1, True), (3, False), (1, False)]
+
+def test_complete_limit():
+    index = PrefixIndex([(f"Truck {i:02}", "APPROVED") for i in range(30)], max_results=10)
+    assert texts(index.complete("truck")) == [f"Truck {i:02}" for i in range(10)]
+    assert len(index.complete("truck", 3)) == 3
+
+def test_get_completions_address():
+    indexes = VendorIndexes([
+        VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="3750 18TH ST"),
+        VendorRecord(id=2, applicant_name="B", facility_type="Truck", status="APPROVED", address="2535 TAYLOR ST"),
+    ])
+    assert texts(get_completions("18", "address", None, indexes)) == ["3750 18TH ST"]
+    assert texts(get_completions("18", "name", None, indexes)) == []
+
+def test_get_completions_validation():
+    with pytest.raises(HTTPException) as e:
+        get_completions("  ", "name", None, None)
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        get_completions("an", "name", None, None)
+    assert e.value.status_code == 503
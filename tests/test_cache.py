@@ -0,0 +1,112 @@
+import pytest
+import random
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base  # import your Base and models
+from app.models import VendorApplication
+from app.data_loader import refresh_current_vendors
+from app.cache import LRUCache
+from app.dataset import bump_dataset_version
+from app.indexes import VendorIndexes, build_indexes
+from app.services import get_vendors_nearby
+from app.utils import geohash_encode, geohash_bounds
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def test_geohash_encode():
+    assert geohash_encode(37.7749, -122.4194, 7) == "9q8yyk8"
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+
+@pytest.mark.parametrize("lat,lon", [(37.7749, -122.4194), (-33.8688, 151.2093), (0.0, 0.0), (89.9, -179.9)])
+def test_geohash_bounds_contain_point(lat, lon):
+    min_lat, max_lat, min_lon, max_lon = geohash_bounds(geohash_encode(lat, lon, 6))
+    assert min_lat <= lat <= max_lat
+    assert min_lon <= lon <= max_lon
+    assert max_lat - min_lat < 0.01
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+def test_lru_expires_entries():
+    cache = LRUCache(max_entries=2, ttl_seconds=-1)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+def test_lru_invalidated_by_dataset_version():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", 1)
+    bump_dataset_version()
+
+    assert cache.get("a") is None
+    assert cache.stats()["invalidations"] == 1
+
+def test_lru_ignores_results_from_an_old_version():
+    cache = LRUCache(max_entries=2, ttl_seconds=60)
+    version = cache.stats()["dataset_version"]
+    bump_dataset_version()
+    cache.put("a", 1, version)
+    assert cache.get("a") is None
+
+@pytest.mark.parametrize("use_index", [True, False])
+def test_cached_nearby_matches_uncached(db, use_index):
+    rng = random.Random(9)
+    db.add_all([
+        VendorApplication(id = i, latitude=37.75 + rng.random() * 0.05, longitude=-122.45 + rng.random() * 0.05,
+                          status=rng.choice(["APPROVED", "REQUESTED"]), applicant_name=rng.choice(["A", "B"]))
+        for i in range(1, 300)
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+    indexes = build_indexes(db) if use_index else None
+    cache = LRUCache(max_entries=100, ttl_seconds=60)
+
+    for _ in range(60):
+        # Points near each other share geohash cells
+        lat, long = 37.77 + rng.random() * 0.01, -122.43 + rng.random() * 0.01
+        all_status = rng.random() < 0.5
+        expected = [v.id for v in get_vendors_nearby(lat, long, db, all_status)]
+        assert [v.id for v in get_vendors_nearby(lat, long, db, all_status, indexes, cache)] == expected
+
+    assert cache.stats()["hits"] > 0
+
+def test_reload_between_resolving_indexes_and_caching(db):
+    db.add_all([VendorApplication(id=i, latitude=37.77 + i * 0.0001, longitude=-122.43, status="APPROVED",
+                                  applicant_name=f"V{i}") for i in range(1, 10)])
+    db.commit()
+    refresh_current_vendors(db)
+    old = build_indexes(db)
+    new = VendorIndexes([])
+    cache = LRUCache(max_entries=100, ttl_seconds=60)
+
+    # A request resolved the old indexes, then a reload swapped in new ones before its cache miss
+    bump_dataset_version()
+    assert [v.id for v in get_vendors_nearby(37.77, -122.43, db, False, old, cache)] == [1, 2, 3, 4, 5]
+
+    assert get_vendors_nearby(37.77, -122.43, db, False, new, cache) == []
+    # A request that still holds the old indexes keeps getting their answer
+    assert [v.id for v in get_vendors_nearby(37.77, -122.43, db, False, old, cache)] == [1, 2, 3, 4, 5]
@@ -0,0 +1,77 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base  # import your Base and models
+import datetime
+from app.models import VendorApplication
+from app.data_loader import ingest_csv
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+CSV = """locationid,Applicant,FacilityType,Address,Status,Latitude,Longitude,Approved,ExpirationDate
+1,The Geez Freeze,Truck,3750 18TH ST,APPROVED,37.76201920035647,-122.42730642251331,01/28/2022 12:00:00 AM,11/15/2022 12:00:00 AM
+2,Anzu To You,Truck,2535 TAYLOR ST,REQUESTED,37.805885350100986,-122.41594524663745,,2022-11-15
+3,Bad Coordinates,Truck,1 MARKET ST,APPROVED,not-a-number,-122.4,,
+4,No Coordinates,,5 MAIN ST,EXPIRED,,,,
+5,"Comma, Inc",Push Cart,"1 A ST, UNIT 2",APPROVED,37.7,-122.5,03/01/2021 01:30:00 PM,
+"""
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture
+def csv_file(tmp_path):
+    path = tmp_path / "permits.csv"
+    path.write_text(CSV)
+    return str(path)
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+def test_ingest_csv_counts(db, csv_file, chunk_size):
+    stats = ingest_csv(db, csv_file, chunk_size)
+    db.commit()
+
+    assert stats["rows_inserted"] == 4
+    assert stats["rows_rejected"] == 1
+    assert db.query(VendorApplication).count() == 4
+
+def test_ingest_csv_columns(db, csv_file):
+    ingest_csv(db, csv_file)
+    db.commit()
+
+    vendors = {v.applicant_name: v for v in db.query(VendorApplication)}
+    assert set(vendors) == {"The Geez Freeze", "Anzu To You", "No Coordinates", "Comma, Inc"}
+
+    geez = vendors["The Geez Freeze"]
+    assert geez.facility_type == "Truck"
+    assert geez.status == "APPROVED"
+    assert geez.latitude == 37.76201920035647
+    assert geez.approved == datetime.datetime(2022, 1, 28)
+    assert geez.expiration_date == datetime.datetime(2022, 11, 15)
+
+    assert vendors["Anzu To You"].approved is None
+    assert vendors["Anzu To You"].expiration_date == datetime.datetime(2022, 11, 15)
+    assert vendors["No Coordinates"].latitude is None
+    assert vendors["No Coordinates"].facility_type == ""
+    assert vendors["Comma, Inc"].address == "1 A ST, UNIT 2"
+    assert vendors["Comma, Inc"].approved == datetime.datetime(2021, 3, 1, 13, 30)
+
+def test_ingest_csv_older_name_column(db, tmp_path):
+    path = tmp_path / "permits.csv"
+    path.write_text("locationid,FacilityType,Address,Status,Latitude,Longitude,Approved,ExpirationDate,Name\n"
+                    "1,Truck,3750 18TH ST,APPROVED,37.76,-122.42,,,The Geez Freeze\n")
+
+    ingest_csv(db, str(path))
+    db.commit()
+
+    assert [v.applicant_name for v in db.query(VendorApplication)] == ["The Geez Freeze"]
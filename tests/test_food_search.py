@@ -0,0 +1,68 @@
+import pytest
+import random
+from fastapi import HTTPException
+from app.food_index import FoodIndex, analyze, intersect
+from app.indexes import VendorIndexes
+from app.models import VendorRecord
+from app.services import search_food_items
+from app.stemmer import stem
+import numpy as np
+
+def vendor(id, food_items, status="APPROVED", latitude=37.77, longitude=-122.42):
+    return VendorRecord(id=id, applicant_name=f"Vendor {id}", facility_type="Truck", status=status, address="",
+                        latitude=latitude, longitude=longitude, food_items=food_items)
+
+INDEXES = VendorIndexes([
+    vendor(1, "Tacos: Burritos: Quesadillas: Sodas"),
+    vendor(2, "Hot dogs: Sodas"),
+    vendor(3, "Taco Tuesday tacos: tacos al pastor", "EXPIRED"),
+    vendor(4, "Cold Truck: Sandwiches: Chips: Candy: Coffee: Tea: Various beverages and other snacks"),
+    vendor(5, "Tacos: Burritos", latitude=37.80, longitude=-122.27),
+    vendor(6, None),
+])
+
+@pytest.mark.parametrize("word,expected", [
+    ("tacos", "taco"), ("sandwiches", "sandwich"), ("caresses", "caress"), ("ponies", "poni"),
+    ("hopping", "hop"), ("agreed", "agre"), ("relational", "relat"), ("electrical", "electr"), ("ox", "ox"),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected
+
+def test_analyze_drops_stopwords_and_punctuation():
+    assert analyze("Various beverages and other snacks.Hot Dogs") == ["beverag", "snack", "hot", "dog"]
+    assert analyze(None) == []
+
+def test_intersect_matches_sets():
+    rng = random.Random(5)
+    for _ in range(50):
+        a = np.array(sorted(rng.sample(range(200), rng.randint(0, 40))), dtype=np.int32)
+        b = np.array(sorted(rng.sample(range(200), rng.randint(0, 120))), dtype=np.int32)
+        assert intersect(a, b).tolist() == sorted(set(a.tolist()) & set(b.tolist()))
+
+def test_search_matches_every_word_in_any_form():
+    assert [v.id for v, _ in INDEXES.food.search("taco")] == [5, 1]
+    assert [v.id for v, _ in INDEXES.food.search("Burrito, soda")] == [1]
+    assert INDEXES.food.search("tacos pizza") == []
+    assert INDEXES.food.search("and the") == []
+
+def test_search_ranks_with_bm25():
+    # Repeated terms score higher, and a shorter menu outranks a longer one with the same match
+    ranked = INDEXES.food.search("tacos", all_status=True)
+    assert [v.id for v, _ in ranked] == [3, 5, 1]
+    assert ranked[0][1] > ranked[1][1] > ranked[2][1] > 0
+
+def test_search_limit_breaks_ties_by_id():
+    records = [vendor(id, "Coffee") for id in range(10, 0, -1)]
+    assert [v.id for v, _ in FoodIndex(records).search("coffee", limit=3)] == [1, 2, 3]
+
+def test_search_near_a_point():
+    results = search_food_items("tacos", INDEXES, lat=37.77, long=-122.42, radius_miles=1)
+    assert [(v.id, distance) for v, _, distance in results] == [(1, 0.0)]
+    assert search_food_items("hot dogs", INDEXES, lat=37.80, long=-122.27, radius_miles=1) == []
+
+def test_search_validation():
+    for query, lat, long, indexes, status in [("  ", None, None, INDEXES, 400), ("tacos", 37.7, None, INDEXES, 400),
+                                              ("tacos", 91, -122, INDEXES, 400), ("tacos", None, None, None, 503)]:
+        with pytest.raises(HTTPException) as e:
+            search_food_items(query, indexes, lat=lat, long=long)
+        assert e.value.status_code == status
@@ -0,0 +1,68 @@
+import pytest
+import random
+from fastapi import HTTPException
+from app.bktree import BKTree
+from app.models import VendorRecord
+from app.indexes import VendorIndexes
+from app.services import get_vendors_by_name_fuzzy
+from app.utils import levenshtein_distance
+
+def vendor(id, name, status="APPROVED"):
+    return VendorRecord(id=id, applicant_name=name, facility_type="Truck", status=status, address="")
+
+INDEXES = VendorIndexes([
+    vendor(1, "The Geez Freeze"),
+    vendor(2, "Datam SF LLC dba Anzu To You"),
+    vendor(3, "Tacos El Primo", "EXPIRED"),
+    vendor(4, "Tacos El Primo"),
+    vendor(5, "Natan's Catering"),
+])
+
+@pytest.mark.parametrize("a,b,distance", [
+    ("", "", 0), ("abc", "", 3), ("kitten", "sitting", 3), ("geez freez", "geez freeze", 1),
+    ("anzu 2 you", "anzu to you", 2), ("flaw", "lawn", 2),
+])
+def test_levenshtein_distance(a, b, distance):
+    assert levenshtein_distance(a, b) == distance
+    assert levenshtein_distance(b, a) == distance
+
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 3])
+def test_bktree_matches_brute_force(max_distance):
+    rng = random.Random(3)
+    words = {"".join(rng.choice("abcde") for _ in range(rng.randint(1, 7))) for _ in range(300)}
+    tree = BKTree(words)
+
+    for query in ["abc", "edcba", "a", "bbbbbbb", "aceace"]:
+        expected = sorted((w, levenshtein_distance(query, w)) for w in words if levenshtein_distance(query, w) <= max_distance)
+        assert sorted(tree.search(query, max_distance)) == expected
+
+def test_fuzzy_matches_misspelled_names():
+    assert [(v.id, d) for v, d in get_vendors_by_name_fuzzy("Geez Freez", False, INDEXES)] == [(1, 1)]
+    assert [(v.id, d) for v, d in get_vendors_by_name_fuzzy("Anzu 2 You", False, INDEXES)] == [(2, 2)]
+    assert [(v.id, d) for v, d in get_vendors_by_name_fuzzy("natans catering", False, INDEXES)] == [(5, 0)]
+
+def test_fuzzy_respects_status():
+    assert [v.id for v, _ in get_vendors_by_name_fuzzy("tacos el primos", False, INDEXES)] == [4]
+    assert [v.id for v, _ in get_vendors_by_name_fuzzy("tacos el primos", True, INDEXES)] == [3, 4]
+
+def test_fuzzy_filters_on_opening_hours():
+    indexes = VendorIndexes([
+        VendorRecord(id=1, applicant_name="The Geez Freeze", facility_type="Truck", status="APPROVED", address="",
+                     dayshours="Mo-Fr:10AM-2PM"),
+        VendorRecord(id=2, applicant_name="The Geez Freeze", facility_type="Truck", status="APPROVED", address="",
+                     dayshours="Sa-Su:10AM-2PM"),
+    ])
+    monday_noon = 12 * 60
+    assert [v.id for v, _ in get_vendors_by_name_fuzzy("Geez Freez", False, indexes)] == [1, 2]
+    assert [v.id for v, _ in get_vendors_by_name_fuzzy("Geez Freez", False, indexes, monday_noon)] == [1]
+
+def test_fuzzy_short_names_need_exact_match():
+    assert get_vendors_by_name_fuzzy("gez", False, INDEXES) == []
+
+def test_fuzzy_validation():
+    with pytest.raises(HTTPException) as e:
+        get_vendors_by_name_fuzzy("  ", False, INDEXES)
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        get_vendors_by_name_fuzzy("geez", False, None)
+    assert e.value.status_code == 503
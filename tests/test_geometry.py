@@ -0,0 +1,91 @@
+import pytest
+import random
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import VendorApplication
+from app.data_loader import refresh_current_vendors
+from app.indexes import build_indexes
+from app.geometry import points_in_polygon, distances_to_path, expand_bounds
+from app.services import get_vendors_in_polygon, get_vendors_along_route
+from app.utils import haversine_distance
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+# An L-shaped block: the square (37.70..37.80, -122.50..-122.40) without its north-east quarter
+L_SHAPE = [(37.70, -122.50), (37.70, -122.40), (37.75, -122.40), (37.75, -122.45), (37.80, -122.45), (37.80, -122.50)]
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    rng = random.Random(11)
+    db.add_all([
+        VendorApplication(id=i, applicant_name=f"Vendor {i}", status="APPROVED" if i % 4 else "EXPIRED",
+                          latitude=rng.uniform(37.68, 37.82), longitude=rng.uniform(-122.52, -122.38))
+        for i in range(1, 401)
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def test_points_in_polygon():
+    lats = [37.72, 37.78, 37.78, 37.72, 37.90]
+    longs = [-122.42, -122.48, -122.42, -122.48, -122.48]
+    assert points_in_polygon(lats, longs, L_SHAPE).tolist() == [True, True, False, True, False]
+
+def test_distances_to_path_match_haversine():
+    path = [(37.77, -122.42), (37.78, -122.42), (37.78, -122.40)]
+    distances, along = distances_to_path([37.775, 37.785, 37.77], [-122.421, -122.41, -122.42], path)
+    assert distances[0] == pytest.approx(haversine_distance(37.775, -122.421, 37.775, -122.42), rel=1e-3)
+    assert distances[1] == pytest.approx(haversine_distance(37.785, -122.41, 37.78, -122.41), rel=1e-3)
+    assert distances[2] == pytest.approx(0, abs=1e-9)
+    assert along[2] == 0 and along[0] < along[1]
+
+def test_expand_bounds_covers_distance():
+    min_lat, max_lat, min_long, max_long = expand_bounds((37.7, 37.8, -122.5, -122.4), 0.5)
+    assert haversine_distance(37.8, -122.4, max_lat, -122.4) == pytest.approx(0.5, rel=1e-6)
+    assert haversine_distance(37.8, -122.4, 37.8, max_long) >= 0.5
+
+@pytest.mark.parametrize("all_status", [False, True])
+def test_polygon_matches_brute_force(db, all_status):
+    vendors = db.query(VendorApplication).order_by(VendorApplication.id).all()
+    inside = points_in_polygon([v.latitude for v in vendors], [v.longitude for v in vendors], L_SHAPE)
+    expected = [v.id for v, keep in zip(vendors, inside) if keep and (all_status or v.status == "APPROVED")]
+    assert expected
+    assert [v.id for v in get_vendors_in_polygon(L_SHAPE, db, all_status)] == expected
+    assert [v.id for v in get_vendors_in_polygon(L_SHAPE, db, all_status, build_indexes(db))] == expected
+
+@pytest.mark.parametrize("distance_m", [50, 200, 1000])
+def test_route_matches_brute_force(db, distance_m):
+    rng = random.Random(distance_m)
+    path = [(37.70 + 0.0005 * i, -122.50 + 0.0004 * i + rng.uniform(-0.001, 0.001)) for i in range(200)]
+    vendors = [v for v in db.query(VendorApplication).order_by(VendorApplication.id) if v.status == "APPROVED"]
+    distances, along = distances_to_path([v.latitude for v in vendors], [v.longitude for v in vendors], path)
+    near = [i for i in np.argsort(along, kind="stable") if distances[i] <= distance_m / 1000]
+    expected = [vendors[i].id for i in near]
+    assert expected
+
+    for indexes in (None, build_indexes(db)):
+        result = get_vendors_along_route(path, distance_m, db, False, indexes)
+        assert [v.id for v, _ in result] == expected
+        assert all(d <= distance_m / 1000 for _, d in result)
+
+def test_shape_validation(db):
+    for call in [lambda: get_vendors_in_polygon([(37.7, -122.4), (37.8, -122.4)], db),
+                 lambda: get_vendors_along_route([(37.7, -122.4)], 200, db),
+                 lambda: get_vendors_along_route([(37.7, -122.4), (97.8, -122.4)], 200, db),
+                 lambda: get_vendors_in_polygon([(37.7, -122.4)] * 1001, db)]:
+        with pytest.raises(HTTPException) as e:
+            call()
+        assert e.value.status_code == 400
@@ -1,8 +1,22 @@
+import json
+import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.startup import startup_state
+from app.indexes import get_indexes
+from app.routes import VendorApplicationResponse
+from pydantic import TypeAdapter
+from typing import List
 
 client = TestClient(app)
 
+@pytest.fixture(scope="module", autouse=True)
+def started_app():
+    # Entering the client runs the lifespan, which warms up in the background
+    with client:
+        assert startup_state.wait(timeout=60)
+        yield
+
 def test_read_without_name():
     response = client.get("/applications", headers={"X-Token": "coneofsilence"})
     assert response.status_code == 422
@@ -66,3 +80,232 @@ def test_read_nearby_lat_missing():
 def test_read_nearby_long_missing():
     response = client.get("/applications/nearby?lat=37.79", headers={"X-Token": "coneofsilence"})
     assert response.status_code == 422
+
+def test_read_nearest():
+    response = client.get("/applications/nearest?lat=37.79&long=-122.40&k=3", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    distances = [vendor["distance_km"] for vendor in response.json()]
+    assert distances == sorted(distances)
+
+def test_read_nearest_invalid_k():
+    response = client.get("/applications/nearest?lat=37.79&long=-122.40&k=0", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 422
+
+def test_read_nearby_batch():
+    points = [{"lat": 37.79, "long": -122.40}, {"lat": "abc", "long": 12}, {"lat": 91, "long": 12, "all_status": True}]
+    response = client.post("/applications/nearby/batch", json=points, headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body) == 3
+    assert body[0]["error"] is None
+    assert body[1]["error"].startswith("lat:")
+    assert body[2] == {"results": [], "error": "Latitude Longitide out of bounds"}
+
+def test_read_nearby_batch_not_a_list():
+    response = client.post("/applications/nearby/batch", json={"lat": 37.79}, headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 422
+
+def test_read_autocomplete():
+    response = client.get("/applications/autocomplete?prefix=geez", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    assert "The Geez Freeze" in [c["text"] for c in response.json()]
+
+def test_read_autocomplete_invalid_field():
+    response = client.get("/applications/autocomplete?prefix=geez&field=zip", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 422
+
+def test_read_name_fuzzy():
+    response = client.get("/applications?name=Geez%20Freez&fuzzy=true", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    assert response.json()[0]["applicant_name"] == "The Geez Freeze"
+    assert response.json()[0]["distance"] == 1
+
+def test_read_name_fuzzy_is_not_paginated():
+    assert client.get("/applications?name=Geez%20Freez&fuzzy=true&limit=5").status_code == 400
+    assert client.get("/applications?name=Geez%20Freez&fuzzy=true&cursor=1").status_code == 400
+
+def test_read_name_fuzzy_validates_open_filters():
+    response = client.get("/applications?name=Geez%20Freez&fuzzy=true&open_now=true&open_at=2024-01-01T12:00:00")
+    assert response.status_code == 400
+
+def test_read_name_exact_has_no_distance():
+    response = client.get("/applications?name=The%20Geez%20Freeze", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    assert "distance" not in response.json()[0]
+
+def test_read_nearby_cache_stats():
+    client.get("/applications/nearby?lat=37.79&long=-122.40", headers={"X-Token": "coneofsilence"})
+    response = client.get("/debug/nearby-cache")
+    assert response.status_code == 200
+    assert response.json()["hits"] + response.json()["misses"] > 0
+
+def test_read_nearby_etag():
+    response = client.get("/applications/nearby?lat=37.79&long=-122.40", headers={"X-Token": "coneofsilence"})
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"].startswith("public")
+
+    response = client.get("/applications/nearby?long=-122.40&lat=37.79", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert response.content == b""
+
+def test_read_etag_differs_per_query():
+    first = client.get("/applications/nearby?lat=37.79&long=-122.40")
+    second = client.get("/applications/nearby?lat=37.79&long=-122.40&all_status=true", headers={"If-None-Match": first.headers["etag"]})
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+
+def test_read_name_if_none_match_list():
+    etag = client.get("/applications?name=The%20Geez%20Freeze").headers["etag"]
+    response = client.get("/applications?name=The%20Geez%20Freeze", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert response.status_code == 304
+
+def test_live():
+    response = client.get("/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+def test_ready_reports_startup_timings():
+    response = client.get("/ready")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["ready"] is True
+    assert body["error"] is None
+    assert body["time_to_ready_seconds"] >= 0
+
+def test_read_by_address_pages():
+    everything = client.get("/applications/address?contains=st").json()
+    first = client.get("/applications/address?contains=st&limit=2")
+    second = client.get(f"/applications/address?contains=st&limit=2&cursor={first.headers['X-Next-Cursor']}")
+    assert len(everything) > 4
+    assert [v["id"] for v in first.json() + second.json()] == [v["id"] for v in everything[:4]]
+
+def test_read_by_address_last_page_has_no_cursor():
+    everything = client.get("/applications/address?contains=st").json()
+    response = client.get(f"/applications/address?contains=st&limit=2&cursor={everything[-2]['id']}")
+    assert [v["id"] for v in response.json()] == [everything[-1]["id"]]
+    assert "X-Next-Cursor" not in response.headers
+
+def test_read_by_address_invalid_limit():
+    response = client.get("/applications/address?contains=st&limit=0")
+    assert response.status_code == 422
+
+def test_read_by_address_ndjson():
+    everything = client.get("/applications/address?contains=st").json()
+    response = client.get("/applications/address?contains=st", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in response.text.splitlines()] == everything
+    assert "Accept" in response.headers["Vary"]
+    assert "ETag" in response.headers
+
+def test_read_by_address_ndjson_invalid_search():
+    response = client.get("/applications/address?contains=", headers={"Accept": "application/x-ndjson"})
+    assert response.status_code == 400
+
+def test_read_name_etag_depends_on_accept():
+    as_json = client.get("/applications?name=authentic")
+    as_ndjson = client.get("/applications?name=authentic", headers={"Accept": "application/x-ndjson"})
+    assert as_json.headers["ETag"] != as_ndjson.headers["ETag"]
+
+def test_read_by_address_matches_response_model():
+    vendors = get_indexes().addresses.search("st")
+    response = client.get("/applications/address?contains=st")
+    response_model = TypeAdapter(List[VendorApplicationResponse])
+    assert response.content == response_model.dump_json(response_model.validate_python(vendors))
+
+def test_read_by_food():
+    response = client.get("/applications/food?q=tacos&limit=5")
+    assert response.status_code == 200
+    results = response.json()
+    assert 0 < len(results) <= 5
+    assert all("taco" in vendor["food_items"].lower() and vendor["distance_km"] is None for vendor in results)
+    assert [vendor["score"] for vendor in results] == sorted((vendor["score"] for vendor in results), reverse=True)
+
+def test_read_by_food_nearby():
+    response = client.get("/applications/food?q=tacos&lat=37.7749&long=-122.4194&radius_miles=1")
+    assert response.status_code == 200
+    assert all(vendor["distance_km"] <= 1.609344 for vendor in response.json())
+
+def test_read_by_food_empty_query():
+    response = client.get("/applications/food?q=")
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Food search string cannot be empty or longer than 200 characters"}
+
+def test_read_nearby_open_at():
+    response = client.get("/applications/nearby?lat=37.7749&long=-122.4194&all_status=true&open_at=2024-06-03T12:30:00")
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+
+def test_read_nearby_open_now_is_not_cached():
+    response = client.get("/applications/nearby?lat=37.7749&long=-122.4194&open_now=true")
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+    assert response.headers["Cache-Control"] == "no-store"
+
+def test_read_name_open_now_and_open_at():
+    response = client.get("/applications?name=abc&open_now=true&open_at=2024-06-03T12:30:00")
+    assert response.status_code == 400
+
+def test_read_vendors_in_polygon():
+    polygon = [{"lat": 37.77, "long": -122.43}, {"lat": 37.77, "long": -122.40},
+               {"lat": 37.80, "long": -122.40}, {"lat": 37.80, "long": -122.43}]
+    response = client.post("/applications/within", json={"polygon": polygon})
+    assert response.status_code == 200
+    vendors = response.json()
+    assert vendors and all(37.77 <= v["latitude"] <= 37.80 and v["status"] == "APPROVED" for v in vendors)
+
+def test_read_vendors_along_route():
+    path = [{"lat": 37.7749, "long": -122.4194}, {"lat": 37.7793, "long": -122.4139}, {"lat": 37.7880, "long": -122.4075}]
+    response = client.post("/applications/along", json={"path": path, "distance_m": 300, "all_status": True})
+    assert response.status_code == 200
+    assert all(v["distance_km"] <= 0.3 for v in response.json())
+
+def test_read_vendors_along_route_invalid():
+    response = client.post("/applications/along", json={"path": [{"lat": 37.7, "long": -122.4}]})
+    assert response.status_code == 400
+    response = client.post("/applications/along", json={"path": [], "distance_m": 0})
+    assert response.status_code == 422
+
+def test_read_tile_clusters():
+    response = client.get("/applications/tiles?zoom=12&min_lat=37.70&max_lat=37.82&min_long=-122.52&max_long=-122.35")
+    assert response.status_code == 200
+    assert "ETag" in response.headers
+    body = response.json()
+    assert body["cluster_zoom"] == 15
+    assert body["clusters"] and all(c["count"] > 0 for c in body["clusters"])
+    assert all(c["vendor_id"] is not None for c in body["clusters"] if c["count"] == 1)
+
+def test_read_tile_clusters_box_too_large():
+    response = client.get("/applications/tiles?zoom=16&min_lat=37.70&max_lat=37.82&min_long=-122.52&max_long=-122.35")
+    assert response.status_code == 400
+
+def test_admin_reload(monkeypatch):
+    import time
+    from app.config import settings
+    from app.reload import reload_state
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    headers = {"X-Admin-Token": "secret"}
+    response = client.post("/admin/reload", headers=headers)
+    assert response.status_code == 202
+    deadline = time.monotonic() + 30
+    while reload_state.running and time.monotonic() < deadline:
+        time.sleep(0.05)
+    status = client.get("/admin/reload", headers=headers).json()
+    assert status["running"] is False
+    # Same CSV as at startup, so nothing to swap
+    assert status["last"]["error"] is None and status["last"]["swapped"] is False
+    assert "rss_delta_mb" in status["last"]
+
+def test_admin_reload_requires_token(monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "admin_token", "secret")
+    assert client.get("/admin/reload").status_code == 403
+    assert client.get("/admin/reload", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+def test_admin_disabled_without_token(monkeypatch):
+    from app.config import settings
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert client.post("/admin/reload").status_code == 403
+    assert client.get("/admin/reload", headers={"X-Admin-Token": ""}).status_code == 403
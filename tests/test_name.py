@@ -5,6 +5,8 @@ from app.db import Base  # import your Base and models
 import datetime
 from app.models import VendorApplication
 from app.services import get_vendors_by_name
+from app.indexes import build_indexes
+from app.utils import normalize_name
 
 # Setup test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -131,3 +133,46 @@ def test_get_vendors_by_name_sql_injection(db):
     db.commit()
     result =  get_vendors_by_name('delete from food_vendor_application;', db, True)
     assert len(result) == 0
+
+def test_name_key_is_stored_on_insert(db):
+    db.add(VendorApplication(applicant_name = "  El Tonayense   #60 ", status="APPROVED"))
+    db.commit()
+    assert db.query(VendorApplication).one().name_key == "el tonayense 60"
+
+def test_normalize_name():
+    assert normalize_name("Truly Food & More") == "truly food more"
+    assert normalize_name("  Datam SF LLC dba Anzu To You ") == "datam sf llc dba anzu to you"
+    assert normalize_name("STRASSE") == normalize_name("straße")
+    assert normalize_name("") == ""
+    assert normalize_name(None) is None
+
+@pytest.mark.parametrize("name", ["Authentic India", "authentic INDIA", "El Tonayense #60", "El Tonayense 60",
+                                  "Truly Food & More", "ANBC", "delete from food_vendor_application;"])
+@pytest.mark.parametrize("all_status", [True, False])
+def test_get_vendors_by_name_index_matches_sql(db, name, all_status):
+    db.add_all([
+        VendorApplication(applicant_name = "Authentic India", status="APPROVED"),
+        VendorApplication(applicant_name = "El Tonayense #60", status="PENDING"),
+        VendorApplication(applicant_name = "El Tonayense #60", status="APPROVED"),
+        VendorApplication(applicant_name = "Truly Food & More", status="EXPIRED"),
+        VendorApplication(applicant_name = "El Tonayense 60", status="APPROVED"),
+    ])
+    db.commit()
+    indexes = build_indexes(db)
+
+    expected = [v.id for v in get_vendors_by_name(name, db, all_status)]
+    result = [v.id for v in get_vendors_by_name(name, None, all_status, indexes)]
+
+    assert result == expected
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_get_vendors_by_name_keyset_page(db, use_index):
+    db.add_all([VendorApplication(id = i, applicant_name = 'Truck', status="APPROVED") for i in range(1, 6)])
+    db.commit()
+    indexes = build_indexes(db) if use_index else None
+
+    first = get_vendors_by_name('truck', db, False, indexes, limit=2)
+    second = get_vendors_by_name('truck', db, False, indexes, after=first[-1].id, limit=2)
+
+    assert [v.id for v in first] == [1, 2]
+    assert [v.id for v in second] == [3, 4]
@@ -1,10 +1,12 @@
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.db import Base  # import your Base and models
 import datetime
-from app.models import VendorApplication
+from app.models import VendorApplication, CurrentVendor
+from app.data_loader import refresh_current_vendors
 from app.services import get_applicants_within_radius, get_vendors_nearby
+from app.utils import get_bounding_box
 
 # Setup test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
@@ -35,6 +37,7 @@ def test_get_applicants_with_approved_status(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A")
     ])
     db.commit()
+    refresh_current_vendors(db)
     result =  get_applicants_within_radius(bounding_box, db, False)
     assert len(result) == 2
     for applicant in result:
@@ -54,6 +57,7 @@ def test_get_applicants_all_status_true(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A")
     ])
     db.commit()
+    refresh_current_vendors(db)
     result =  get_applicants_within_radius(bounding_box, db, True)
     assert len(result) == 3
 
@@ -67,6 +71,7 @@ def test_get_applicants_within_radius_all_status_true(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A")
     ])
     db.commit()
+    refresh_current_vendors(db)
     bounding_box = (0, 45, -76, -74.5)
     result =  get_applicants_within_radius(bounding_box, db, True)
 
@@ -90,6 +95,7 @@ def test_get_applicants_within_radius_result_greater_than_5(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A"),
     ])
     db.commit()
+    refresh_current_vendors(db)
     bounding_box = (41.0001, 41.0007, -75.01, -75.0)
     result =  get_applicants_within_radius(bounding_box, db, True)
 
@@ -112,6 +118,7 @@ def test_get_applicants_within_radius(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A"),
     ])
     db.commit()
+    refresh_current_vendors(db)
     bounding_box = (41.0001, 41.0003, -75.01, -75.0)
     result =  get_applicants_within_radius(bounding_box, db, True)
 
@@ -134,6 +141,7 @@ def test_get_vendors_nearby_return_top_5(db):
                           expiration_date=datetime.datetime(2025, 6, 1), applicant_name="ABC")
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.0, -75.0, db, False)
 
@@ -158,6 +166,7 @@ def test_get_vendors_nearby_all_status_true_max_5(db):
                           expiration_date=datetime.datetime(2025, 8, 1), applicant_name="A"),
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.003, -75.0, db, True)
 
@@ -172,6 +181,7 @@ def test_get_vendors_nearby_same_address_same_vendor_name(db):
                           expiration_date=datetime.datetime(2025, 6, 1), applicant_name="ABC")
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.001, -75.0, db, True)
 
@@ -186,6 +196,7 @@ def test_get_vendors_nearby_same_address_different_vendor_name(db):
                           expiration_date=datetime.datetime(2025, 6, 1), applicant_name="XYZ")
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.001, -75.0, db, True)
 
@@ -200,6 +211,7 @@ def test_get_vendors_nearby_same_address_same_vendor_name_only_approved(db):
                           expiration_date=datetime.datetime(2025, 6, 1), applicant_name="ABC")
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.001, -75.0, db, False)
 
@@ -215,9 +227,74 @@ def test_get_vendors_nearby_same_address_different_vendor_name_only_approved(db)
                           expiration_date=datetime.datetime(2025, 6, 1), applicant_name="XYZ")
     ])
     db.commit()
+    refresh_current_vendors(db)
     
     result =  get_vendors_nearby(41.001, -75.0, db, True)
 
     assert len(result) == 2
     assert result[0].id == 1
 
+
+def test_current_vendors_follow_reload(db):
+    bounding_box = get_bounding_box(41.0, -75.0)
+    db.add_all([
+        VendorApplication(id = 1, applicant_name = 'A1', latitude = 41.0001, longitude = -75.0, status="APPROVED"),
+        VendorApplication(id = 2, applicant_name = 'A1', latitude = 41.0001, longitude = -75.0, status="REQUESTED"),
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+    assert [a.id for a in get_applicants_within_radius(bounding_box, db, True)] == [2]
+    assert [a.id for a in get_applicants_within_radius(bounding_box, db, False)] == [1]
+
+    db.query(VendorApplication).filter(VendorApplication.id == 2).delete()
+    refresh_current_vendors(db)
+
+    assert [a.id for a in get_applicants_within_radius(bounding_box, db, True)] == [1]
+    assert db.query(CurrentVendor).count() == 2
+
+def test_sql_nearby_breaks_ties_by_id_like_the_index(db):
+    from app.indexes import build_indexes
+    # Scattered first, so the R*Tree does not hand the tied vendors back in id order
+    db.add_all([VendorApplication(id=i, applicant_name=f"Far {i}", latitude=41.0 + (i % 7) * 0.001,
+                                  longitude=-75.0 - (i % 5) * 0.001, status="APPROVED") for i in range(1, 40)])
+    db.add_all([VendorApplication(id=i, applicant_name=f"Tied {i}", latitude=41.0001, longitude=-75.0001,
+                                  status="APPROVED") for i in range(40, 60)])
+    db.commit()
+    refresh_current_vendors(db)
+
+    rows = get_applicants_within_radius(get_bounding_box(41.0, -75.0), db, False)
+    assert [a.id for a in rows] == sorted(a.id for a in rows)
+    sql = [a.id for a in get_vendors_nearby(41.0001, -75.0001, db, False)]
+    assert sql == [40, 41, 42, 43, 44]
+    assert sql == [a.id for a in get_vendors_nearby(41.0001, -75.0001, db, False, build_indexes(db))]
+
+def test_rtree_keeps_exact_box_edges(db):
+    # 41.0000000001 and 41.0000001 are the same float32, so the R*Tree alone cannot tell them apart
+    bounding_box = (41.0000000001, 41.01, -75.01, -74.99)
+    db.add_all([
+        VendorApplication(id = 1, applicant_name = 'Edge', latitude = 41.0000000001, longitude = -75.0, status="APPROVED"),
+        VendorApplication(id = 2, applicant_name = 'Outside', latitude = 41.0000000000, longitude = -75.0, status="APPROVED"),
+        VendorApplication(id = 3, applicant_name = 'Inside', latitude = 41.005, longitude = -74.99, status="APPROVED"),
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+
+    result = get_applicants_within_radius(bounding_box, db, False)
+
+    assert sorted(a.id for a in result) == [1, 3]
+
+def test_sqlite_nearby_query_searches_the_rtree(db):
+    db.add(VendorApplication(id = 1, applicant_name = 'A1', latitude = 41.0001, longitude = -75.0, status="APPROVED"))
+    db.commit()
+    refresh_current_vendors(db)
+    statements = []
+    listener = lambda conn, cursor, statement, parameters, context, executemany: statements.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        get_applicants_within_radius(get_bounding_box(41.0, -75.0), db, False)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    statement, parameters = statements[-1]
+    plan = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    assert "current_vendor_rtree VIRTUAL TABLE INDEX" in plan[0][-1]
@@ -0,0 +1,63 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base  # import your Base and models
+import random
+from app.models import VendorApplication
+from app.data_loader import refresh_current_vendors
+from app.indexes import build_indexes
+from app.services import get_vendors_nearby, get_vendors_nearby_batch
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+POINTS = [
+    (37.76, -122.45, False),
+    (37.76, -122.45, True),
+    (37.80, -122.40, False),
+    (95.0, -122.40, False),
+    (37.72, -122.50, True),
+    (41.0, -75.0, True),
+]
+
+def add_random_vendors(db):
+    rng = random.Random(5)
+    db.add_all([
+        VendorApplication(id = i, latitude=round(37.70 + rng.random() * 0.12, 3), longitude=round(-122.52 + rng.random() * 0.14, 3),
+                          status=rng.choice(["APPROVED", "REQUESTED"]), applicant_name=rng.choice(["A", "B", "C"]))
+        for i in range(1, 400)
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+
+@pytest.mark.parametrize("use_index", [True, False])
+def test_batch_matches_single_queries(db, use_index):
+    add_random_vendors(db)
+    indexes = build_indexes(db) if use_index else None
+
+    result = get_vendors_nearby_batch(POINTS, db, indexes)
+
+    assert len(result) == len(POINTS)
+    for (lat, long, all_status), (vendors, error) in zip(POINTS, result):
+        if lat > 90:
+            assert vendors == []
+            assert error.status_code == 400
+            continue
+        assert error is None
+        assert [v.id for v in vendors] == [v.id for v in get_vendors_nearby(lat, long, db, all_status)]
+
+def test_batch_empty(db):
+    assert get_vendors_nearby_batch([], db) == []
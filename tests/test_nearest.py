@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base  # import your Base and models
+import random
+from fastapi import HTTPException
+from app.models import VendorApplication
+from app.data_loader import refresh_current_vendors
+from app.indexes import build_indexes
+from app.services import get_vendors_nearest
+from app.utils import haversine_distance
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def add_random_vendors(db, count=300):
+    rng = random.Random(11)
+    db.add_all([
+        VendorApplication(id = i, latitude=37.70 + rng.random() * 0.12, longitude=-122.52 + rng.random() * 0.14,
+                          status=rng.choice(["APPROVED", "REQUESTED", "EXPIRED"]), applicant_name=f"V{i}")
+        for i in range(1, count + 1)
+    ])
+    # A lone truck well outside the search radius
+    db.add(VendorApplication(id = count + 1, latitude=37.95, longitude=-122.30, status="APPROVED", applicant_name="Far"))
+    db.commit()
+    refresh_current_vendors(db)
+
+def brute_force(db, lat, long, k, all_status):
+    vendors = [v for v in db.query(VendorApplication).order_by(VendorApplication.id)
+               if all_status or v.status == "APPROVED"]
+    vendors.sort(key=lambda v: haversine_distance(lat, long, v.latitude, v.longitude))
+    return [v.id for v in vendors[:k]]
+
+@pytest.mark.parametrize("lat,long", [(37.76, -122.45), (37.70, -122.52), (37.5, -122.0), (37.94, -122.31)])
+@pytest.mark.parametrize("k", [1, 5, 20])
+@pytest.mark.parametrize("all_status", [True, False])
+def test_index_nearest_matches_brute_force(db, lat, long, k, all_status):
+    add_random_vendors(db)
+    indexes = build_indexes(db)
+
+    result = get_vendors_nearest(lat, long, None, all_status, k, indexes)
+
+    assert [v.id for v, _ in result] == brute_force(db, lat, long, k, all_status)
+    for vendor, distance in result:
+        assert distance == pytest.approx(haversine_distance(lat, long, vendor.latitude, vendor.longitude))
+
+@pytest.mark.parametrize("lat,long", [(37.76, -122.45), (37.94, -122.31)])
+@pytest.mark.parametrize("all_status", [True, False])
+def test_sql_nearest_matches_brute_force(db, lat, long, all_status):
+    add_random_vendors(db)
+
+    result = get_vendors_nearest(lat, long, db, all_status, 5)
+
+    assert [v.id for v, _ in result] == brute_force(db, lat, long, 5, all_status)
+
+def test_nearest_fills_k_outside_search_radius(db):
+    add_random_vendors(db, count=3)
+
+    result = get_vendors_nearest(37.95, -122.30, db, True, 4)
+
+    assert len(result) == 4
+    assert result[0][0].id == 4
+    assert result[0][1] == 0
+
+def test_nearest_out_of_bounds(db):
+    with pytest.raises(HTTPException):
+        get_vendors_nearest(91, 0, db)
@@ -0,0 +1,141 @@
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import database_id
+from app.db import Base
+from app.models import VendorRecord
+import app.data_loader as data_loader
+import app.reload as reload
+from app.dataset import get_dataset_version
+from app.indexes import VendorIndexes, get_indexes, publish_indexes, save_snapshot
+from app.reload import ReloadState, SnapshotWatcher, reload_dataset
+from app.snapshot import write_snapshot
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+HEADER = "locationid,Applicant,FacilityType,Address,permit,Status,Latitude,Longitude\n"
+DAY_1 = HEADER + (
+    "1,The Geez Freeze,Truck,3750 18TH ST,21MFF-00015,APPROVED,37.762,-122.427\n"
+    "2,Anzu To You,Truck,2535 TAYLOR ST,21MFF-00106,APPROVED,37.805,-122.415\n"
+)
+DAY_2 = DAY_1 + "3,Natan's Catering,Truck,1 MARKET ST,21MFF-00107,APPROVED,37.79,-122.39\n"
+
+@pytest.fixture(autouse=True)
+def db(monkeypatch, tmp_path):
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(data_loader, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(reload, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(reload.settings, "snapshot_file", str(tmp_path / "snapshot.bin"))
+    # Put back the indexes the rest of the suite was using
+    saved = get_indexes()
+    try:
+        yield
+    finally:
+        publish_indexes(saved)
+        Base.metadata.drop_all(bind=engine)
+
+def write_csv(tmp_path, content):
+    path = tmp_path / "permits.csv"
+    path.write_text(content)
+    return str(path)
+
+def start(state):
+    assert state.try_start()
+    return state
+
+def test_reload_swaps_in_new_indexes(tmp_path):
+    state = start(ReloadState())
+    report = reload_dataset(write_csv(tmp_path, DAY_1), state)
+    assert report["swapped"] and report["error"] is None
+    assert report["inserted"] == 2 and report["records"] == 2
+    assert report["build_seconds"] >= 0 and "rss_delta_mb" in report
+    in_flight = get_indexes()
+    version = get_dataset_version()
+
+    report = reload_dataset(write_csv(tmp_path, DAY_2), start(state))
+    assert (report["inserted"], report["records"], report["previous_records"]) == (1, 3, 2)
+    assert get_dataset_version() == version + 1
+    # A request that started before the swap keeps answering from the old indexes
+    assert len(in_flight.records) == 2 and len(get_indexes().records) == 3
+    assert state.summary() == {"running": False, "last": report}
+
+def test_reload_without_changes_keeps_indexes(tmp_path):
+    reload_dataset(write_csv(tmp_path, DAY_1), start(ReloadState()))
+    indexes = get_indexes()
+    report = reload_dataset(write_csv(tmp_path, DAY_1), start(ReloadState()))
+    assert report["swapped"] is False and report["unchanged"] == 2
+    assert get_indexes() is indexes
+
+def test_readers_never_see_a_partial_dataset(tmp_path):
+    reload_dataset(write_csv(tmp_path, DAY_1), start(ReloadState()))
+    seen, done = set(), threading.Event()
+
+    def read():
+        while not done.is_set():
+            indexes = get_indexes()
+            seen.add(len(indexes.names.lookup("the geez freeze", True)) and len(indexes.records))
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    reload_dataset(write_csv(tmp_path, DAY_2), start(ReloadState()))
+    done.set()
+    reader.join()
+    assert seen <= {2, 3}
+
+def test_failed_reload_keeps_serving(tmp_path):
+    reload_dataset(write_csv(tmp_path, DAY_1), start(ReloadState()))
+    indexes = get_indexes()
+    state = start(ReloadState())
+    report = reload_dataset(str(tmp_path / "missing.csv"), state)
+    assert report["error"] and report["swapped"] is False
+    assert get_indexes() is indexes
+    assert not state.running
+
+def test_watcher_follows_snapshot_from_another_worker(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    mine = VendorIndexes([VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="")])
+    publish_indexes(mine)
+    save_snapshot(mine, path)
+    watcher = SnapshotWatcher(interval=0, path=path)
+    assert watcher.check() is False
+
+    theirs = VendorIndexes(mine.records + [VendorRecord(id=2, applicant_name="B", facility_type="Truck", status="APPROVED", address="")])
+    save_snapshot(theirs, path)
+    version = get_dataset_version()
+    assert watcher.check() is True
+    assert get_indexes().content_hash == theirs.content_hash
+    assert get_dataset_version() == version + 1
+    assert watcher.check() is False
+
+def test_watcher_swap_does_not_leave_stale_nearby_candidates(tmp_path):
+    from app.cache import LRUCache
+    from app.services import get_vendors_nearby
+    path = str(tmp_path / "snapshot.bin")
+    mine = VendorIndexes([VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="",
+                                       latitude=37.77, longitude=-122.43)])
+    publish_indexes(mine)
+    save_snapshot(mine, path)
+    watcher = SnapshotWatcher(interval=0, path=path)
+    cache = LRUCache(max_entries=10, ttl_seconds=60)
+    save_snapshot(VendorIndexes([]), path)
+
+    # A request resolves the current indexes, then the watcher swaps before its cache miss
+    resolved = get_indexes()
+    assert watcher.check() is True
+    assert [v.id for v in get_vendors_nearby(37.77, -122.43, None, False, resolved, cache)] == [1]
+
+    assert get_vendors_nearby(37.77, -122.43, None, False, get_indexes(), cache) == []
+
+def test_watcher_ignores_snapshot_of_another_database(tmp_path):
+    path = str(tmp_path / "snapshot.bin")
+    mine = VendorIndexes([VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="")])
+    publish_indexes(mine)
+    watcher = SnapshotWatcher(interval=0, path=path)
+
+    write_snapshot(mine.records[:0], path, "other", database_id("sqlite:///other.db"))
+    assert watcher.check() is False
+    assert get_indexes() is mine
@@ -0,0 +1,107 @@
+import pytest
+import datetime
+from zoneinfo import ZoneInfo
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base
+from app.models import VendorApplication, OpenInterval
+from app.data_loader import refresh_current_vendors
+from app.indexes import build_indexes
+from app.cache import LRUCache
+from app.schedule import parse_dayshours, is_open, minute_of_week, MINUTES_PER_DAY, MINUTES_PER_WEEK
+from app.services import get_vendors_nearby, get_vendors_by_name, resolve_open_at
+
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+# Monday 12:30 and Saturday 12:30, as minutes of the week
+MONDAY_LUNCH = 12 * 60 + 30
+SATURDAY_LUNCH = 5 * MINUTES_PER_DAY + 12 * 60 + 30
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    db.add_all([
+        VendorApplication(id=1, applicant_name="Weekday Tacos", status="APPROVED", latitude=37.7750, longitude=-122.4190,
+                          dayshours="Mo-Fr:11AM-2PM"),
+        VendorApplication(id=2, applicant_name="Weekend Tacos", status="APPROVED", latitude=37.7751, longitude=-122.4191,
+                          dayshours="Sa-Su:10AM-4PM"),
+        VendorApplication(id=3, applicant_name="Weekday Tacos", status="APPROVED", latitude=37.7752, longitude=-122.4192,
+                          dayshours="Mo/We:7AM-8AM/12PM-1PM"),
+        VendorApplication(id=4, applicant_name="Weekday Tacos", status="APPROVED", latitude=37.7753, longitude=-122.4193,
+                          dayshours=""),
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+@pytest.mark.parametrize("dayshours,intervals", [
+    ("Mo:9AM-5PM", [(540, 1020)]),
+    ("Mo-We:7AM-8AM/7:30AM-9AM", [(420, 540), (1860, 1980), (3300, 3420)]),
+    ("Fr:10PM-12AM", [(4 * 1440 + 1320, 5 * 1440)]),
+    # Sunday night runs on into Monday morning
+    ("Su:8PM-2AM", [(0, 120), (6 * 1440 + 1200, MINUTES_PER_WEEK)]),
+    ("Sa-Su:12PM-1PM", [(5 * 1440 + 720, 5 * 1440 + 780), (6 * 1440 + 720, 6 * 1440 + 780)]),
+    ("", []), (None, []), ("Whenever", []), ("Mo:25PM-1AM", []),
+])
+def test_parse_dayshours(dayshours, intervals):
+    assert parse_dayshours(dayshours) == intervals
+
+def test_is_open():
+    assert is_open("Mo-Fr:11AM-2PM", MONDAY_LUNCH)
+    assert not is_open("Mo-Fr:11AM-2PM", SATURDAY_LUNCH)
+    assert not is_open("Mo-Fr:11AM-2PM", 14 * 60)
+    assert not is_open(None, MONDAY_LUNCH)
+
+def test_resolve_open_at():
+    assert resolve_open_at() is None
+    assert resolve_open_at(open_at=datetime.datetime(2024, 6, 3, 12, 30)) == MONDAY_LUNCH
+    # 19:30 UTC is 12:30 in San Francisco in June
+    utc = datetime.datetime(2024, 6, 3, 19, 30, tzinfo=datetime.timezone.utc)
+    assert resolve_open_at(open_at=utc) == MONDAY_LUNCH
+    now = datetime.datetime.now(ZoneInfo("America/Los_Angeles"))
+    assert resolve_open_at(open_now=True) in (minute_of_week(now), (minute_of_week(now) + 1) % MINUTES_PER_WEEK)
+    with pytest.raises(HTTPException) as e:
+        resolve_open_at(True, utc)
+    assert e.value.status_code == 400
+
+def test_refresh_builds_open_intervals(db):
+    assert db.query(OpenInterval).filter(OpenInterval.application_id == 3).count() == 4
+    assert db.query(OpenInterval).filter(OpenInterval.application_id == 4).count() == 0
+
+@pytest.mark.parametrize("source", ["sql", "indexes", "cache"])
+def test_nearby_open_at(db, source):
+    indexes = build_indexes(db) if source != "sql" else None
+    cache = LRUCache(10, 60) if source == "cache" else None
+    nearby = lambda minute: sorted(v.id for v in get_vendors_nearby(37.7750, -122.4190, db, False, indexes, cache, minute))
+    assert nearby(None) == [1, 2, 3, 4]
+    assert nearby(MONDAY_LUNCH) == [1, 3]
+    assert nearby(SATURDAY_LUNCH) == [2]
+    assert nearby(3 * 60) == []
+
+def test_nearby_open_at_is_applied_before_picking_the_closest(db):
+    # Five closer vendors that are closed must not crowd out one further away that is open
+    db.add_all([VendorApplication(id=10 + i, applicant_name=f"Closed {i}", status="APPROVED",
+                                  latitude=37.7750, longitude=-122.4190, dayshours="Tu:1AM-2AM") for i in range(5)])
+    db.commit()
+    refresh_current_vendors(db)
+    db.commit()
+    assert [v.id for v in get_vendors_nearby(37.7750, -122.4190, db, False, build_indexes(db), None, SATURDAY_LUNCH)] == [2]
+    assert [v.id for v in get_vendors_nearby(37.7750, -122.4190, db, False, None, None, SATURDAY_LUNCH)] == [2]
+
+@pytest.mark.parametrize("use_indexes", [False, True])
+def test_name_open_at(db, use_indexes):
+    indexes = build_indexes(db) if use_indexes else None
+    assert [v.id for v in get_vendors_by_name("weekday tacos", db, indexes=indexes)] == [1, 3, 4]
+    assert [v.id for v in get_vendors_by_name("weekday tacos", db, indexes=indexes, open_at=MONDAY_LUNCH)] == [1, 3]
+    assert [v.id for v in get_vendors_by_name("weekday tacos", db, indexes=indexes, open_at=MONDAY_LUNCH, limit=1)] == [1]
+    assert get_vendors_by_name("weekday tacos", db, indexes=indexes, open_at=SATURDAY_LUNCH) == []
@@ -0,0 +1,91 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+from pydantic import TypeAdapter
+from typing import List
+from app.db import Base  # import your Base and models
+import datetime
+from app.models import VendorApplication, VendorRecord
+from app.data_loader import ingest_csv
+from app.indexes import build_indexes
+from app.routes import VendorApplicationResponse
+from app.serialization import FragmentCache, response_columns, encode_row, encode_vendor, json_array
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+# What FastAPI writes for response_model=List[VendorApplicationResponse]: validate, then dump_json
+response_model = TypeAdapter(List[VendorApplicationResponse])
+
+def model_json(vendors):
+    return response_model.dump_json(response_model.validate_python(vendors))
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def add_edge_cases(db):
+    db.add_all([
+        VendorApplication(applicant_name='Crème brûlée "Cart" \\ 🍮', facility_type="Push Cart", status="REQUESTED",
+                          address="1 Main st\t", latitude=-0.0, longitude=179.99999999999997,
+                          approved=datetime.datetime(2024, 2, 29, 23, 59, 59, 999999),
+                          expiration_date=datetime.datetime(2025, 1, 1)),
+        VendorApplication(applicant_name="", facility_type="", status="", address="", latitude=None, longitude=None),
+    ])
+    db.commit()
+
+def test_fast_path_is_byte_identical_to_response_model(db):
+    ingest_csv(db, "Mobile_Food_Facility_Permit.csv")
+    add_edge_cases(db)
+    vendors = db.query(VendorApplication).order_by(VendorApplication.id).all()
+    expected = model_json(vendors)
+
+    rows = db.execute(response_columns(select(VendorApplication).order_by(VendorApplication.id))).all()
+    records = build_indexes(db).records
+
+    assert len(vendors) > 400
+    assert json_array(encode_vendor(v) for v in vendors) == expected
+    assert json_array(encode_row(row) for row in rows) == expected
+    assert json_array(FragmentCache().encode(records)) == expected
+
+def test_empty_list():
+    assert json_array([]) == model_json([])
+
+def test_fragment_cache_reuses_fragments():
+    record = VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="1 Main st")
+    cache = FragmentCache()
+
+    first = cache.encode([record])
+    second = cache.encode([record])
+
+    assert first[0] is second[0]
+    assert len(cache) == 1
+
+def test_fragment_cache_does_not_serve_other_records_with_the_same_id():
+    cached = VendorRecord(id=1, applicant_name="A", facility_type="Truck", status="APPROVED", address="1 Main st")
+    stale = VendorRecord(id=1, applicant_name="Old", facility_type="Truck", status="APPROVED", address="1 Main st")
+    cache = FragmentCache()
+    cache.encode([cached])
+
+    assert cache.encode([stale]) == [encode_vendor(stale)]
+    assert cache.encode([cached]) == [encode_vendor(cached)]
+
+def test_fragment_cache_iter_encode_is_lazy():
+    records = [VendorRecord(id=i, applicant_name="A", facility_type="Truck", status="APPROVED", address="1 Main st")
+               for i in range(3)]
+    cache = FragmentCache()
+    fragments = cache.iter_encode(records)
+
+    assert len(cache) == 0
+    assert next(fragments) == encode_vendor(records[0])
+    assert len(cache) == 1
+    assert list(fragments) == [encode_vendor(r) for r in records[1:]]
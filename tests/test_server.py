@@ -0,0 +1,26 @@
+import pytest
+from app import server
+from app.server import available_cpus, worker_count
+
+@pytest.fixture
+def cpus(monkeypatch):
+    monkeypatch.setattr(server.os, "sched_getaffinity", lambda pid: {0, 1, 2, 3, 4, 5, 6, 7})
+
+@pytest.mark.parametrize("cpu_max,expected", [
+    ("200000 100000\n", 2),
+    ("150000 100000\n", 2),
+    ("50000 100000\n", 1),
+    ("max 100000\n", 8),
+    ("1600000 100000\n", 8),
+])
+def test_available_cpus_follows_cgroup_quota(tmp_path, cpus, cpu_max, expected):
+    path = tmp_path / "cpu.max"
+    path.write_text(cpu_max)
+    assert available_cpus(str(path)) == expected
+
+def test_available_cpus_without_cgroup(tmp_path, cpus):
+    assert available_cpus(str(tmp_path / "missing")) == 8
+
+def test_worker_count_setting_overrides(monkeypatch):
+    monkeypatch.setattr(server.settings, "server_workers", 3)
+    assert worker_count() == 3
@@ -0,0 +1,139 @@
+import datetime
+import os
+import pytest
+from app.config import Settings, settings, database_id
+from app.models import VendorRecord
+from app.dataset import content_hash
+from app.indexes import VendorIndexes, save_snapshot, load_snapshot_indexes, get_indexes
+from app.snapshot import VendorSnapshot, SnapshotError, write_snapshot, read_header
+
+RECORDS = [
+    VendorRecord(id=1, applicant_name="Authentic India", facility_type="Truck", status="APPROVED",
+                 address="123 Sansome st", latitude=37.7901, longitude=-122.4012,
+                 approved=datetime.datetime(2024, 3, 1, 9, 30), expiration_date=datetime.datetime(2025, 6, 1, 0, 0, 0, 250)),
+    VendorRecord(id=2, applicant_name="Crème brûlée cart", facility_type="Push Cart", status="REQUESTED",
+                 address="", latitude=None, longitude=None),
+    VendorRecord(id=7, applicant_name="", facility_type=None, status="EXPIRED", address=None,
+                 latitude=0.0, longitude=-0.0),
+]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "vendors.snapshot")
+
+def test_round_trip(path):
+    write_snapshot(RECORDS, path, content_hash(RECORDS))
+
+    snapshot = VendorSnapshot(path)
+
+    assert len(snapshot) == 3
+    assert snapshot.records() == RECORDS
+    assert [snapshot.record(row) for row in range(3)] == RECORDS
+    assert snapshot.code_is("status", "APPROVED").tolist() == [True, False, False]
+    assert not snapshot.code_is("status", "SUSPEND").any()
+    assert content_hash(snapshot.records()) == snapshot.content_hash == content_hash(RECORDS)
+
+def test_columns_are_read_only_views(path):
+    write_snapshot(RECORDS, path, content_hash(RECORDS))
+
+    snapshot = VendorSnapshot(path)
+
+    assert snapshot.columns["id"].tolist() == [1, 2, 7]
+    assert not snapshot.columns["latitude"].flags.writeable
+    assert snapshot.header["tables"]["status"] == ["APPROVED", "EXPIRED", "REQUESTED"]
+
+def test_empty_snapshot(path):
+    write_snapshot([], path, content_hash([]))
+
+    assert VendorSnapshot(path).records() == []
+
+def test_corrupt_snapshot_fails_checksum(path):
+    write_snapshot(RECORDS, path, content_hash(RECORDS))
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+
+    with pytest.raises(SnapshotError):
+        VendorSnapshot(path)
+
+def test_not_a_snapshot(path):
+    with open(path, "wb") as f:
+        f.write(b"id,name\n")
+
+    with pytest.raises(SnapshotError):
+        VendorSnapshot(path)
+    assert read_header(path) is None
+
+def test_replace_is_atomic_for_open_readers(path):
+    write_snapshot(RECORDS, path, "first")
+    old = VendorSnapshot(path)
+
+    write_snapshot(RECORDS[:1], path, "second")
+
+    # The open snapshot still maps the file it was opened from
+    assert old.records() == RECORDS
+    new = VendorSnapshot(path)
+    assert new.records() == RECORDS[:1]
+    assert (old.generation, new.generation) == (1, 2)
+    assert [name for name in os.listdir(os.path.dirname(path))] == [os.path.basename(path)]
+
+def test_save_snapshot_skips_unchanged_data(path):
+    indexes = VendorIndexes(RECORDS)
+    save_snapshot(indexes, path)
+    save_snapshot(indexes, path)
+    assert read_header(path)["generation"] == 1
+
+    save_snapshot(VendorIndexes(RECORDS[:2]), path)
+    assert read_header(path)["generation"] == 2
+
+def test_indexes_from_snapshot(path, monkeypatch):
+    monkeypatch.setattr("app.indexes._current", None)
+    save_snapshot(VendorIndexes(RECORDS), path)
+
+    indexes = load_snapshot_indexes(path)
+
+    assert indexes is get_indexes()
+    assert list(indexes.records) == RECORDS
+    assert indexes.content_hash == content_hash(RECORDS)
+    assert [r.id for r in indexes.names.lookup("authentic india", all_status=True)] == [1]
+
+def test_snapshot_indexes_decode_only_returned_rows(path, monkeypatch):
+    monkeypatch.setattr("app.indexes._current", None)
+    save_snapshot(VendorIndexes(RECORDS), path)
+
+    indexes = load_snapshot_indexes(path)
+    rows = indexes.records
+
+    # Building every index left the rows undecoded, and the grid reads the mapped columns
+    assert rows.decoded == 0
+    assert indexes.spatial.all_status.rows.latitudes is rows.snapshot.columns["latitude"]
+    assert len(indexes.spatial.approved) == 1 and len(indexes.spatial.all_status) == 2
+    box = (37.78, 37.80, -122.41, -122.39)
+    first = indexes.spatial.within_bounding_box(box)
+    assert first == RECORDS[:1] and rows.decoded == 1
+    assert indexes.spatial.nearest(37.79, -122.40, 1)[0][0] is first[0]
+    assert rows.decoded == 1
+    assert sum(count for _, _, count, _, _, _ in indexes.tiles.clusters(0, (0, 0, 0, 0), all_status=True)) == 2
+    assert rows.decoded == 1
+
+def test_indexes_ignore_snapshot_of_another_database(path, monkeypatch):
+    write_snapshot(RECORDS, path, content_hash(RECORDS), database_id("sqlite:///other.db"))
+
+    assert load_snapshot_indexes(path) is None
+    # Saving the same records for this database replaces it rather than skipping it as unchanged
+    save_snapshot(VendorIndexes(RECORDS), path)
+    assert VendorSnapshot(path).database == database_id(settings.database_url)
+    assert load_snapshot_indexes(path) is not None
+
+def test_default_paths_follow_the_database():
+    first = Settings(project_name="t", database_url="sqlite:///a.db")
+    second = Settings(project_name="t", database_url="sqlite:///b.db")
+
+    assert first.snapshot_file != second.snapshot_file
+    assert first.startup_lock_file != second.startup_lock_file
+    assert Settings(project_name="t", database_url="sqlite:///a.db", snapshot_file="").snapshot_file == ""
+
+def test_indexes_from_missing_snapshot(path):
+    assert load_snapshot_indexes(path) is None
@@ -0,0 +1,80 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.db import Base  # import your Base and models
+import datetime
+from app.models import VendorApplication
+from app.data_loader import refresh_current_vendors
+from app.indexes import build_indexes
+from app.services import get_applicants_within_radius, get_vendors_nearby
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+@pytest.fixture(scope="function")
+def db():
+    Base.metadata.create_all(bind=engine)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def add_vendors(db):
+    db.add_all([
+        VendorApplication(id = 1, latitude=41.0001, longitude=-75.0, status="APPROVED",
+                          expiration_date=datetime.datetime(2025, 6, 1), applicant_name="A"),
+        VendorApplication(id = 2, latitude=41.0001, longitude=-75.0, status="PENDING",
+                          expiration_date=datetime.datetime(2025, 7, 1), applicant_name="A"),
+        VendorApplication(id = 3, latitude=41.0003, longitude=-75.0, status="PENDING",
+                          expiration_date=datetime.datetime(2025, 8, 1), applicant_name="B"),
+        VendorApplication(id = 4, latitude=41.0004, longitude=-75.0, status="APPROVED",
+                          expiration_date=datetime.datetime(2025, 8, 1), applicant_name="C"),
+        VendorApplication(id = 5, latitude=41.0004, longitude=-75.0, status="APPROVED",
+                          expiration_date=datetime.datetime(2025, 8, 1), applicant_name="C"),
+        VendorApplication(id = 6, latitude=40.0, longitude=-74.0, status="APPROVED",
+                          expiration_date=datetime.datetime(2025, 8, 1), applicant_name="D"),
+        VendorApplication(id = 7, latitude=None, longitude=None, status="APPROVED", applicant_name="E"),
+    ])
+    db.commit()
+    refresh_current_vendors(db)
+
+@pytest.mark.parametrize("bounding_box", [
+    (41.0001, 41.0003, -75.01, -75.0),
+    (39.0, 42.0, -76.0, -73.0),
+    (0, 45, -76, -74.5),
+    (41.0002, 41.0002, -75.0, -75.0),
+])
+@pytest.mark.parametrize("all_status", [True, False])
+def test_index_matches_sql_bounding_box(db, bounding_box, all_status):
+    add_vendors(db)
+    indexes = build_indexes(db)
+
+    expected = sorted(a.id for a in get_applicants_within_radius(bounding_box, db, all_status))
+    result = [r.id for r in indexes.spatial.within_bounding_box(bounding_box, all_status)]
+
+    assert result == expected
+
+def test_index_dedups_latest_per_location(db):
+    add_vendors(db)
+    indexes = build_indexes(db)
+
+    approved = indexes.spatial.within_bounding_box((41.0, 41.001, -75.01, -74.99), False)
+    all_status = indexes.spatial.within_bounding_box((41.0, 41.001, -75.01, -74.99), True)
+
+    assert [r.id for r in approved] == [1, 5]
+    assert [r.id for r in all_status] == [2, 3, 5]
+
+@pytest.mark.parametrize("all_status", [True, False])
+def test_get_vendors_nearby_with_index_matches_sql(db, all_status):
+    add_vendors(db)
+    indexes = build_indexes(db)
+
+    expected = [v.id for v in get_vendors_nearby(41.0, -75.0, db, all_status)]
+    result = [v.id for v in get_vendors_nearby(41.0, -75.0, None, all_status, indexes)]
+
+    assert result == expected
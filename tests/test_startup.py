@@ -0,0 +1,120 @@
+import contextlib
+import threading
+import pytest
+from fastapi import HTTPException
+from app import startup
+from app.startup import StartupState, leader_lock, warm_up
+from app.dependencies import require_ready
+
+def test_first_lock_holder_is_leader(tmp_path):
+    path = str(tmp_path / "startup.lock")
+    follower_result = []
+
+    with leader_lock(path) as leader:
+        assert leader is True
+        follower = threading.Thread(target=lambda: follower_result.append(leader_lock(path).__enter__()))
+        follower.start()
+        follower.join(timeout=0.2)
+        # The follower blocks while the leader holds the lock
+        assert follower.is_alive()
+    follower.join(timeout=5)
+
+    assert follower_result == [False]
+
+@pytest.fixture
+def lock_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(startup.settings, "startup_lock_file", str(tmp_path / "startup.lock"))
+
+def test_warm_up_marks_ready(monkeypatch, lock_file):
+    calls = []
+    monkeypatch.setattr(startup, "prepare_database", lambda: calls.append("database"))
+    monkeypatch.setattr(startup, "refresh_indexes", lambda: calls.append("indexes"))
+    state = StartupState()
+
+    warm_up(state)
+
+    assert calls == ["database", "indexes"]
+    assert state.ready
+    assert state.leader is True
+    assert state.summary()["time_to_ready_seconds"] >= 0
+
+def test_warm_up_follower_builds_from_snapshot(monkeypatch, lock_file):
+    calls = []
+    monkeypatch.setattr(startup, "leader_lock", lambda: contextlib.nullcontext(False))
+    monkeypatch.setattr(startup, "load_snapshot_indexes", lambda: calls.append("snapshot") or object())
+    monkeypatch.setattr(startup, "prepare_database", lambda: calls.append("database"))
+    state = StartupState()
+
+    warm_up(state)
+
+    assert calls == ["snapshot"]
+    assert state.ready
+    assert state.leader is False
+
+def test_warm_up_failure_is_reported(monkeypatch, lock_file):
+    def fail():
+        raise RuntimeError("database unreachable")
+    monkeypatch.setattr(startup, "prepare_database", fail)
+    state = StartupState()
+
+    warm_up(state)
+
+    assert not state.ready
+    assert state.error == "database unreachable"
+
+def test_first_request_recorded_only_after_ready():
+    state = StartupState()
+    state.record_request()
+    assert state.first_request_at is None
+
+    state.mark_ready()
+    state.record_request()
+    first = state.first_request_at
+    state.record_request()
+
+    assert first is not None
+    assert state.first_request_at == first
+
+@pytest.mark.anyio
+async def test_require_ready_rejects_until_ready(monkeypatch):
+    state = StartupState()
+    monkeypatch.setattr("app.dependencies.startup_state", state)
+
+    with pytest.raises(HTTPException) as exc:
+        await require_ready()
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+    state.mark_ready()
+    await require_ready()
+
+class FakePostgres:
+    """Just enough of an Engine to record the DDL create_address_trigram_index runs, or fail it."""
+    def __init__(self, error=None):
+        self.dialect = type("Dialect", (), {"name": "postgresql"})()
+        self.error = error
+        self.statements = []
+
+    @contextlib.contextmanager
+    def begin(self):
+        yield self
+
+    def execute(self, statement):
+        if self.error:
+            raise self.error
+        self.statements.append(str(statement))
+
+def test_trigram_index_is_created_on_existing_tables():
+    bind = FakePostgres()
+    assert startup.create_address_trigram_index(bind) is True
+    assert bind.statements[0] == "CREATE EXTENSION IF NOT EXISTS pg_trgm"
+    assert "IF NOT EXISTS ix_food_vendor_application_address_trgm" in bind.statements[1]
+
+def test_trigram_index_without_privilege_does_not_fail_startup(caplog):
+    from sqlalchemy.exc import ProgrammingError
+    bind = FakePostgres(ProgrammingError("CREATE EXTENSION", {}, Exception("permission denied to create extension")))
+    assert startup.create_address_trigram_index(bind) is False
+    assert "address trigram index" in caplog.text
+
+def test_trigram_index_is_postgresql_only():
+    assert startup.create_address_trigram_index(startup.engine) is False
@@ -0,0 +1,206 @@
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from app.db import Base, upgrade_schema  # import your Base and models
+from app.models import VendorApplication, CurrentVendor, OpenInterval, SyncLog, current_vendor_rtree
+import app.data_loader as data_loader
+
+# Setup test database
+SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+TestSessionLocal = sessionmaker(bind=engine)
+
+HEADER = "locationid,Applicant,FacilityType,Address,permit,Status,Latitude,Longitude,Approved,ExpirationDate\n"
+DAY_1 = HEADER + (
+    "1,The Geez Freeze,Truck,3750 18TH ST,21MFF-00015,APPROVED,37.762,-122.427,01/28/2022 12:00:00 AM,11/15/2022 12:00:00 AM\n"
+    "2,Anzu To You,Truck,2535 TAYLOR ST,21MFF-00106,APPROVED,37.805,-122.415,11/05/2021 12:00:00 AM,\n"
+    "3,Natan's Catering,Truck,1 MARKET ST,21MFF-00107,REQUESTED,37.79,-122.39,,\n"
+)
+DAY_2 = HEADER + (
+    "1,The Geez Freeze,Truck,3750 18TH ST,21MFF-00015,APPROVED,37.762,-122.427,01/28/2022 12:00:00 AM,11/15/2022 12:00:00 AM\n"
+    "3,Natan's Catering,Truck,1 MARKET ST,21MFF-00107,APPROVED,37.79,-122.39,,\n"
+    "4,Bonito Poke,Truck,2 MAIN ST,21MFF-00108,APPROVED,37.78,-122.40,,\n"
+    ",No Location,Truck,3 MAIN ST,21MFF-00109,APPROVED,37.78,-122.40,,\n"
+)
+
+@pytest.fixture(scope="function")
+def db(monkeypatch):
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(data_loader, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(data_loader, "refresh_indexes", lambda: None)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def write_csv(tmp_path, content):
+    path = tmp_path / "permits.csv"
+    path.write_text(content)
+    return str(path)
+
+def test_sync_into_empty_table(db, tmp_path):
+    log = data_loader.sync_csv_data(write_csv(tmp_path, DAY_1))
+
+    assert (log.inserted, log.updated, log.deleted, log.unchanged, log.rejected) == (3, 0, 0, 0, 0)
+    assert db.query(VendorApplication).count() == 3
+
+def test_sync_applies_only_the_delta(db, tmp_path):
+    data_loader.sync_csv_data(write_csv(tmp_path, DAY_1))
+    ids = {v.location_id: v.id for v in db.query(VendorApplication)}
+
+    log = data_loader.sync_csv_data(write_csv(tmp_path, DAY_2))
+
+    assert (log.inserted, log.updated, log.deleted, log.unchanged, log.rejected) == (1, 1, 1, 1, 1)
+    vendors = {v.location_id: v for v in db.query(VendorApplication)}
+    assert set(vendors) == {1, 3, 4}
+    assert vendors[1].id == ids[1]
+    assert vendors[3].id == ids[3]
+    assert vendors[3].status == "APPROVED"
+    assert db.query(SyncLog).count() == 2
+
+def test_sync_same_file_is_a_no_op(db, tmp_path):
+    path = write_csv(tmp_path, DAY_1)
+    data_loader.sync_csv_data(path)
+
+    log = data_loader.sync_csv_data(path)
+
+    assert (log.inserted, log.updated, log.deleted, log.unchanged) == (0, 0, 0, 3)
+
+def test_sync_after_full_load_matches_hashes(db, tmp_path):
+    path = write_csv(tmp_path, DAY_1)
+    data_loader.ingest_csv(db, path)
+    db.commit()
+
+    log = data_loader.sync_csv_data(path)
+
+    assert (log.inserted, log.updated, log.deleted, log.unchanged) == (0, 0, 0, 3)
+
+def current_vendors(db, all_status):
+    return sorted(c.application_id for c in db.query(CurrentVendor).filter(CurrentVendor.all_status == all_status))
+
+def test_sync_refreshes_current_vendors(db, tmp_path):
+    data_loader.sync_csv_data(write_csv(tmp_path, DAY_1))
+    ids = {v.location_id: v.id for v in db.query(VendorApplication)}
+    assert current_vendors(db, False) == sorted([ids[1], ids[2]])
+
+    data_loader.sync_csv_data(write_csv(tmp_path, DAY_2))
+    db.expire_all()
+
+    ids = {v.location_id: v.id for v in db.query(VendorApplication)}
+    assert current_vendors(db, False) == sorted(ids.values())
+    assert current_vendors(db, True) == sorted(ids.values())
+
+def test_load_fills_current_vendors(db, tmp_path):
+    data_loader.load_csv_data(write_csv(tmp_path, DAY_1))
+
+    assert len(current_vendors(db, True)) == 3
+    assert len(current_vendors(db, False)) == 2
+
+def test_load_backfills_current_vendors_for_existing_data(db, tmp_path):
+    path = write_csv(tmp_path, DAY_1)
+    data_loader.ingest_csv(db, path)
+    db.commit()
+
+    data_loader.load_csv_data(path)
+
+    assert len(current_vendors(db, True)) == 3
+
+SHARED_HEADER = "locationid,Applicant,FacilityType,Address,permit,Status,Latitude,Longitude,dayshours\n"
+SHARED_1 = SHARED_HEADER + (
+    # Two permits at one location under one name: only the latest counts
+    "10,Tacos El Primo,Truck,1 MAIN ST,P1,APPROVED,37.70,-122.40,Mo-Fr:9AM-5PM\n"
+    "11,Tacos El Primo,Truck,1 MAIN ST,P2,APPROVED,37.70,-122.40,Sa-Su:9AM-5PM\n"
+    "12,Curry Up,Truck,2 MAIN ST,P3,APPROVED,37.71,-122.41,Mo:8AM-9AM\n"
+    "13,Soup Spot,Cart,3 MAIN ST,P4,REQUESTED,37.72,-122.42,\n"
+)
+SHARED_2 = SHARED_HEADER + (
+    "10,Tacos El Primo,Truck,1 MAIN ST,P1,APPROVED,37.70,-122.40,Mo-Fr:9AM-5PM\n"
+    # Moves to Curry Up's location, leaving the older permit as the latest at its own
+    "11,Curry Up,Truck,2 MAIN ST,P2,APPROVED,37.71,-122.41,Tu:8AM-9AM\n"
+    "13,Soup Spot,Cart,3 MAIN ST,P4,APPROVED,37.72,-122.42,We:11AM-1PM\n"
+    "14,Soup Spot,Cart,3 MAIN ST,P5,EXPIRED,37.72,-122.42,\n"
+)
+
+def derived_tables(db):
+    rtree = db.execute(current_vendor_rtree.select()).all()
+    current = {c.id: (round(c.latitude, 4), round(c.longitude, 4), c.all_status) for c in db.query(CurrentVendor)}
+    # The R*Tree covers exactly the current_vendor rows, at their positions (stored as 32-bit floats)
+    assert {row.id: (round(row.min_lat, 4), round(row.min_long, 4), row.min_scope) for row in rtree} == current
+    return (
+        sorted(db.query(CurrentVendor.application_id, CurrentVendor.all_status, CurrentVendor.latitude, CurrentVendor.longitude)),
+        sorted(db.query(OpenInterval.application_id, OpenInterval.start_minute, OpenInterval.end_minute)),
+    )
+
+def test_sync_updates_derived_tables_like_a_full_rebuild(db, tmp_path):
+    data_loader.sync_csv_data(write_csv(tmp_path, SHARED_1))
+    before = {c.id for c in db.query(CurrentVendor)}
+    data_loader.sync_csv_data(write_csv(tmp_path, SHARED_2))
+    db.expire_all()
+    synced = derived_tables(db)
+    kept = before & {c.id for c in db.query(CurrentVendor)}
+
+    data_loader.refresh_current_vendors(db)
+
+    assert synced == derived_tables(db)
+    # Locations no changed row touched keep their current_vendor rows
+    assert kept
+
+# food_vendor_application as the first release created and filled it
+LEGACY_SCHEMA = ("CREATE TABLE food_vendor_application (id INTEGER PRIMARY KEY, applicant_name VARCHAR, "
+                 "facility_type VARCHAR, status VARCHAR, address VARCHAR, latitude FLOAT, longitude FLOAT, "
+                 "approved DATETIME, expiration_date DATETIME)")
+LEGACY_ROWS = [
+    (1, "The Geez Freeze", "Truck", "APPROVED", "3750 18TH ST", 37.762, -122.427),
+    (2, "Anzu To You", "Truck", "APPROVED", "2535 TAYLOR ST", 37.805, -122.415),
+    (3, "Natan's Catering", "Truck", "REQUESTED", "1 MARKET ST", 37.79, -122.39),
+    (4, "Gone Away", "nan", "EXPIRED", "nan", 37.70, -122.40),
+    (5, "Also Gone", "Truck", "EXPIRED", "9 MAIN ST", None, None),
+]
+
+@pytest.fixture
+def legacy_db(monkeypatch):
+    with engine.begin() as connection:
+        connection.execute(text(LEGACY_SCHEMA))
+        for row in LEGACY_ROWS:
+            connection.execute(text("INSERT INTO food_vendor_application (id, applicant_name, facility_type, status, "
+                                    "address, latitude, longitude) VALUES (:0, :1, :2, :3, :4, :5, :6)"),
+                               {str(i): value for i, value in enumerate(row)})
+    monkeypatch.setattr(data_loader, "SessionLocal", TestSessionLocal)
+    monkeypatch.setattr(data_loader, "refresh_indexes", lambda: None)
+    db = TestSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=engine)
+
+def test_upgrade_adds_missing_columns_once(legacy_db):
+    Base.metadata.create_all(bind=engine)
+
+    added = upgrade_schema(engine)
+
+    assert {"food_vendor_application.name_key", "food_vendor_application.location_id",
+            "food_vendor_application.row_hash", "food_vendor_application.dayshours"} <= set(added)
+    assert upgrade_schema(engine) == []
+
+def test_upgraded_rows_are_backfilled_and_synced(legacy_db, tmp_path):
+    path = write_csv(tmp_path, DAY_1)
+    Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    assert data_loader.backfill_upgraded_rows(path) == 3
+
+    vendors = {v.id: v for v in legacy_db.query(VendorApplication)}
+    assert [vendors[i].location_id for i in range(1, 6)] == [1, 2, 3, None, None]
+    assert vendors[1].name_key == "the geez freeze" and vendors[4].name_key == "gone away"
+    assert vendors[1].permit == "21MFF-00015" and vendors[1].row_hash
+    assert current_vendors(legacy_db, True) == [1, 2, 3, 4]
+
+    # Matched rows count as unchanged; every row the CSV no longer has is deleted, not just one
+    log = data_loader.sync_csv_data(path)
+    assert (log.inserted, log.updated, log.deleted, log.unchanged) == (0, 0, 2, 3)
+    legacy_db.expire_all()
+    assert sorted(v.id for v in legacy_db.query(VendorApplication)) == [1, 2, 3]
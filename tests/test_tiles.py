@@ -0,0 +1,59 @@
+import pytest
+import random
+from collections import defaultdict
+from fastapi import HTTPException
+from app.indexes import VendorIndexes
+from app.models import VendorRecord
+from app.services import get_tile_clusters
+from app.tiles import tile_x, tile_y, PyramidLayer
+
+def vendor(id, lat, long, status="APPROVED"):
+    return VendorRecord(id=id, applicant_name=f"Vendor {id}", facility_type="Truck", status=status, address="",
+                        latitude=lat, longitude=long)
+
+rng = random.Random(7)
+RECORDS = [vendor(i, rng.uniform(37.70, 37.82), rng.uniform(-122.52, -122.36), "APPROVED" if i % 3 else "EXPIRED")
+           for i in range(1, 301)]
+INDEXES = VendorIndexes(RECORDS)
+CITY = (37.70, 37.82, -122.52, -122.36)
+
+def test_tile_coordinates():
+    # San Francisco City Hall, on the standard OpenStreetMap tile grid
+    assert (int(tile_x(-122.4194, 12)), int(tile_y(37.7749, 12))) == (655, 1583)
+    assert (int(tile_x(-180, 3)), int(tile_y(85.06, 3))) == (0, 0)
+    assert (int(tile_x(180, 3)), int(tile_y(-90, 3))) == (7, 7)
+
+@pytest.mark.parametrize("level", [0, 6, 12, 15, 19])
+def test_layer_cells_match_brute_force(level):
+    layer = PyramidLayer(RECORDS, 19)
+    members = defaultdict(list)
+    for r in RECORDS:
+        members[(int(tile_x(r.longitude, level)), int(tile_y(r.latitude, level)))].append(r)
+    scale = (1 << level) - 1
+    cells = layer.cells(level, 0, scale, 0, scale)
+    assert {(x, y): count for x, y, count, _, _, _ in cells} == {cell: len(rs) for cell, rs in members.items()}
+    for x, y, count, lat, long, first_id in cells:
+        cell = members[(x, y)]
+        assert lat == pytest.approx(sum(r.latitude for r in cell) / count)
+        assert long == pytest.approx(sum(r.longitude for r in cell) / count)
+        assert first_id == min(r.id for r in cell)
+
+@pytest.mark.parametrize("zoom", [0, 8, 11, 13])
+def test_clusters_cover_the_box(zoom):
+    tiles, clusters = get_tile_clusters(zoom, CITY, True, INDEXES)
+    min_x, max_x, min_y, max_y = tiles
+    assert sum(count for _, _, count, _, _, _ in clusters) == len(INDEXES.spatial.all_status)
+    # At most 8x8 clusters per tile, all inside the tile range
+    assert len(clusters) <= 64 * (max_x - min_x + 1) * (max_y - min_y + 1)
+    assert all(min_x <= x >> 3 <= max_x and min_y <= y >> 3 <= max_y for x, y, _, _, _, _ in clusters)
+
+def test_clusters_by_status():
+    _, approved = get_tile_clusters(10, CITY, False, INDEXES)
+    assert sum(count for _, _, count, _, _, _ in approved) == len([r for r in RECORDS if r.status == "APPROVED"])
+
+def test_tile_validation():
+    for zoom, box, indexes, status in [(18, CITY, INDEXES, 400), (10, (37.8, 37.7, -122.5, -122.4), INDEXES, 400),
+                                       (10, (37.7, 95, -122.5, -122.4), INDEXES, 400), (10, CITY, None, 503)]:
+        with pytest.raises(HTTPException) as e:
+            get_tile_clusters(zoom, box, False, indexes)
+        assert e.value.status_code == status
@@ -0,0 +1,49 @@
+import pytest
+import numpy as np
+from math import degrees
+from app.utils import haversine_distance, haversine_distances, nearest_k, get_bounding_box
+
+POINTS = [
+    (37.76201920035647, -122.42730642251331),
+    (37.805885350100986, -122.41594524663745),
+    (37.79, -122.40),
+    (41.0001, -75.0),
+    (-33.8688, 151.2093),
+    (0.0, 180.0),
+    (89.9, 0.0),
+]
+
+@pytest.mark.parametrize("origin", POINTS)
+def test_haversine_distances_matches_scalar(origin):
+    lats = [p[0] for p in POINTS]
+    lons = [p[1] for p in POINTS]
+
+    result = haversine_distances(origin[0], origin[1], lats, lons)
+
+    expected = [haversine_distance(origin[0], origin[1], lat, lon) for lat, lon in POINTS]
+    assert np.allclose(result, expected, rtol=1e-12, atol=1e-9)
+
+def test_haversine_distances_empty():
+    assert len(haversine_distances(37.79, -122.40, [], [])) == 0
+
+@pytest.mark.parametrize("k", [0, 1, 3, 5, 10, 50])
+def test_nearest_k_matches_stable_sort(k):
+    rng = np.random.default_rng(7)
+    # Rounded so that ties are common, including at the k-th position
+    distances = np.round(rng.random(40) * 5, 0)
+
+    result = list(nearest_k(distances, k))
+
+    expected = sorted(range(len(distances)), key=lambda i: distances[i])[:k]
+    assert result == expected
+
+def test_nearest_k_ties_keep_input_order():
+    assert list(nearest_k([1.0, 0.5, 1.0, 0.5, 1.0], 3)) == [1, 3, 0]
+
+def test_nearby_box_keeps_its_original_scale():
+    min_lat, max_lat, _, _ = get_bounding_box(37.0, -122.0)
+    assert max_lat - 37.0 == pytest.approx(degrees(2.0 / 1.6 / 6371))
+
+def test_bounding_box_radius_is_in_statute_miles():
+    min_lat, max_lat, _, _ = get_bounding_box(37.0, -122.0, 1.0)
+    assert max_lat - 37.0 == pytest.approx(degrees(1.609344 / 6371))